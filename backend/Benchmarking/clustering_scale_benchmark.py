@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import clustering
+
+# Synthetic school sizes are built by resampling the real dashboard dataset.
+# Full KMeans is only run up to FULL_KMEANS_MAX_ROWS: past that its dense
+# one-hot matrix alone no longer fits comfortably in memory.
+ROW_COUNTS = [int(n) for n in os.getenv("BENCH_ROWS", "100000,1000000").split(",")]
+FULL_KMEANS_MAX_ROWS = 1_000_000
+
+def make_dataset(n_rows):
+    base = pd.read_csv(clustering.DATA_PATH)
+    return base.sample(n=n_rows, replace=True, random_state=42).reset_index(drop=True)
+
+def fit_engine(engine, df):
+    """Fits one engine through clustering._train_kmeans; returns (seconds, peak MB above the input frame)."""
+    clustering.CLUSTERING_ENGINE = engine
+    clustering.df_cluster = df
+    clustering.kmeans_model = clustering.kmeans_preprocessor = None
+    clustering.persona_mapping = {}
+    features_df = df.drop(columns=clustering.NON_FEATURE_COLS, errors='ignore')
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    clustering._train_kmeans(features_df)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 ** 2
+
+def benchmark_clustering_scale():
+    # Keep the real model artifacts untouched
+    tmp_dir = tempfile.mkdtemp(prefix="clustering_bench_")
+    clustering.KMEANS_PATH = os.path.join(tmp_dir, "kmeans_model.pkl")
+    clustering.PREPROCESSOR_PATH = os.path.join(tmp_dir, "kmeans_preprocessor.pkl")
+    clustering.PERSONA_PATH = os.path.join(tmp_dir, "persona_mapping.json")
+
+    results = []
+    for n_rows in ROW_COUNTS:
+        print(f"Generating {n_rows:,} students...")
+        df = make_dataset(n_rows)
+        engines = ["minibatch"] + (["kmeans"] if n_rows <= FULL_KMEANS_MAX_ROWS else [])
+        for engine in engines:
+            print(f"Fitting {engine} on {n_rows:,} rows...")
+            elapsed, peak_mb = fit_engine(engine, df)
+            results.append({"Engine": engine, "Rows": n_rows, "Fit_Seconds": elapsed, "Peak_Extra_MB": peak_mb})
+
+    results_df = pd.DataFrame(results).round(2)
+    print("\nCLUSTERING SCALE BENCHMARK")
+    print(results_df.to_string(index=False))
+    return results_df
+
+if __name__ == "__main__":
+    benchmark_clustering_scale()
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import json
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import clustering
+import distributions
+import schema
+
+# What a dashboard chart costs at SIZES students: building and serializing the
+# full /api/students list it used to bin client-side, against one
+# /api/distributions query computed cold and then served from the
+# per-version cache.
+SIZES = [int(n) for n in os.getenv("BENCH_STUDENTS", "10000,100000").split(",")]
+QUERIES = {
+    "3 histograms": {"metrics": ("score", "engagement", "burnout")},
+    "3 histograms by persona": {"metrics": ("score", "engagement", "burnout"), "group_by": "persona"},
+    "engagement x burnout by persona": {"metrics": (), "heatmaps": (("engagement", "burnout"),),
+                                        "group_by": "persona"},
+    "quantile score histogram": {"metrics": ("score",), "binning": "quantile"},
+}
+
+def timed_ms(run):
+    start = time.perf_counter()
+    result = run()
+    return (time.perf_counter() - start) * 1000, result
+
+def scaled_frames(n):
+    cluster = schema.read_csv(clustering.DATA_PATH).sample(n=n, replace=True, random_state=42)
+    raw = schema.read_csv(clustering.RAW_DATA_PATH).loc[cluster.index].reset_index(drop=True)
+    return cluster.reset_index(drop=True), raw
+
+def benchmark_distributions():
+    rows = []
+    for n in SIZES:
+        cluster, raw = scaled_frames(n)
+        list_ms, students = timed_ms(lambda: json.dumps({"students": clustering._student_rows(cluster, raw)}))
+        rows.append({"Students": n, "Payload": "full student list", "Size_KB": len(students) / 1024,
+                     "Cold_ms": list_ms, "Cached_ms": None})
+        for version, (label, query) in enumerate(QUERIES.items()):
+            cold_ms, result = timed_ms(lambda: json.dumps(distributions.get_distributions(cluster, (n, version), **query)))
+            cached_ms, _ = timed_ms(lambda: json.dumps(distributions.get_distributions(cluster, (n, version), **query)))
+            rows.append({"Students": n, "Payload": label, "Size_KB": len(result) / 1024,
+                         "Cold_ms": cold_ms, "Cached_ms": cached_ms})
+    results = pd.DataFrame(rows)
+    print("\nCHART PAYLOADS: FULL STUDENT LIST VS /api/distributions (times include JSON encoding)")
+    print(results.round(2).to_string(index=False))
+    return results
+
+if __name__ == "__main__":
+    benchmark_distributions()
@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.pipeline import Pipeline
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ML
+import explain
+import model_format
+import preprocessing
+
+# Accuracy vs. serving speed of the regressors ML can train. Each engine is
+# fitted on the same 80% split and served two ways: the sklearn pipeline and
+# its model_format artifact (linear: folded weights, GBDT: flattened trees).
+# Latency is the median of SINGLE_ROUNDS single-student calls and of
+# BATCH_ROUNDS calls on BATCH_ROWS students.
+ENGINES = {
+    "HuberRegressor": ML.DEFAULT_REGRESSOR["params"],
+    "GradientBoostingRegressor": {"n_estimators": 300, "max_depth": 3, "learning_rate": 0.05, "random_state": 42},
+    "HistGradientBoostingRegressor": {"max_iter": 300, "learning_rate": 0.05, "random_state": 42},
+}
+BATCH_ROWS = int(os.getenv("BENCH_BATCH_ROWS", "10000"))
+SINGLE_ROUNDS = 200
+BATCH_ROUNDS = 5
+
+def median_ms(predict, rounds):
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        predict()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+def benchmark_gbdt_engines():
+    df = pd.read_csv(ML.DATA_PATH)
+    y = df["Exam_Score"]
+    X = df.drop(columns=["Exam_Score"])
+    num_cols = X.select_dtypes(include=[np.number]).columns.tolist()
+    cat_cols = X.select_dtypes(exclude=[np.number]).columns.tolist()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    batch = X_test.sample(n=BATCH_ROWS, replace=True, random_state=0)
+    single = X_test.iloc[:1]
+    tmp_dir = tempfile.mkdtemp(prefix="gbdt_bench_")
+
+    results = []
+    for name, params in ENGINES.items():
+        print(f"Training {name}...")
+        pipeline = Pipeline([
+            ("prep", preprocessing.build_preprocessor(num_cols, cat_cols, sparse=False)),
+            ("reg", ML.REGRESSORS[name](**params)),
+        ])
+        start = time.perf_counter()
+        pipeline.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+
+        prefix = os.path.join(tmp_dir, name)
+        if explain.is_linear(pipeline):
+            model_format.export_linear_pipeline(pipeline, prefix)
+        else:
+            model_format.export_tree_pipeline(pipeline, prefix)
+        served = model_format.load(prefix)
+
+        preds = pipeline.predict(X_test)
+        results.append({
+            "Engine": name,
+            "RMSE": np.sqrt(mean_squared_error(y_test, preds)),
+            "R2": r2_score(y_test, preds),
+            "Fit_s": fit_seconds,
+            "Max_Diff": float(np.abs(served.predict(batch) - pipeline.predict(batch)).max()),
+            "Single_ms_Sklearn": median_ms(lambda: pipeline.predict(single), SINGLE_ROUNDS),
+            "Single_ms_Artifact": median_ms(lambda: served.predict(single), SINGLE_ROUNDS),
+            f"Batch{BATCH_ROWS // 1000}k_ms_Sklearn": median_ms(lambda: pipeline.predict(batch), BATCH_ROUNDS),
+            f"Batch{BATCH_ROWS // 1000}k_ms_Artifact": median_ms(lambda: served.predict(batch), BATCH_ROUNDS),
+        })
+
+    results_df = pd.DataFrame(results)
+    print("\nMODEL ENGINE BENCHMARK (hold-out 20%)")
+    print(results_df.round({"RMSE": 3, "R2": 4, "Fit_s": 2}).round(3).to_string(index=False))
+    return results_df
+
+if __name__ == "__main__":
+    benchmark_gbdt_engines()
@@ -0,0 +1,303 @@
+import os
+import sys
+import json
+import math
+import time
+import hashlib
+import threading
+import functools
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import ElasticNet, HuberRegressor, Lasso, LinearRegression, Ridge
+from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+from sklearn.model_selection import KFold
+from threadpoolctl import threadpool_limits
+import warnings
+warnings.filterwarnings('ignore')
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+import ML
+import preprocessing
+
+# Successive-halving search over the models the benchmark scripts compare with
+# fixed settings. N_CONFIGS random configurations start on a small slice of
+# every training fold; after each rung only the best 1/ETA (by mean CV RMSE)
+# move on to ETA times more rows, until the last rung trains on the full fold.
+# Every (config, rung, fold) fit is one task in a process pool. The fold
+# matrices are preprocessed once and cached as .npy files that each worker
+# memory-maps. Finished tasks are appended to a checkpoint, so re-running the
+# script after an interruption only fits what is missing. Once BUDGET_SECONDS
+# have passed the search cancels queued fits and ranks what has finished; fits
+# already running can't be interrupted, so they are checkpointed as they end
+# (in the background, after the report) for the next run to pick up.
+N_CONFIGS = int(os.getenv("TUNING_CONFIGS", "27"))
+ETA = 3
+N_FOLDS = 5
+MIN_ROWS = int(os.getenv("TUNING_MIN_ROWS", "500"))
+BUDGET_SECONDS = float(os.getenv("TUNING_BUDGET_SECONDS", "600"))
+WORKERS = int(os.getenv("SEARCH_WORKERS", str(os.cpu_count() or 1)))
+SEED = 42
+CACHE_DIR = os.getenv("TUNING_CACHE_DIR", os.path.join(BASE_DIR, "data", "tuning_cache"))
+CHECKPOINT_PATH = os.getenv("TUNING_CHECKPOINT_PATH", os.path.join(BASE_DIR, "data", "tuning_checkpoint.jsonl"))
+REPORT_PATH = os.getenv("TUNING_REPORT_PATH", os.path.join(BASE_DIR, "data", "tuning_report.json"))
+
+def _log_uniform(rng, low, high):
+    return float(np.exp(rng.uniform(np.log(low), np.log(high))))
+
+# name -> (estimator factory, parameter sampler); the same lists as the benchmark scripts
+SEARCH_SPACE = {
+    "LinearRegression": (LinearRegression, lambda rng: {}),
+    "Ridge": (Ridge, lambda rng: {"alpha": _log_uniform(rng, 1e-3, 100)}),
+    "Lasso": (Lasso, lambda rng: {"alpha": _log_uniform(rng, 1e-4, 1), "max_iter": 5000}),
+    "ElasticNet": (ElasticNet, lambda rng: {"alpha": _log_uniform(rng, 1e-4, 1),
+                                            "l1_ratio": float(rng.uniform(0.05, 0.95)), "max_iter": 5000}),
+    "HuberRegressor": (HuberRegressor, lambda rng: {"epsilon": float(rng.uniform(1.1, 2.5)),
+                                                    "alpha": _log_uniform(rng, 1e-6, 1e-1), "max_iter": 1000}),
+    "RandomForestRegressor": (RandomForestRegressor, lambda rng: {
+        "n_estimators": int(rng.choice([100, 200, 400])), "max_depth": int(rng.choice([6, 10, 16, 24])),
+        "min_samples_leaf": int(rng.choice([1, 2, 5, 10])), "max_features": float(rng.choice([0.3, 0.5, 1.0])),
+        "random_state": SEED}),
+    "GradientBoostingRegressor": (GradientBoostingRegressor, lambda rng: {
+        "n_estimators": int(rng.choice([100, 300, 600])), "learning_rate": _log_uniform(rng, 0.01, 0.3),
+        "max_depth": int(rng.integers(2, 6)), "subsample": float(rng.uniform(0.6, 1.0)), "random_state": SEED}),
+    "HistGradientBoostingRegressor": (HistGradientBoostingRegressor, lambda rng: {
+        "max_iter": int(rng.choice([100, 300, 600])), "learning_rate": _log_uniform(rng, 0.01, 0.3),
+        "max_leaf_nodes": int(rng.choice([7, 15, 31, 63])), "min_samples_leaf": int(rng.choice([5, 20, 50])),
+        "l2_regularization": _log_uniform(rng, 1e-4, 10), "random_state": SEED}),
+}
+
+# Boosting libraries are optional here; the search covers whichever are installed
+try:
+    import xgboost as xgb
+    SEARCH_SPACE["XGBRegressor"] = (xgb.XGBRegressor, lambda rng: {
+        "n_estimators": int(rng.choice([100, 300, 600])), "learning_rate": _log_uniform(rng, 0.01, 0.3),
+        "max_depth": int(rng.integers(2, 9)), "subsample": float(rng.uniform(0.6, 1.0)),
+        "objective": "reg:squarederror", "random_state": SEED, "n_jobs": 1})
+except ImportError:
+    pass
+try:
+    import lightgbm as lgb
+    SEARCH_SPACE["LGBMRegressor"] = (lgb.LGBMRegressor, lambda rng: {
+        "n_estimators": int(rng.choice([100, 300, 600])), "learning_rate": _log_uniform(rng, 0.01, 0.3),
+        "num_leaves": int(rng.choice([7, 15, 31, 63])), "min_child_samples": int(rng.choice([5, 20, 50])),
+        "random_state": SEED, "n_jobs": 1, "verbose": -1})
+except ImportError:
+    pass
+try:
+    from catboost import CatBoostRegressor
+    SEARCH_SPACE["CatBoostRegressor"] = (CatBoostRegressor, lambda rng: {
+        "iterations": int(rng.choice([100, 300, 600])), "learning_rate": _log_uniform(rng, 0.01, 0.3),
+        "depth": int(rng.integers(3, 9)), "random_state": SEED, "verbose": 0, "thread_count": 1})
+except ImportError:
+    pass
+
+def sample_configs(n, seed=SEED):
+    """n (estimator, params) pairs, round-robin over the estimators; deterministic for a seed."""
+    rng = np.random.default_rng(seed)
+    names = list(SEARCH_SPACE)
+    return [{"id": i, "estimator": names[i % len(names)], "params": SEARCH_SPACE[names[i % len(names)]][1](rng)}
+            for i in range(n)]
+
+def rung_rows(n_train):
+    """Training rows per rung: ETA-fold steps that end on the full training fold."""
+    n_rungs = max(1, int(math.floor(math.log(max(n_train / MIN_ROWS, 1), ETA))) + 1)
+    return [int(n_train / ETA ** (n_rungs - 1 - r)) for r in range(n_rungs)]
+
+def data_signature(path):
+    st = os.stat(path)
+    key = f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}:{N_FOLDS}:{SEED}:{N_CONFIGS}:{MIN_ROWS}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+def build_fold_cache(df, cache_dir):
+    """Preprocesses every fold once (preprocessor fitted on the training part only) into .npy files."""
+    if os.path.exists(os.path.join(cache_dir, "done")):
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    y = df["Exam_Score"].to_numpy(dtype=np.float64)
+    X = df.drop(columns=["Exam_Score"])
+    num_cols = X.select_dtypes(include=[np.number]).columns.tolist()
+    cat_cols = X.select_dtypes(exclude=[np.number]).columns.tolist()
+    folds = KFold(n_splits=N_FOLDS, shuffle=True, random_state=SEED).split(X)
+    for k, (train_idx, test_idx) in enumerate(folds):
+        prep = preprocessing.build_preprocessor(num_cols, cat_cols, sparse=False)
+        # Shuffled once so every rung's slice is a random subset, and each rung's rows extend the last's
+        train_idx = np.random.default_rng(SEED + k).permutation(train_idx)
+        np.save(os.path.join(cache_dir, f"fold{k}_X_train.npy"), prep.fit_transform(X.iloc[train_idx]))
+        np.save(os.path.join(cache_dir, f"fold{k}_X_test.npy"), prep.transform(X.iloc[test_idx]))
+        np.save(os.path.join(cache_dir, f"fold{k}_y_train.npy"), y[train_idx])
+        np.save(os.path.join(cache_dir, f"fold{k}_y_test.npy"), y[test_idx])
+    open(os.path.join(cache_dir, "done"), "w").close()
+
+# Per worker: the cache directory and the folds memory-mapped from it so far
+_cache_dir = None
+_folds = {}
+
+def _init_worker(cache_dir):
+    global _cache_dir
+    _cache_dir = cache_dir
+    # One process per core already, don't let each fit spawn a BLAS/OpenMP team too
+    threadpool_limits(limits=1)
+
+def _fold(k):
+    if k not in _folds:
+        _folds[k] = [np.load(os.path.join(_cache_dir, f"fold{k}_{part}.npy"), mmap_mode="r")
+                     for part in ("X_train", "X_test", "y_train", "y_test")]
+    return _folds[k]
+
+def _evaluate(config, rows, k):
+    """Fits one config on the first `rows` training rows of fold k; metrics on the whole test fold."""
+    X_train, X_test, y_train, y_test = _fold(k)
+    start = time.perf_counter()
+    model = SEARCH_SPACE[config["estimator"]][0](**config["params"])
+    model.fit(np.asarray(X_train[:rows]), np.asarray(y_train[:rows]))
+    preds = model.predict(np.asarray(X_test))
+    return {
+        "rmse": float(np.sqrt(mean_squared_error(y_test, preds))),
+        "mae": float(mean_absolute_error(y_test, preds)),
+        "r2": float(r2_score(y_test, preds)),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+def load_checkpoint(signature):
+    """{(config id, rung, fold): metrics} from earlier runs over the same data and settings."""
+    done = {}
+    if not os.path.exists(CHECKPOINT_PATH):
+        return done
+    with open(CHECKPOINT_PATH) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn last line from an interrupted run
+            if record.get("signature") == signature:
+                done[(record["config"], record["rung"], record["fold"])] = record["metrics"]
+    return done
+
+_checkpoint_lock = threading.Lock()
+
+def _checkpoint(signature, config_id, rung, k, future):
+    """Done-callback that appends a finished fit to the checkpoint, even one that ends after the budget."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    record = {"signature": signature, "config": config_id, "rung": rung, "fold": k, "metrics": future.result()}
+    with _checkpoint_lock, open(CHECKPOINT_PATH, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+def _summarise(config, rung, rows, done):
+    folds = [done[(config["id"], rung, k)] for k in range(N_FOLDS) if (config["id"], rung, k) in done]
+    return {
+        **config, "rung": rung, "rows": rows, "folds": len(folds),
+        **{m: float(np.mean([f[m] for f in folds])) if folds else None for m in ("rmse", "mae", "r2")},
+    }
+
+def run_hyperparameter_search():
+    deadline = time.monotonic() + BUDGET_SECONDS
+    print(f"Loading {ML.DATA_PATH}...")
+    df = pd.read_csv(ML.DATA_PATH)
+    signature = data_signature(ML.DATA_PATH)
+    cache_dir = os.path.join(CACHE_DIR, signature)
+    print(f"Caching {N_FOLDS} preprocessed folds in {cache_dir}...")
+    build_fold_cache(df, cache_dir)
+
+    n_train = len(np.load(os.path.join(cache_dir, "fold0_y_train.npy"), mmap_mode="r"))
+    rungs = rung_rows(n_train)
+    configs = sample_configs(N_CONFIGS)
+    done = load_checkpoint(signature)
+    if done:
+        print(f"Resuming: {len(done)} fits already in {CHECKPOINT_PATH}")
+    print(f"{N_CONFIGS} configs over {sorted(SEARCH_SPACE)}; rungs train on {rungs} rows; "
+          f"budget {BUDGET_SECONDS:.0f}s on {WORKERS} workers")
+
+    context = mp.get_context("fork") if "fork" in mp.get_all_start_methods() else None
+    survivors, finished_rungs, out_of_time = configs, [], False
+    os.makedirs(os.path.dirname(CHECKPOINT_PATH) or ".", exist_ok=True)
+    pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=context,
+                               initializer=_init_worker, initargs=(cache_dir,))
+    try:
+        for rung, rows in enumerate(rungs):
+            pending = {}
+            for c in survivors:
+                for k in range(N_FOLDS):
+                    if (c["id"], rung, k) not in done:
+                        future = pool.submit(_evaluate, c, rows, k)
+                        future.add_done_callback(functools.partial(_checkpoint, signature, c["id"], rung, k))
+                        pending[future] = (c["id"], k)
+            while pending:
+                finished, _ = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    config_id, k = pending.pop(future)
+                    done[(config_id, rung, k)] = future.result()
+                if time.monotonic() >= deadline:
+                    for future in pending:
+                        future.cancel()  # only succeeds for fits that haven't started
+                    running = sum(future.running() for future in pending)
+                    if running:
+                        print(f"Budget reached with {running} fits running; they are checkpointed when they finish.")
+                    out_of_time = True
+                    break
+
+            summaries = [_summarise(c, rung, rows, done) for c in survivors]
+            complete = sorted((s for s in summaries if s["folds"] == N_FOLDS), key=lambda s: s["rmse"])
+            if complete:
+                finished_rungs.append(complete)
+                best = complete[0]
+                print(f"  rung {rung} ({rows:,} rows): {len(complete)}/{len(survivors)} configs scored, "
+                      f"best {best['estimator']} RMSE={best['rmse']:.3f}")
+            if out_of_time or rung == len(rungs) - 1:
+                break
+            keep = max(1, len(survivors) // ETA)
+            survivors = [c for c in configs if c["id"] in {s["id"] for s in complete[:keep]}]
+    finally:
+        # Out of time: drop queued fits and don't block on running ones (their callbacks still checkpoint them)
+        pool.shutdown(wait=not out_of_time, cancel_futures=True)
+
+    if not finished_rungs:
+        print("Budget ran out before any config finished all folds; re-run to resume.")
+        return None
+    if out_of_time:
+        print(f"Budget of {BUDGET_SECONDS:.0f}s reached; ranking the highest rung that finished. Re-run to resume.")
+    ranking = finished_rungs[-1]
+    report = {
+        "signature": signature,
+        "rungRows": rungs,
+        "folds": N_FOLDS,
+        "eta": ETA,
+        "complete": not out_of_time and len(finished_rungs) == len(rungs),
+        "rungs": finished_rungs,
+        "winner": ranking[0],
+        "exported": export_winner(ranking),
+    }
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {REPORT_PATH}")
+    return report
+
+def export_winner(ranking):
+    """Writes the best config ML can train to ML.REGRESSOR_CONFIG_PATH; picked up on the next retrain."""
+    usable = [s for s in ranking if s["estimator"] in ML.REGRESSORS]
+    if not usable:
+        print(f"No config in the final rung is one ML can train ({sorted(ML.REGRESSORS)}); nothing exported.")
+        return None
+    best = usable[0]
+    if best is not ranking[0]:
+        print(f"Overall winner {ranking[0]['estimator']} isn't supported by ML; exporting {best['estimator']}.")
+    config = {
+        "estimator": best["estimator"],
+        "params": best["params"],
+        "cvRmse": round(best["rmse"], 4),
+        "cvR2": round(best["r2"], 4),
+        "trainRows": best["rows"],
+        "source": "Benchmarking/hyperparameter_search.py",
+    }
+    os.makedirs(os.path.dirname(ML.REGRESSOR_CONFIG_PATH), exist_ok=True)
+    with open(ML.REGRESSOR_CONFIG_PATH, "w") as f:
+        json.dump(config, f, indent=2)
+    print(f"Exported {best['estimator']} {best['params']} (CV RMSE {best['rmse']:.3f}) to {ML.REGRESSOR_CONFIG_PATH}")
+    return config
+
+if __name__ == "__main__":
+    run_hyperparameter_search()
@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+import joblib
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+import ML
+import clustering
+import model_format
+
+# Pickled sklearn models vs. the model_format artifacts exported from them:
+# load latency in a warm process, the cold-start footprint of a fresh
+# interpreter that only loads the models, and prediction agreement/throughput.
+LOAD_ROUNDS = int(os.getenv("BENCH_LOAD_ROUNDS", "20"))
+PREDICT_ROWS = int(os.getenv("BENCH_PREDICT_ROWS", "100000"))
+
+# Run in a fresh interpreter: argv = [mode, huber pickle/prefix, kmeans pickle/prefix, preprocessor pickle]
+FOOTPRINT_SCRIPT = """
+import sys, time, json
+def peak_rss_mb():
+    with open("/proc/self/status") as f:  # Linux only
+        return next(int(line.split()[1]) for line in f if line.startswith("VmHWM")) / 1024
+
+start = time.perf_counter()
+mode = sys.argv[1]
+if mode == "joblib":
+    import joblib
+    models = [joblib.load(sys.argv[2]), joblib.load(sys.argv[3]), joblib.load(sys.argv[4])]
+else:
+    sys.path.insert(0, sys.argv[5])
+    import model_format
+    models = [model_format.load(sys.argv[2]), model_format.load(sys.argv[3])]
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "modules": len(sys.modules),
+    "sklearn_imported": "sklearn" in sys.modules,
+    "peak_rss_mb": peak_rss_mb(),
+}))
+"""
+
+def export_artifacts(tmp_dir):
+    pipeline = joblib.load(ML.MODEL_PATH)
+    preprocessor = joblib.load(clustering.PREPROCESSOR_PATH)
+    kmeans = joblib.load(clustering.KMEANS_PATH)
+    huber_prefix = os.path.join(tmp_dir, "huber_pipeline")
+    kmeans_prefix = os.path.join(tmp_dir, "kmeans_model")
+    model_format.export_linear_pipeline(pipeline, huber_prefix)
+    model_format.export_kmeans(preprocessor, kmeans, kmeans_prefix)
+    return pipeline, preprocessor, kmeans, huber_prefix, kmeans_prefix
+
+def time_loads(load):
+    start = time.perf_counter()
+    for _ in range(LOAD_ROUNDS):
+        load()
+    return (time.perf_counter() - start) / LOAD_ROUNDS * 1000
+
+def footprint(mode, huber, kmeans):
+    args = [sys.executable, "-c", FOOTPRINT_SCRIPT, mode, huber, kmeans, clustering.PREPROCESSOR_PATH, BACKEND_DIR]
+    return json.loads(subprocess.run(args, capture_output=True, text=True, check=True).stdout)
+
+def benchmark_model_format():
+    tmp_dir = tempfile.mkdtemp(prefix="model_format_bench_")
+    pipeline, preprocessor, kmeans, huber_prefix, kmeans_prefix = export_artifacts(tmp_dir)
+
+    print(f"Timing {LOAD_ROUNDS} loads of each format...")
+    loads = pd.DataFrame([
+        {"Format": "joblib pickles", "Load_ms": time_loads(lambda: (joblib.load(ML.MODEL_PATH),
+                                                                     joblib.load(clustering.PREPROCESSOR_PATH),
+                                                                     joblib.load(clustering.KMEANS_PATH)))},
+        {"Format": "artifact (checksum)", "Load_ms": time_loads(lambda: (model_format.load(huber_prefix, verify=True),
+                                                                          model_format.load(kmeans_prefix, verify=True)))},
+        {"Format": "artifact (no checksum)", "Load_ms": time_loads(lambda: (model_format.load(huber_prefix, verify=False),
+                                                                             model_format.load(kmeans_prefix, verify=False)))},
+    ])
+
+    print("Measuring cold-start footprint in fresh interpreters...")
+    cold = pd.DataFrame([
+        {"Format": "joblib pickles", **footprint("joblib", ML.MODEL_PATH, clustering.KMEANS_PATH)},
+        {"Format": "artifact", **footprint("artifact", huber_prefix, kmeans_prefix)},
+    ])
+
+    print(f"Predicting {PREDICT_ROWS:,} rows with both...")
+    ml_rows = pd.read_csv(ML.DATA_PATH).drop(columns=["Exam_Score"])
+    ml_rows = ml_rows.sample(n=PREDICT_ROWS, replace=True, random_state=42).reset_index(drop=True)
+    cluster_rows = pd.read_csv(clustering.DATA_PATH).drop(columns=clustering.NON_FEATURE_COLS, errors="ignore")
+    cluster_rows = cluster_rows.sample(n=PREDICT_ROWS, replace=True, random_state=42).reset_index(drop=True)
+    huber, centroids = model_format.load(huber_prefix), model_format.load(kmeans_prefix)
+
+    def timed(predict):
+        start = time.perf_counter()
+        out = predict()
+        return out, time.perf_counter() - start
+
+    sk_scores, sk_score_s = timed(lambda: pipeline.predict(ml_rows))
+    lite_scores, lite_score_s = timed(lambda: huber.predict(ml_rows))
+    sk_clusters, sk_cluster_s = timed(lambda: kmeans.predict(preprocessor.transform(cluster_rows)))
+    lite_clusters, lite_cluster_s = timed(lambda: centroids.predict(cluster_rows))
+    _, sk_single_s = timed(lambda: pipeline.predict(ml_rows.iloc[:1]))
+    _, lite_single_s = timed(lambda: huber.predict(ml_rows.iloc[:1]))
+    predictions = pd.DataFrame([
+        {"Model": "Huber", "Sklearn_s": sk_score_s, "Artifact_s": lite_score_s,
+         "Single_Row_ms_Sklearn": sk_single_s * 1000, "Single_Row_ms_Artifact": lite_single_s * 1000,
+         "Agreement": f"max |diff| {np.abs(sk_scores - lite_scores).max():.2e}"},
+        {"Model": "KMeans", "Sklearn_s": sk_cluster_s, "Artifact_s": lite_cluster_s,
+         "Agreement": f"{(sk_clusters == lite_clusters).mean():.2%} same cluster"},
+    ])
+
+    print("\nMODEL LOAD (warm process, per load of all models)")
+    print(loads.round(2).to_string(index=False))
+    print("\nCOLD START (fresh interpreter: imports + load)")
+    print(cold.round(2).to_string(index=False))
+    print("\nPREDICTION")
+    print(predictions.round(4).to_string(index=False))
+    return loads, cold, predictions
+
+if __name__ == "__main__":
+    benchmark_model_format()
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import threading
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")  # gemini_service refuses to import without one
+
+import main
+import batching
+
+# CLIENTS threads each post REQUESTS_PER_CLIENT /api/predict and /api/what-if
+# calls back to back through the Flask app, once with every request running
+# its own model calls and once per micro-batching window. Reports throughput
+# and the latency percentiles a client sees.
+CLIENTS = int(os.getenv("BENCH_CLIENTS", "500"))
+REQUESTS_PER_CLIENT = int(os.getenv("BENCH_REQUESTS_PER_CLIENT", "4"))
+WINDOWS_MS = [0, 2, 5]
+
+def student(rng):
+    return {"hoursStudied": int(rng.integers(5, 40)), "attendance": int(rng.integers(60, 100)),
+            "sleepHours": int(rng.integers(4, 10)), "tutoringSessions": int(rng.integers(0, 5)),
+            "previousScores": int(rng.integers(50, 100)), "physicalActivity": int(rng.integers(0, 6)),
+            "Motivation_Level": str(rng.choice(["Low", "Medium", "High"]))}
+
+def client_loop(seed, start_barrier, latencies, errors):
+    rng = np.random.default_rng(seed)
+    client = main.app.test_client()
+    start_barrier.wait()
+    for i in range(REQUESTS_PER_CLIENT):
+        data = student(rng)
+        started = time.perf_counter()
+        if i % 2:
+            resp = client.post("/api/what-if", json={"original": data, "changes": {"hoursStudied": 30}})
+        else:
+            resp = client.post("/api/predict", json=data)
+        latencies.append(time.perf_counter() - started)
+        if resp.status_code != 200:
+            errors.append(resp.status_code)
+
+def run(window_ms):
+    main.student_batcher = batching.MicroBatcher("predict", main._score_students, window_ms=window_ms)
+    latencies, errors = [], []
+    barrier = threading.Barrier(CLIENTS + 1)
+    threads = [threading.Thread(target=client_loop, args=(seed, barrier, latencies, errors))
+               for seed in range(CLIENTS)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    ms = np.array(latencies) * 1000
+    return {"Window_ms": window_ms, "Requests": len(latencies), "Errors": len(errors),
+            "Req_per_s": len(latencies) / elapsed, "p50_ms": np.percentile(ms, 50),
+            "p99_ms": np.percentile(ms, 99), "max_ms": ms.max()}
+
+def benchmark_batching():
+    threading.stack_size(512 * 1024)  # 500 threads
+    client = main.app.test_client()
+    client.post("/api/predict", json=student(np.random.default_rng(0)))  # warm lazy loads
+    results = pd.DataFrame([run(window) for window in WINDOWS_MS])
+    print(f"\nPREDICT MICRO-BATCHING ({CLIENTS} concurrent clients, {REQUESTS_PER_CLIENT} requests each)")
+    print(results.round(1).to_string(index=False))
+    return results
+
+if __name__ == "__main__":
+    benchmark_batching()
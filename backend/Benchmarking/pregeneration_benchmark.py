@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")  # gemini_service refuses to import without one
+os.environ.setdefault("PREGEN_FAKE_LATENCY_MS", "1500")  # roughly one Gemini explanation
+os.environ["PREGEN_MODEL"] = "fake"
+os.environ["PREGEN_ENABLED"] = "0"  # runs are started by hand below, not by requests
+
+import main
+import pregenerate
+import clustering
+
+# Pre-generates explanations and strategies for STUDENTS at-risk students with
+# the fake model (PREGEN_FAKE_LATENCY_MS per call) at several pool sizes, then
+# times opening one of them through /api/gemini/explain-student once it is
+# stored, against the model latency a request used to wait for.
+STUDENTS = int(os.getenv("BENCH_STUDENTS", "20"))
+WORKER_COUNTS = [1, 2, 4, 8]
+LOOKUPS = 50
+
+def benchmark_pregeneration():
+    runs = []
+    for workers in WORKER_COUNTS:
+        pregenerate.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="pregen_bench_"), "pregenerated.db")
+        start = time.perf_counter()
+        stats = pregenerate.run(workers=workers, rate_per_minute=0, max_students=STUDENTS)
+        runs.append({"Workers": workers, "Calls": stats["generated"], "Wall_s": time.perf_counter() - start})
+    runs = pd.DataFrame(runs)
+
+    client = main.app.test_client()
+    index = clustering.get_at_risk_indices(1)[0]
+    student = client.get(f"/api/student/{index}").get_json()
+    latencies = []
+    for _ in range(LOOKUPS):
+        start = time.perf_counter()
+        response = client.post("/api/gemini/explain-student", json={"student_data": student, "student_index": index})
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.get_json().get("pregenerated"), "explanation was not served from the store"
+    opening = pd.DataFrame([
+        {"Path": "model call (fake latency)", "ms": float(os.environ["PREGEN_FAKE_LATENCY_MS"])},
+        {"Path": "pre-generated, p50", "ms": np.percentile(latencies, 50)},
+        {"Path": "pre-generated, p99", "ms": np.percentile(latencies, 99)},
+    ])
+
+    print(f"\nPRE-GENERATION OF {STUDENTS} AT-RISK STUDENTS (2 prompts each, "
+          f"{os.environ['PREGEN_FAKE_LATENCY_MS']} ms per call)")
+    print(runs.round(2).to_string(index=False))
+    print("\nOPENING AN AT-RISK STUDENT'S EXPLANATION")
+    print(opening.round(2).to_string(index=False))
+    return runs, opening
+
+if __name__ == "__main__":
+    benchmark_pregeneration()
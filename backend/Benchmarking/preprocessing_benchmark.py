@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ML
+import clustering
+
+# Compares the original dense float64 layout against SPARSE_PREPROCESSING's
+# CSR + float32 layout on a resampled copy of the training data.
+N_ROWS = int(os.getenv("BENCH_ROWS", "1000000"))
+
+def measure(fit):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fit()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 ** 2
+
+def benchmark_preprocessing():
+    print(f"Generating {N_ROWS:,} rows...")
+    df = pd.read_csv('data/optimised_final_dataset.csv').sample(n=N_ROWS, replace=True, random_state=42).reset_index(drop=True)
+    y = df['Exam_Score']
+    X = df.drop(columns=['Exam_Score'])
+    num_cols = X.select_dtypes(include=[np.number]).columns.tolist()
+    cat_cols = X.select_dtypes(exclude=[np.number]).columns.tolist()
+
+    results = []
+    for sparse in (False, True):
+        layout = "sparse/float32" if sparse else "dense/float64"
+
+        print(f"Fitting Huber pipeline ({layout})...")
+        pipeline = ML._build_pipeline(num_cols, cat_cols, sparse=sparse)
+        elapsed, peak = measure(lambda: pipeline.fit(X, y))
+        results.append({"Model": "Huber", "Layout": layout, "Fit_Seconds": elapsed, "Peak_MB": peak})
+
+        print(f"Fitting KMeans ({layout})...")
+        preprocessor = clustering._make_preprocessor(X, sparse=sparse)
+        kmeans = KMeans(n_clusters=clustering.N_CLUSTERS, init='k-means++', random_state=42)
+        elapsed, peak = measure(lambda: kmeans.fit(preprocessor.fit_transform(X)))
+        results.append({"Model": "KMeans", "Layout": layout, "Fit_Seconds": elapsed, "Peak_MB": peak})
+
+        matrix = preprocessor.transform(X.head(100_000))
+        nbytes = matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes if sparse else matrix.nbytes
+        print(f"  Training matrix per 100k rows: {nbytes / 1024 ** 2:.1f} MB")
+
+    results_df = pd.DataFrame(results).round(2)
+    print("\nPREPROCESSING LAYOUT BENCHMARK")
+    print(results_df.to_string(index=False))
+    return results_df
+
+if __name__ == "__main__":
+    benchmark_preprocessing()
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import aggregates
+import clustering
+import rollups
+import schema
+
+# A district of SCHOOLS schools x GRADES grades x CLASSES_PER_GRADE classes
+# holding STUDENTS students sampled from the dashboard data. Compares answering
+# each level by scanning its students against reading the rollup node, and
+# folding an upload of UPLOAD_ROWS students into the tree against rebuilding it.
+STUDENTS = int(os.getenv("BENCH_STUDENTS", "200000"))
+SCHOOLS = int(os.getenv("BENCH_SCHOOLS", "8"))
+GRADES = 6
+CLASSES_PER_GRADE = 4
+UPLOAD_ROWS = 1000
+ROUNDS = 5
+
+def district_frame():
+    frame = schema.read_csv(clustering.DATA_PATH).sample(n=STUDENTS, replace=True, random_state=42)
+    frame = frame.reset_index(drop=True)
+    rng = np.random.default_rng(42)
+    frame["School"] = np.array([f"school-{i}" for i in range(SCHOOLS)])[rng.integers(0, SCHOOLS, STUDENTS)]
+    sections = np.array([f"{7 + g}-{'ABCD'[c]}" for g in range(GRADES) for c in range(CLASSES_PER_GRADE)])
+    frame["Class_Section"] = pd.Categorical(sections[rng.integers(0, len(sections), STUDENTS)])
+    return frame
+
+def district_leaves(frame):
+    leaves = {}
+    for school_id, rows in frame.groupby("School"):
+        leaves.update(rollups.leaf_partials(rows, school_id))
+    return leaves
+
+def timed_ms(run):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        run()
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+def benchmark_rollups():
+    frame = district_frame()
+    tree = rollups.RollupTree(district_leaves(frame))
+    school_rows = (frame["School"] == "school-0").to_numpy()
+    grade_rows = school_rows & schema.mask_isin(frame["Class_Section"], ["7-A", "7-B", "7-C", "7-D"])
+    class_rows = school_rows & schema.mask_equal(frame["Class_Section"], "7-A")
+    levels = [("district", (), np.ones(len(frame), dtype=bool)), ("school", ("school-0",), school_rows),
+              ("grade", ("school-0", "7"), grade_rows), ("class", ("school-0", "7", "7-A"), class_rows)]
+    queries = pd.DataFrame([{
+        "Level": level,
+        "Students": int(rows.sum()),
+        "Scan_ms": timed_ms(lambda: aggregates.finalize(aggregates.partial_aggregate(frame[rows]))),
+        "Rollup_ms": timed_ms(lambda: aggregates.finalize(tree.get(path))),
+    } for level, path, rows in levels])
+    queries["Speedup"] = queries["Scan_ms"] / queries["Rollup_ms"]
+
+    # An upload lands in one school: its old rows come out and the new ones go in
+    removed = frame[school_rows].sample(n=UPLOAD_ROWS, random_state=1)
+    added = removed.assign(Exam_Score=np.clip(removed["Exam_Score"].astype(int) + 5, 0, 100))
+    uploads = pd.DataFrame([{
+        "Upload": f"replace {UPLOAD_ROWS} students in one school",
+        "Rebuild_ms": timed_ms(lambda: rollups.RollupTree(district_leaves(frame))),
+        "Propagate_ms": timed_ms(lambda: tree.update(removed=rollups.leaf_partials(removed, "school-0"),
+                                                     added=rollups.leaf_partials(added, "school-0"))),
+    }])
+    uploads["Speedup"] = uploads["Rebuild_ms"] / uploads["Propagate_ms"]
+
+    print(f"\nROLLUP QUERIES ({STUDENTS:,} students, {SCHOOLS} schools x {GRADES} grades x {CLASSES_PER_GRADE} classes)")
+    print(queries.round(3).to_string(index=False))
+    print("\nROLLUP MAINTENANCE")
+    print(uploads.round(2).to_string(index=False))
+    return queries, uploads
+
+if __name__ == "__main__":
+    benchmark_rollups()
@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ML
+import clustering
+import fairness
+import schema
+
+# Default pandas dtypes vs. the schema registry for every frame the backend
+# keeps resident: deep memory per STUDENTS rows, and the time of the equality
+# filters the dashboard runs on every request.
+STUDENTS = int(os.getenv("BENCH_STUDENTS", "100000"))
+FILTER_ROUNDS = 20
+
+DATASETS = {
+    "df_ml": ML.DATA_PATH,
+    "df_reference": ML.REFERENCE_DATA_PATH,
+    "df_cluster": clustering.DATA_PATH,
+    "df_raw": clustering.RAW_DATA_PATH,
+}
+
+def scaled(frame):
+    return frame.sample(n=STUDENTS, replace=True, random_state=42).reset_index(drop=True)
+
+def with_classes(frame):
+    frame = frame.copy()
+    frame["Class_Section"] = np.array(["10-A", "10-B", "10-C"], dtype=object)[np.arange(len(frame)) % 3]
+    return frame
+
+def timed_ms(run):
+    start = time.perf_counter()
+    for _ in range(FILTER_ROUNDS):
+        run()
+    return (time.perf_counter() - start) / FILTER_ROUNDS * 1000
+
+def benchmark_schema():
+    memory = []
+    frames = {}
+    for name, path in DATASETS.items():
+        plain = scaled(pd.read_csv(path))
+        compact = schema.compact(plain)
+        frames[name] = (plain, compact)
+        plain_mb = plain.memory_usage(deep=True).sum() / 1e6
+        compact_mb = compact.memory_usage(deep=True).sum() / 1e6
+        memory.append({"Frame": name, "Default_MB": plain_mb, "Schema_MB": compact_mb,
+                       "Factor": plain_mb / compact_mb})
+    memory = pd.DataFrame(memory)
+
+    plain, compact = (with_classes(f) for f in frames["df_cluster"])
+    plain_raw, compact_raw = frames["df_raw"]
+    at_risk = ["The Disengaged Learner", "The Overworked Achiever"]
+    filters = pd.DataFrame([
+        {"Filter": "class == 10-B",
+         "Default_ms": timed_ms(lambda: plain[plain["Class_Section"] == "10-B"]),
+         "Schema_ms": timed_ms(lambda: compact[schema.mask_equal(compact["Class_Section"], "10-B")])},
+        {"Filter": "persona in at-risk",
+         "Default_ms": timed_ms(lambda: plain["Persona_Cluster"].isin(at_risk).sum()),
+         "Schema_ms": timed_ms(lambda: schema.mask_isin(compact["Persona_Cluster"], at_risk).sum())},
+        {"Filter": "disabilities == Yes",
+         "Default_ms": timed_ms(lambda: (plain_raw["Learning_Disabilities"] == "Yes").sum()),
+         "Schema_ms": timed_ms(lambda: schema.mask_equal(compact_raw["Learning_Disabilities"], "Yes").sum())},
+        {"Filter": "fairness contingency groupby",
+         "Default_ms": timed_ms(lambda: fairness.build_contingency_tensor(plain)),
+         "Schema_ms": timed_ms(lambda: fairness.build_contingency_tensor(compact))},
+    ])
+    filters["Speedup"] = filters["Default_ms"] / filters["Schema_ms"]
+
+    print(f"\nRESIDENT MEMORY ({STUDENTS:,} students, deep)")
+    print(memory.round(2).to_string(index=False))
+    print(f"Total: {memory['Default_MB'].sum():.1f} MB -> {memory['Schema_MB'].sum():.1f} MB "
+          f"({memory['Default_MB'].sum() / memory['Schema_MB'].sum():.1f}x)")
+    print("\nFILTERS (ms per call)")
+    print(filters.round(2).to_string(index=False))
+    return memory, filters
+
+if __name__ == "__main__":
+    benchmark_schema()
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")  # gemini_service refuses to import without one
+
+import main
+import metrics
+
+STUDENT = {"hoursStudied": 18, "attendance": 85, "sleepHours": 7, "tutoringSessions": 1,
+           "previousScores": 72, "physicalActivity": 3, "Motivation_Level": "Medium"}
+
+WORKLOAD = [
+    ("POST", "/api/predict", STUDENT),
+    ("POST", "/api/what-if", {"original": STUDENT, "changes": {"hoursStudied": 24}}),
+    ("GET", "/api/students?className=10-A", None),
+    ("GET", "/api/clusters?className=10-B", None),
+    ("GET", "/api/summary-report", None),
+    ("GET", "/api/fairness-audit?className=10-C", None),
+    ("GET", "/api/early-warnings", None),
+    ("GET", "/api/student/42", None),
+]
+
+def run_workload(client, rounds):
+    """Returns per-request latencies (seconds) for `rounds` passes over the workload."""
+    latencies = []
+    for _ in range(rounds):
+        for method, path, body in WORKLOAD:
+            start = time.perf_counter()
+            resp = client.post(path, json=body) if method == "POST" else client.get(path)
+            latencies.append(time.perf_counter() - start)
+            assert resp.status_code == 200, (path, resp.status_code)
+    return latencies
+
+def benchmark_serving(rounds=30, repeats=5):
+    client = main.app.test_client()
+    run_workload(client, 3)  # warm caches and lazy imports
+
+    # Interleave on/off runs so drift (thermal, page cache) hits both equally
+    samples = {True: [], False: []}
+    for i in range(repeats):
+        for enabled in ((False, True) if i % 2 == 0 else (True, False)):
+            metrics.ENABLED = enabled
+            samples[enabled].extend(run_workload(client, rounds))
+    metrics.ENABLED = True
+
+    results = []
+    for enabled in (True, False):
+        lat = np.array(samples[enabled]) * 1000
+        results.append({"Instrumentation": "on" if enabled else "off", "Requests": len(lat),
+                        "Mean_ms": lat.mean(), "P50_ms": np.percentile(lat, 50), "P99_ms": np.percentile(lat, 99)})
+
+    results_df = pd.DataFrame(results).round(3)
+    overhead = (results_df.loc[0, "Mean_ms"] / results_df.loc[1, "Mean_ms"] - 1) * 100
+
+    print("\nSERVING LATENCY BENCHMARK")
+    print(results_df.to_string(index=False))
+    print(f"\nInstrumentation overhead: {overhead:+.2f}% of mean request latency")
+    return results_df
+
+if __name__ == "__main__":
+    benchmark_serving()
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import signal
+import subprocess
+import urllib.request
+import pandas as pd
+
+# Linux only: reads /proc/<pid>/smaps_rollup of the gunicorn master and workers
+PORT = int(os.getenv("BENCH_PORT", "5055"))
+WORKERS = int(os.getenv("BENCH_WORKERS", "4"))
+BASE_URL = f"http://127.0.0.1:{PORT}"
+
+def read_smaps(pid):
+    stats = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[0].endswith(":"):
+                stats[parts[0][:-1]] = int(parts[1]) / 1024  # kB -> MB
+    return stats
+
+def child_pids(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+def wait_for_server(timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"{BASE_URL}/api/health", timeout=2)
+            return
+        except Exception:
+            time.sleep(0.5)
+    raise RuntimeError("Server did not come up")
+
+def warm_up(rounds=20):
+    """Hit the data endpoints so every worker touches the shared frames."""
+    for _ in range(rounds):
+        for path in ["/api/students", "/api/clusters", "/api/summary-report", "/api/fairness-audit"]:
+            urllib.request.urlopen(f"{BASE_URL}{path}", timeout=30).read()
+
+def benchmark_serving_memory():
+    env = dict(os.environ, SERVER_BIND=f"127.0.0.1:{PORT}", SERVER_WORKERS=str(WORKERS), MODEL_WATCH_INTERVAL="0")
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print(f"Starting serve.py with {WORKERS} workers...")
+    proc = subprocess.Popen([sys.executable, "serve.py"], cwd=backend_dir, env=env)
+
+    try:
+        wait_for_server()
+        time.sleep(2)
+        warm_up()
+
+        rows = []
+        master = read_smaps(proc.pid)
+        rows.append({"Process": f"master ({proc.pid})", **{k: master[k] for k in ["Rss", "Pss", "Private_Dirty"]}})
+        for pid in child_pids(proc.pid):
+            s = read_smaps(pid)
+            rows.append({"Process": f"worker ({pid})", **{k: s[k] for k in ["Rss", "Pss", "Private_Dirty"]}})
+
+        results_df = pd.DataFrame(rows).round(1)
+        workers_df = results_df.iloc[1:]
+
+        print("\nSERVING MEMORY (MB)")
+        print(results_df.to_string(index=False))
+        print(f"\nSum of RSS (naive, no sharing): {results_df['Rss'].sum():.1f} MB")
+        print(f"Sum of PSS (actual footprint):  {results_df['Pss'].sum():.1f} MB")
+        print(f"Mean private overhead per worker: {workers_df['Private_Dirty'].mean():.1f} MB "
+              f"(vs {master['Rss']:.1f} MB for a full standalone copy)")
+        return results_df
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+if __name__ == "__main__":
+    benchmark_serving_memory()
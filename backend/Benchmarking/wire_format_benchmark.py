@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import json
+import gzip
+import pandas as pd
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import clustering
+import schema
+import wire
+
+import msgpack
+import pyarrow as pa
+import zstandard
+
+# /api/students payloads for SIZES students (sampled from the dashboard data)
+# in every wire format x compression the API negotiates. Encode is the
+# server's serialization plus compression through wire.respond and the
+# compression hook; decode is what a client pays to decompress and parse the
+# body (Arrow into a columnar table, not per-row dicts).
+SIZES = [int(n) for n in os.getenv("BENCH_STUDENTS", "10000,100000").split(",")]
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "3"))
+FORMATS = [wire.JSON, wire.MSGPACK, wire.ARROW]
+ENCODINGS = ["identity", "gzip", "zstd"]
+
+DECODERS = {
+    wire.JSON: json.loads,
+    wire.MSGPACK: msgpack.unpackb,
+    wire.ARROW: lambda body: pa.ipc.open_stream(body).read_all(),
+}
+DECOMPRESSORS = {
+    "identity": lambda body: body,
+    "gzip": gzip.decompress,
+    "zstd": zstandard.ZstdDecompressor().decompress,
+}
+
+def students_payload(n):
+    cluster = schema.read_csv(clustering.DATA_PATH).sample(n=n, replace=True, random_state=42)
+    raw = schema.read_csv(clustering.RAW_DATA_PATH).loc[cluster.index]
+    cluster = cluster.reset_index(drop=True)
+    return {"version": 1, "full": True, "students": clustering._student_rows(cluster, raw.reset_index(drop=True))}
+
+def best_ms(run):
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, result
+
+def encode(app, payload, mimetype, encoding):
+    headers = {"Accept": mimetype, "Accept-Encoding": encoding}
+    with app.test_request_context("/api/students", headers=headers):
+        response = wire._compress_response(wire.respond(payload, "students"))
+        return response.get_data()
+
+def benchmark_wire_formats():
+    app = Flask(__name__)
+    rows = []
+    for n in SIZES:
+        payload = students_payload(n)
+        for mimetype in FORMATS:
+            for encoding in ENCODINGS:
+                encode_ms, body = best_ms(lambda: encode(app, payload, mimetype, encoding))
+                decode_ms, _ = best_ms(lambda: DECODERS[mimetype](DECOMPRESSORS[encoding](body)))
+                rows.append({"Students": n, "Format": mimetype.split("/")[1], "Encoding": encoding,
+                             "Size_KB": len(body) / 1024, "Encode_ms": encode_ms, "Decode_ms": decode_ms})
+    results = pd.DataFrame(rows)
+    baseline = results.groupby("Students")["Size_KB"].transform("first")  # JSON, uncompressed
+    results["Size_vs_JSON"] = results["Size_KB"] / baseline
+    print(f"\nWIRE FORMATS FOR /api/students (best of {ROUNDS})")
+    print(results.round(2).to_string(index=False))
+    return results
+
+if __name__ == "__main__":
+    benchmark_wire_formats()
@@ -1,76 +1,157 @@
 import pandas as pd
+import numpy as np
 import os
 from datetime import datetime
 from faker import Faker
-import random
 
 BASE_DIR = os.path.dirname(__file__)
 RAW_PATH = os.path.join(BASE_DIR, "data", "Student_data.csv")
 CLEANED_PATH = os.path.join(BASE_DIR, "cleaned_student_data.csv")
 
-def clean_data():
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Cleaning started...")
+# The raw export is streamed twice in blocks of CHUNK_ROWS: the first pass only
+# counts values (for the modes and medians), the second fills, clips, dedupes
+# and adds the synthetic fields, appending each block to the output. Memory is
+# bounded by the block size plus one 8-byte hash per distinct row kept.
+CHUNK_ROWS = int(os.getenv("CLEANER_CHUNK_ROWS", "500000"))
+SEED = int(os.getenv("CLEANER_SEED", "42"))
+NAME_POOL = 500  # first and last names each, combined at random per student
 
-    if not os.path.exists(RAW_PATH):
-        raise FileNotFoundError(f"Raw file not found: {RAW_PATH}")
+CAT_COLS = [
+    'Parental_Involvement', 'Access_to_Resources', 'Extracurricular_Activities',
+    'Motivation_Level', 'Internet_Access', 'Family_Income', 'Teacher_Quality',
+    'School_Type', 'Peer_Influence', 'Learning_Disabilities',
+    'Parental_Education_Level', 'Distance_from_Home', 'Gender'
+]
 
-    df = pd.read_csv(RAW_PATH)
+NUM_COLS = [
+    'Hours_Studied', 'Attendance', 'Sleep_Hours', 'Previous_Scores',
+    'Tutoring_Sessions', 'Physical_Activity', 'Exam_Score'
+]
 
-    print(f"Original rows: {len(df)}")
-    print("Missing values before cleaning:")
-    print(df.isnull().sum()[df.isnull().sum() > 0])
-
-    cat_cols = [
-        'Parental_Involvement', 'Access_to_Resources', 'Extracurricular_Activities',
-        'Motivation_Level', 'Internet_Access', 'Family_Income', 'Teacher_Quality',
-        'School_Type', 'Peer_Influence', 'Learning_Disabilities',
-        'Parental_Education_Level', 'Distance_from_Home', 'Gender'
-    ]
-
-    num_cols = [
-        'Hours_Studied', 'Attendance', 'Sleep_Hours', 'Previous_Scores',
-        'Tutoring_Sessions', 'Physical_Activity', 'Exam_Score'
-    ]
-
-    for col in cat_cols:
-        if col in df.columns:
-            df[col] = df[col].fillna(df[col].mode()[0])
-
-    for col in num_cols:
-        if col in df.columns:
-            df[col] = df[col].fillna(df[col].median())
-            df[col] = df[col].astype(int)
-
-    df['Attendance'] = df['Attendance'].clip(0, 100)
-    df['Hours_Studied'] = df['Hours_Studied'].clip(0, 50)
-    df['Sleep_Hours'] = df['Sleep_Hours'].clip(3, 12)
-    df['Tutoring_Sessions'] = df['Tutoring_Sessions'].clip(0, 10)
-    df['Physical_Activity'] = df['Physical_Activity'].clip(0, 7)
-    df['Exam_Score'] = df['Exam_Score'].clip(0, 100)
-    df['Previous_Scores'] = df['Previous_Scores'].clip(0, 100)
-
-    df = df.drop_duplicates()
+BOUNDS = {
+    'Attendance': (0, 100),
+    'Hours_Studied': (0, 50),
+    'Sleep_Hours': (3, 12),
+    'Tutoring_Sessions': (0, 10),
+    'Physical_Activity': (0, 7),
+    'Exam_Score': (0, 100),
+    'Previous_Scores': (0, 100),
+}
 
-    # Add random names and classes
+CLASSES = np.array([f"Class {i}" for i in range(1, 11)], dtype=object)  # Classes 1 to 10
+
+def read_chunks():
+    return pd.read_csv(RAW_PATH, chunksize=CHUNK_ROWS)
+
+def median_from_counts(counts):
+    """Exact median of the values a value_counts Series describes (same as Series.median)."""
+    counts = counts.sort_index()
+    cumulative = counts.to_numpy().cumsum()
+    total = cumulative[-1]
+    lower = counts.index[np.searchsorted(cumulative, (total - 1) // 2, side="right")]
+    upper = counts.index[np.searchsorted(cumulative, total // 2, side="right")]
+    return (lower + upper) / 2
+
+def collect_stats():
+    """First pass: row count, missing counts, and the fill value of every column."""
+    rows = 0
+    missing = None
+    counts = {}
+    for chunk in read_chunks():
+        rows += len(chunk)
+        chunk_missing = chunk.isnull().sum()
+        missing = chunk_missing if missing is None else missing.add(chunk_missing, fill_value=0)
+        for col in CAT_COLS + NUM_COLS:
+            if col in chunk.columns:
+                chunk_counts = chunk[col].value_counts()
+                counts[col] = chunk_counts if col not in counts else counts[col].add(chunk_counts, fill_value=0)
+
+    fills = {}
+    for col, col_counts in counts.items():
+        if col_counts.empty:
+            continue
+        if col in CAT_COLS:
+            # Ties go to the smallest value, like Series.mode()[0]
+            fills[col] = col_counts[col_counts == col_counts.max()].sort_index().index[0]
+        else:
+            fills[col] = median_from_counts(col_counts)
+    return rows, missing, fills
+
+def name_pools(seed):
     fake = Faker()
-    df['Name'] = [fake.name() for _ in range(len(df))]
-    classes = [f"Class {i}" for i in range(1, 11)]  # Classes 1 to 10
-    df['Class'] = [random.choice(classes) for _ in range(len(df))]
+    fake.seed_instance(seed)
+    first = np.array([fake.first_name() for _ in range(NAME_POOL)], dtype=object)
+    last = np.array([fake.last_name() for _ in range(NAME_POOL)], dtype=object)
+    return first, last
+
+def clean_chunk(chunk, fills):
+    for col in CAT_COLS:
+        if col in chunk.columns and col in fills:
+            chunk[col] = chunk[col].fillna(fills[col])
+
+    for col in NUM_COLS:
+        if col in chunk.columns:
+            chunk[col] = chunk[col].fillna(fills.get(col, 0)).astype(int)
+
+    for col, (low, high) in BOUNDS.items():
+        chunk[col] = chunk[col].clip(low, high)
+    return chunk
+
+def drop_seen(chunk, seen):
+    """Drops rows duplicated within the chunk or seen in an earlier one; returns the chunk and the updated hashes."""
+    hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+    keep = ~pd.Series(hashes).duplicated().to_numpy()
+    if len(seen):
+        positions = np.minimum(np.searchsorted(seen, hashes), len(seen) - 1)
+        keep &= seen[positions] != hashes
+    return chunk[keep], np.union1d(seen, hashes[keep])
+
+def add_synthetic_fields(chunk, rng, first_names, last_names):
+    n = len(chunk)
+    # Add random names and classes
+    chunk['Name'] = first_names[rng.integers(0, len(first_names), n)] + " " + last_names[rng.integers(0, len(last_names), n)]
+    chunk['Class'] = CLASSES[rng.integers(0, len(CLASSES), n)]
 
     # Boost tutoring sessions if they are too low in raw data
-    if 'Tutoring_Sessions' in df.columns:
+    if 'Tutoring_Sessions' in chunk.columns:
         # Give 30% of students some tutoring if they have none
-        mask = (df['Tutoring_Sessions'] == 0)
-        df.loc[mask.sample(frac=0.3), 'Tutoring_Sessions'] = [random.randint(1, 5) for _ in range(int(0.3 * mask.sum()))]
+        boost = (chunk['Tutoring_Sessions'].to_numpy() == 0) & (rng.random(n) < 0.3)
+        chunk.loc[boost, 'Tutoring_Sessions'] = rng.integers(1, 6, int(boost.sum()))
+    return chunk
+
+def clean_data():
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Cleaning started...")
+
+    if not os.path.exists(RAW_PATH):
+        raise FileNotFoundError(f"Raw file not found: {RAW_PATH}")
+
+    rows, missing, fills = collect_stats()
+    print(f"Original rows: {rows}")
+    print("Missing values before cleaning:")
+    print(missing[missing > 0])
+
+    rng = np.random.default_rng(SEED)
+    first_names, last_names = name_pools(SEED)
+    seen = np.empty(0, dtype=np.uint64)
+    final_rows = 0
+    missing_after = None
+    tmp_path = CLEANED_PATH + ".tmp"
+    for i, chunk in enumerate(read_chunks()):
+        chunk, seen = drop_seen(clean_chunk(chunk, fills), seen)
+        chunk = add_synthetic_fields(chunk, rng, first_names, last_names)
+        chunk.to_csv(tmp_path, index=False, mode="w" if i == 0 else "a", header=i == 0)
+        final_rows += len(chunk)
+        chunk_missing = chunk.isnull().sum()
+        missing_after = chunk_missing if missing_after is None else missing_after.add(chunk_missing, fill_value=0)
+    os.replace(tmp_path, CLEANED_PATH)  # readers never see a half-written file
 
-    df.to_csv(CLEANED_PATH, index=False)
     print(f"Cleaned file saved → {CLEANED_PATH}")
-    print(f"Final rows: {len(df)}")
+    print(f"Final rows: {final_rows}")
     print("Missing values after cleaning:")
-    print(df.isnull().sum()[df.isnull().sum() > 0])
+    print(missing_after[missing_after > 0])
 
 if __name__ == "__main__":
     try:
         clean_data()
     except Exception as e:
-        print(f"Cleaning failed: {e}")
\ No newline at end of file
+        print(f"Cleaning failed: {e}")
@@ -2,14 +2,18 @@ import pandas as pd
 import numpy as np
 from sklearn.impute import SimpleImputer
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import schema
 
 os.makedirs('data', exist_ok=True)
 
 def generate_formulated_data(filepath='cleaned_student_data.csv'):
     try:
-        df = pd.read_csv(filepath)
+        df = schema.read_csv(filepath)
     except FileNotFoundError:
-        df = pd.read_csv(f'data/{filepath}')
+        df = schema.read_csv(f'data/{filepath}')
 
     numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
     if 'Exam_Score' in numeric_cols:
@@ -1,13 +1,17 @@
 import pandas as pd
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import schema
 
 def create_combined_dataset():
     os.makedirs('data', exist_ok=True)
     
     print("Loading datasets...")
     
-    df_cleaned = pd.read_csv('data/cleaned_student_data.csv')    
-    df_formulated = pd.read_csv('data/formulated_student_data.csv')
+    df_cleaned = schema.read_csv('data/cleaned_student_data.csv')    
+    df_formulated = schema.read_csv('data/formulated_student_data.csv')
     
     if len(df_cleaned) != len(df_formulated):
         raise ValueError("Row counts do not match between datasets. Check for dropped rows.")
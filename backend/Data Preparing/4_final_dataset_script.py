@@ -1,12 +1,15 @@
-import pandas as pd
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import schema
 
 def generate_final_dataset():
     os.makedirs('data', exist_ok=True)
     
     input_path = 'data/combined_student_data.csv'
     try:
-        df_combined = pd.read_csv(input_path)
+        df_combined = schema.read_csv(input_path)
         print(f"Loaded dataset from {input_path} with shape {df_combined.shape}")
     except FileNotFoundError:
         print(f"Error: {input_path} not found.")
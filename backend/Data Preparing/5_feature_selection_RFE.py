@@ -1,12 +1,15 @@
-import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.feature_selection import RFE
 from sklearn.preprocessing import LabelEncoder
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import schema
 
 def run_feature_selection_and_preserve_descriptive():
-    df = pd.read_csv('data/final_dataset.csv')
+    df = schema.read_csv('data/final_dataset.csv')
     
     descriptive_cols = df.select_dtypes(exclude=[np.number]).columns.tolist()
     
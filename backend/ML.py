@@ -1,25 +1,59 @@
 import pandas as pd
 import numpy as np
 import os
+import json
+import threading
 import joblib
-from sklearn.linear_model import HuberRegressor
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import ElasticNet, HuberRegressor, Lasso, LinearRegression, Ridge
 from sklearn.pipeline import Pipeline
+import drift
+import explain
+import metrics
+import model_format
+import preprocessing
+import profiling
+import schema
 
 BASE_DIR = os.path.dirname(__file__)
 DATA_PATH = os.path.join(BASE_DIR, "data", "optimised_final_dataset.csv")
 REFERENCE_DATA_PATH = os.path.join(BASE_DIR, "data", "combined_student_data.csv")  # For raw feature medians
 MODELS_DIR = os.path.join(BASE_DIR, "models")
 MODEL_PATH = os.path.join(MODELS_DIR, "huber_pipeline.pkl")
+# Regressor used by _train_pipeline; written by Benchmarking/hyperparameter_search.py
+REGRESSOR_CONFIG_PATH = os.path.join(MODELS_DIR, "regressor_config.json")
 
-ml_pipeline = None
+# Raw student fields (Student_data.csv); everything else is engineered from these
+RAW_NUMERIC_FIELDS = ['Hours_Studied', 'Attendance', 'Sleep_Hours', 'Previous_Scores',
+                      'Tutoring_Sessions', 'Physical_Activity']
+CATEGORICAL_FIELDS = ['Parental_Involvement', 'Access_to_Resources', 'Extracurricular_Activities',
+                      'Motivation_Level', 'Internet_Access', 'Family_Income', 'Teacher_Quality',
+                      'School_Type', 'Peer_Influence', 'Learning_Disabilities', 'Parental_Education_Level',
+                      'Distance_from_Home', 'Gender']
+RAW_COLUMNS = RAW_NUMERIC_FIELDS + CATEGORICAL_FIELDS + ['Exam_Score']
+# Valid ranges, as clipped by Data Preparing/1_data_cleaner.py
+RAW_BOUNDS = {'Attendance': (0, 100), 'Hours_Studied': (0, 50), 'Sleep_Hours': (3, 12),
+              'Tutoring_Sessions': (0, 10), 'Physical_Activity': (0, 7), 'Exam_Score': (0, 100),
+              'Previous_Scores': (0, 100)}
+
+# Estimators a regressor config may name (never an arbitrary import path)
+REGRESSORS = {cls.__name__: cls for cls in
+              [HuberRegressor, LinearRegression, Ridge, Lasso, ElasticNet, RandomForestRegressor,
+               GradientBoostingRegressor, HistGradientBoostingRegressor]}
+DEFAULT_REGRESSOR = {"estimator": "HuberRegressor", "params": {"max_iter": 1000}}
+
+ml_pipeline = None  # fitted sklearn pipeline: unpickled only when retraining/explanations need it
+ml_model = None     # model_format Linear/TreeEnsembleModel serving predictions (None: serve the pipeline)
+_pipeline_lock = threading.Lock()
+model_version = 0  # bumped on every load/fit; keys the per-model caches
 df_ml = None
 df_reference = None  # For calculating engineered features
+drift_monitor = None  # feature sketches of what the model was fitted on vs. uploads since
 
+@profiling.profiled("ML.init_ml")
 def init_ml(retrain=False):
     """Loads the dataset and either loads or trains the Huber pipeline."""
-    global ml_pipeline, df_ml, df_reference
+    global model_version, df_ml, df_reference, drift_monitor
     os.makedirs(MODELS_DIR, exist_ok=True)
     
     if not os.path.exists(DATA_PATH):
@@ -28,17 +62,21 @@ def init_ml(retrain=False):
     if not os.path.exists(REFERENCE_DATA_PATH):
         raise FileNotFoundError(f"Reference data not found at {REFERENCE_DATA_PATH}")
         
-    df_ml = pd.read_csv(DATA_PATH)
-    df_reference = pd.read_csv(REFERENCE_DATA_PATH)  # Load reference for raw features
+    df_ml = schema.read_csv(DATA_PATH)
+    df_reference = schema.read_csv(REFERENCE_DATA_PATH)  # Load reference for raw features
 
     if not retrain and os.path.exists(MODEL_PATH):
-        ml_pipeline = joblib.load(MODEL_PATH)
+        with metrics.span("ml_model_load"):
+            _load_model()
+        model_version += 1
     else:
         _train_pipeline()
+    drift_monitor = drift.DriftMonitor("ml", df_ml)
 
+@metrics.timed("ml_retrain")
 def _train_pipeline():
     """Internal function to handle the actual fitting and saving."""
-    global ml_pipeline, df_ml
+    global ml_pipeline, model_version, df_ml
     
     y = df_ml["Exam_Score"]
     X = df_ml.drop(columns=["Exam_Score"])
@@ -46,39 +84,141 @@ def _train_pipeline():
     num_cols = X.select_dtypes(include=[np.number]).columns.tolist()
     cat_cols = X.select_dtypes(exclude=[np.number]).columns.tolist()
 
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ("num", StandardScaler(), num_cols),
-            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), cat_cols)
-        ]
-    )
+    ml_pipeline = _build_pipeline(num_cols, cat_cols)
+    try:
+        ml_pipeline.fit(X, y)
+    except TypeError as e:
+        if not preprocessing.is_sparse_rejection(e):
+            raise
+        print("Regressor rejected sparse input, refitting on the dense layout")
+        ml_pipeline = _build_pipeline(num_cols, cat_cols, sparse=False)
+        ml_pipeline.fit(X, y)
+    joblib.dump(ml_pipeline, MODEL_PATH)
+    _export_model(ml_pipeline)
+    model_version += 1
+
+def artifact_prefix():
+    """Pickle-free copy of the pipeline next to the pickle (model_format)."""
+    return os.path.splitext(MODEL_PATH)[0]
 
-    ml_pipeline = Pipeline([
-        ("prep", preprocessor),
-        ("reg", HuberRegressor(max_iter=1000))
+def _export_model(pipeline):
+    global ml_model
+    reg = pipeline.named_steps["reg"]
+    if explain.is_linear(pipeline):
+        model_format.export_linear_pipeline(pipeline, artifact_prefix())
+    elif model_format.is_tree_ensemble(reg):
+        model_format.export_tree_pipeline(pipeline, artifact_prefix())
+    else:
+        ml_model = None  # no flat layout for this regressor; predictions go through the pipeline
+        return
+    ml_model = model_format.load(artifact_prefix())
+
+def _load_model():
+    """Loads the serving model from the artifact; the pickle is only read to export a missing/stale one."""
+    global ml_pipeline, ml_model
+    ml_pipeline = None
+    if model_format.is_fresh(artifact_prefix(), MODEL_PATH):
+        try:
+            ml_model = model_format.load(artifact_prefix())
+            return
+        except model_format.ArtifactError as e:
+            print(f"Warning: {e}; re-exporting from the pickled pipeline")
+    _export_model(get_pipeline())
+
+def get_pipeline():
+    """The fitted sklearn pipeline, unpickled on first use."""
+    global ml_pipeline
+    with _pipeline_lock:
+        if ml_pipeline is None:
+            ml_pipeline = joblib.load(MODEL_PATH)
+        return ml_pipeline
+
+def _serving_model():
+    return ml_model if ml_model is not None else get_pipeline()
+
+def load_regressor_config():
+    """{"estimator", "params"} from REGRESSOR_CONFIG_PATH, or the default Huber settings."""
+    if not os.path.exists(REGRESSOR_CONFIG_PATH):
+        return DEFAULT_REGRESSOR
+    try:
+        with open(REGRESSOR_CONFIG_PATH) as f:
+            config = json.load(f)
+        if config["estimator"] not in REGRESSORS:
+            raise ValueError(f"unknown estimator {config['estimator']!r}")
+        params = dict(config.get("params", {}))
+        REGRESSORS[config["estimator"]](**params)  # rejects unknown parameters up front
+        return {"estimator": config["estimator"], "params": params}
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"Warning: ignoring {REGRESSOR_CONFIG_PATH} ({e}), using {DEFAULT_REGRESSOR['estimator']}")
+        return DEFAULT_REGRESSOR
+
+def _build_pipeline(num_cols, cat_cols, sparse=None):
+    config = load_regressor_config()
+    return Pipeline([
+        ("prep", preprocessing.build_preprocessor(num_cols, cat_cols, sparse)),
+        ("reg", REGRESSORS[config["estimator"]](**config["params"]))
     ])
-    
-    ml_pipeline.fit(X, y)
-    joblib.dump(ml_pipeline, MODEL_PATH)
 
-def retrain_model_with_new_data(new_data_df):
-    """Called by main.py when a teacher uploads a new CSV."""
+@profiling.profiled("ML.retrain_model_with_new_data")
+def retrain_model_with_new_data(new_data_df, replace_positions=(), replace_rows=None):
+    """Called by main.py when a teacher uploads a new CSV; rows at replace_positions
+    are overwritten in place with replace_rows (see row_index.plan_upload)."""
     global df_ml, df_reference
     
-    df_reference = pd.concat([df_reference, new_data_df], ignore_index=True)
+    engineered_cols = [col for col in df_ml.columns if col != "Exam_Score"]
+    
+    if len(replace_positions):
+        ref_cols = [c for c in df_reference.columns if c in replace_rows.columns]
+        df_reference = schema.assign(df_reference, replace_positions, replace_rows, ref_cols)
+        df_ml = schema.assign(df_ml, replace_positions, replace_rows, df_ml.columns)
+        drift_monitor.observe(replace_rows)
+    
+    df_reference = schema.append(df_reference, new_data_df)
     df_reference.to_csv(REFERENCE_DATA_PATH, index=False)
     
     # Extract only engineered features for the model dataset
-    engineered_cols = [col for col in df_ml.columns if col != "Exam_Score"]
     new_data_engineered = new_data_df[engineered_cols + ["Exam_Score"]] if all(col in new_data_df.columns for col in engineered_cols + ["Exam_Score"]) else None
     
     if new_data_engineered is not None:
-        df_ml = pd.concat([df_ml, new_data_engineered], ignore_index=True)
+        drift_monitor.observe(new_data_engineered)
+        df_ml = schema.append(df_ml, new_data_engineered)
+    if new_data_engineered is not None or len(replace_positions):
         df_ml.to_csv(DATA_PATH, index=False)
         _train_pipeline()
+        drift_monitor.rebase()
     
     return len(df_reference)
 
+def _engineered(hours_studied, sleep_hours, tutoring_sessions, attendance, previous_scores, physical_activity):
+    """Engineered features (same formulas as in feature engineering script); scalars or Series."""
+    features = {}
+    
+    features['Study_to_Sleep_Ratio'] = hours_studied / (sleep_hours + 1e-5)
+    features['Tutoring_to_Study_Ratio'] = tutoring_sessions / (hours_studied + 1e-5)
+    features['Study_Per_Score_Unit'] = hours_studied / (previous_scores + 1e-5)
+    features['Engagement_Index'] = (attendance / 100) * hours_studied
+    features['Academic_Momentum'] = previous_scores * (attendance / 100)
+    features['Tutoring_Impact'] = tutoring_sessions * previous_scores
+    features['Holistic_Effort'] = hours_studied + (tutoring_sessions * 2) + physical_activity
+    features['Burnout_Risk'] = (hours_studied * attendance) / ((sleep_hours * physical_activity) + 1)
+    features['Fatigue_Factor'] = (hours_studied ** 2) / (sleep_hours + 1e-5)
+    features['Score_Gap_Potential'] = 100 - previous_scores
+    features['Log_Hours_Studied'] = np.log1p(hours_studied)
+    features['Consistency_Score'] = attendance / (hours_studied + 1e-5)
+    features['Rest_Deficit'] = physical_activity / (sleep_hours + 1e-5)
+    features['Academic_Velocity'] = previous_scores / (hours_studied + 1e-5)
+    features['Effort_Efficiency_Index'] = (previous_scores * attendance) / ((hours_studied * sleep_hours) + 1)
+    features['Distraction_Vulnerability'] = hours_studied / (attendance + 1e-5)
+    features['Resource_Dependency_Metric'] = tutoring_sessions * (100 - previous_scores)
+    
+    overall_wellbeing = sleep_hours + physical_activity
+    features['Overall_Wellbeing_Index'] = overall_wellbeing
+    features['Stress_Load'] = hours_studied / (overall_wellbeing + 1e-5)
+    features['Study_Sleep_Harmonic'] = 2 * (hours_studied * sleep_hours) / (hours_studied + sleep_hours + 1e-5)
+    features['Study_Density_Factor'] = (hours_studied ** 2) * (attendance / 100)
+    return features
+
+@metrics.timed("feature_engineering")
 def calculate_engineered_features(raw_data_dict):
     """Converts raw student data to engineered features for model prediction."""
     # Map frontend camelCase to backend snake_case if needed
@@ -108,40 +248,11 @@ def calculate_engineered_features(raw_data_dict):
     attendance = max(attendance, 1.0)
     previous_scores = max(previous_scores, 10.0)  # Score can't be below 10 realistically
     
-    # Calculate engineered features (same formulas as in feature engineering script)
-    features = {}
-    
-    features['Study_to_Sleep_Ratio'] = hours_studied / (sleep_hours + 1e-5)
-    features['Tutoring_to_Study_Ratio'] = tutoring_sessions / (hours_studied + 1e-5)
-    features['Study_Per_Score_Unit'] = hours_studied / (previous_scores + 1e-5)
-    features['Engagement_Index'] = (attendance / 100) * hours_studied
-    features['Academic_Momentum'] = previous_scores * (attendance / 100)
-    features['Tutoring_Impact'] = tutoring_sessions * previous_scores
-    features['Holistic_Effort'] = hours_studied + (tutoring_sessions * 2) + physical_activity
-    features['Burnout_Risk'] = (hours_studied * attendance) / ((sleep_hours * physical_activity) + 1)
-    features['Fatigue_Factor'] = (hours_studied ** 2) / (sleep_hours + 1e-5)
-    features['Score_Gap_Potential'] = 100 - previous_scores
-    features['Log_Hours_Studied'] = np.log1p(hours_studied)
-    features['Consistency_Score'] = attendance / (hours_studied + 1e-5)
-    features['Rest_Deficit'] = physical_activity / (sleep_hours + 1e-5)
-    features['Academic_Velocity'] = previous_scores / (hours_studied + 1e-5)
-    features['Effort_Efficiency_Index'] = (previous_scores * attendance) / ((hours_studied * sleep_hours) + 1)
-    features['Distraction_Vulnerability'] = hours_studied / (attendance + 1e-5)
-    features['Resource_Dependency_Metric'] = tutoring_sessions * (100 - previous_scores)
-    
-    overall_wellbeing = sleep_hours + physical_activity
-    features['Overall_Wellbeing_Index'] = overall_wellbeing
-    features['Stress_Load'] = hours_studied / (overall_wellbeing + 1e-5)
-    features['Study_Sleep_Harmonic'] = 2 * (hours_studied * sleep_hours) / (hours_studied + sleep_hours + 1e-5)
-    features['Study_Density_Factor'] = (hours_studied ** 2) * (attendance / 100)
+    features = _engineered(hours_studied, sleep_hours, tutoring_sessions, attendance,
+                           previous_scores, physical_activity)
     
     # Add categorical fields from original data or defaults
-    categorical_fields = ['Parental_Involvement', 'Access_to_Resources', 'Extracurricular_Activities', 
-                         'Motivation_Level', 'Internet_Access', 'Family_Income', 'Teacher_Quality', 
-                         'School_Type', 'Peer_Influence', 'Learning_Disabilities', 'Parental_Education_Level', 
-                         'Distance_from_Home', 'Gender']
-    
-    for cat_field in categorical_fields:
+    for cat_field in CATEGORICAL_FIELDS:
         if cat_field in data:
             features[cat_field] = data[cat_field]
         else:
@@ -150,12 +261,23 @@ def calculate_engineered_features(raw_data_dict):
     
     return features
 
-def predict_score(data_dict):
-    """Predicts the exam score with feature engineering from raw data."""
-    # Convert raw data to engineered features
-    engineered_data = calculate_engineered_features(data_dict)
-    
-    input_df = pd.DataFrame([engineered_data])
+@metrics.timed("upload_feature_engineering")
+def engineer_features(frame):
+    """Uploaded rows with the raw fields -> the same rows filled and clipped like the
+    cleaner (median / mode of the stored data) and any missing engineered columns added."""
+    frame = frame.copy()
+    for col in RAW_NUMERIC_FIELDS + ['Exam_Score']:
+        values = pd.to_numeric(frame[col], errors="coerce").fillna(df_reference[col].median())
+        frame[col] = values.clip(*RAW_BOUNDS[col])
+    for col in CATEGORICAL_FIELDS:
+        frame[col] = frame[col].astype(object).where(frame[col].notna(), df_reference[col].mode()[0])
+    features = _engineered(frame['Hours_Studied'], frame['Sleep_Hours'], frame['Tutoring_Sessions'],
+                           frame['Attendance'], frame['Previous_Scores'], frame['Physical_Activity'])
+    return frame.assign(**{col: values for col, values in features.items() if col not in frame.columns})
+
+def _prepare_features(engineered_rows):
+    """Engineered feature dicts -> frame in training column order, gaps filled with the mode."""
+    input_df = pd.DataFrame(engineered_rows)
     training_features = df_ml.drop(columns=["Exam_Score"]).columns
     
     # Ensure all training features are present
@@ -164,29 +286,51 @@ def predict_score(data_dict):
             input_df[col] = df_ml[col].mode()[0]
     
     # Keep only training features in correct order
-    input_df = input_df[training_features]
-    
-    pred = ml_pipeline.predict(input_df)[0]
-    return round(float(pred), 1)
+    return input_df[training_features]
 
-def get_feature_importance():
-    """Extracts coefficient weights from the Huber model for UI transparency."""
-    coef = ml_pipeline.named_steps["reg"].coef_
+def predict_score(data_dict):
+    """Predicts the exam score with feature engineering from raw data."""
+    return predict_scores([data_dict])[0]
 
-    prep = ml_pipeline.named_steps["prep"]
+def predict_scores(data_dicts):
+    """predict_score for many raw students in one model call (see batching.py)."""
+    model = _serving_model()
+    with metrics.span("preprocessing"):
+        # Convert raw data to engineered features
+        input_df = _prepare_features([calculate_engineered_features(d) for d in data_dicts])
+        # Artifacts encode themselves; a pickled pipeline (no artifact yet) runs its own steps
+        X = model.encode(input_df) if hasattr(model, "encode") else model[:-1].transform(input_df)
+    
+    with metrics.span("regressor"):
+        preds = model.predict_encoded(X) if hasattr(model, "predict_encoded") else model[-1].predict(X)
+    return [round(float(pred), 1) for pred in preds]
 
-    # Pull feature names directly from what the pipeline was trained on
-    # — avoids mismatch when extra columns are added elsewhere
-    num_features = prep.transformers_[0][1].get_feature_names_out() if hasattr(prep.transformers_[0][1], "get_feature_names_out") else prep.transformers_[0][2]
-    cat_features = prep.transformers_[1][1].get_feature_names_out()
+def predict_frame(features):
+    """Bulk predictions for rows already in training column order."""
+    if len(features) == 0:
+        return np.empty(0, dtype=np.float32)
+    return _serving_model().predict(features).astype(np.float32)
 
-    # StandardScaler doesn't have get_feature_names_out in older sklearn; fall back
-    try:
-        num_features = list(prep.transformers_[0][1].get_feature_names_out())
-    except AttributeError:
-        num_features = list(prep.transformers_[0][2])  # the column list stored in the transformer tuple
+def _background_sample():
+    return df_ml.drop(columns=["Exam_Score"]).sample(
+        n=min(explain.BACKGROUND_SIZE, len(df_ml)), random_state=0).reset_index(drop=True)
 
-    all_features = list(num_features) + list(cat_features)
+@metrics.timed("explain")
+def explain_contributions(indices=None, students=None, method=None, top=None):
+    """Per-feature contributions for dataset rows (indices) and/or raw student dicts."""
+    frames = []
+    if indices:
+        frames.append(df_ml.drop(columns=["Exam_Score"]).iloc[list(indices)])
+    if students:
+        frames.append(_prepare_features([calculate_engineered_features(s) for s in students]))
+    frame = pd.concat(frames, ignore_index=True)
+    
+    # Pin the model so a concurrent retrain can't mix two versions in one answer
+    pipeline, version = get_pipeline(), model_version
+    used_method, results = explain.explain(pipeline, frame, version, _background_sample, method=method, top=top)
+    return {"modelVersion": version, "method": used_method, "results": results}
 
-    pairs = sorted(zip(all_features, coef), key=lambda x: abs(x[1]), reverse=True)
-    return [{"name": f, "importance": round(float(c), 3)} for f, c in pairs[:15]]
\ No newline at end of file
+def get_feature_importance():
+    """Top model features for UI transparency, cached per model version."""
+    pipeline, version = get_pipeline(), model_version
+    return explain.global_importance(pipeline, version, _background_sample)
@@ -0,0 +1,108 @@
+import os
+import numpy as np
+import pandas as pd
+import schema
+
+# Mergeable partial aggregates over dashboard rows. A partial only holds counts
+# and sums, so partials from different schools (or chunks of one school's file)
+# combine by addition, a row's contribution is removed by subtraction, and a
+# summary never needs the raw frames side by side.
+AT_RISK_PERSONAS = ["The Disengaged Learner", "The Overworked Achiever"]
+CSV_CHUNK_SIZE = 50_000
+COLUMNS = ["Persona_Cluster", "Exam_Score", "Burnout_Risk", "Engagement_Index",
+           "Resource_Dependency_Metric", "Motivation_Level"]
+HIGH_PERFORMER_SCORE = 80
+LOW_PERFORMER_SCORE = 60
+
+def empty_partial():
+    return {"students": 0, "personas": {}}
+
+def _persona_stats(df, by):
+    """Per-persona counts and sums of df, grouped by the `by` columns (which end with Persona_Cluster)."""
+    score = df["Exam_Score"].to_numpy(dtype=np.float64)  # int8 would wrap when squared
+    frame = pd.DataFrame({
+        **{column: df[column].array for column in by},
+        "count": np.ones(len(df)),
+        "scoreSum": score,
+        "scoreSqSum": np.square(score),
+        "burnoutSum": df["Burnout_Risk"].to_numpy(dtype=np.float64),
+        "engagementSum": df["Engagement_Index"].to_numpy(dtype=np.float64),
+        "resourceSum": df["Resource_Dependency_Metric"].to_numpy(dtype=np.float64),
+        "highMotivation": schema.mask_equal(df["Motivation_Level"], "High"),
+        "highPerformers": score >= HIGH_PERFORMER_SCORE,
+        "lowPerformers": score < LOW_PERFORMER_SCORE,
+    }, index=df.index)
+    return frame.groupby(by, observed=True).sum()
+
+def _to_partial(grouped, students=None):
+    personas = {name: {k: float(v) for k, v in row.items()} for name, row in grouped.iterrows()}
+    if students is None:
+        students = int(sum(stats["count"] for stats in personas.values()))
+    return {"students": students, "personas": personas}
+
+def partial_aggregate(df):
+    """Counts and sums per persona for one frame (or chunk)."""
+    return _to_partial(_persona_stats(df, ["Persona_Cluster"]), int(len(df)))
+
+def partials_by(df, column):
+    """{value of column: partial} for every value present, from one groupby."""
+    grouped = _persona_stats(df, [column, "Persona_Cluster"])
+    partials = {}
+    for (key, name), stats in zip(grouped.index, grouped.to_dict("records")):
+        partial = partials.setdefault(key, empty_partial())
+        partial["personas"][name] = stats
+        partial["students"] += int(stats["count"])
+    return partials
+
+def merge_into(into, partial, sign=1):
+    """Adds partial to `into` in place, or with sign=-1 takes it back out."""
+    into["students"] += sign * partial["students"]
+    for name, stats in partial["personas"].items():
+        target = into["personas"].setdefault(name, {k: 0.0 for k in stats})
+        for k, v in stats.items():
+            target[k] += sign * v
+        if target["count"] <= 0:
+            del into["personas"][name]
+    return into
+
+def merge(partials):
+    merged = empty_partial()
+    for partial in partials:
+        merge_into(merged, partial)
+    return merged
+
+def finalize(partial):
+    """Means, spreads and shares from a (merged) partial."""
+    students = partial["students"]
+    personas = []
+    score_sum = score_sq = at_risk = 0.0
+    for name, stats in sorted(partial["personas"].items()):
+        count = stats["count"]
+        mean = stats["scoreSum"] / count
+        personas.append({
+            "name": name,
+            "count": int(count),
+            "share": round(count / students, 4) if students else 0,
+            "avgScore": round(mean, 2),
+            "scoreStd": round(float(np.sqrt(max(stats["scoreSqSum"] / count - mean ** 2, 0))), 2),
+            "avgBurnout": round(stats["burnoutSum"] / count, 2),
+            "avgEngagement": round(stats["engagementSum"] / count, 2),
+        })
+        score_sum += stats["scoreSum"]
+        score_sq += stats["scoreSqSum"]
+        if name in AT_RISK_PERSONAS:
+            at_risk += count
+    return {
+        "students": students,
+        "avgScore": round(score_sum / students, 2) if students else None,
+        "atRisk": int(at_risk),
+        "atRiskShare": round(at_risk / students, 4) if students else 0,
+        "personas": personas,
+    }
+
+def partial_from_csv(path):
+    """Partial for a dashboard CSV read in chunks, so memory stays flat however big the file is."""
+    if not os.path.exists(path):
+        return empty_partial()
+    chunks = pd.read_csv(path, usecols=COLUMNS, chunksize=CSV_CHUNK_SIZE)
+    return merge(partial_aggregate(chunk) for chunk in chunks)
@@ -0,0 +1,76 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+import metrics
+
+# Micro-batching for the per-request model calls. Request threads hand their
+# work to a collector thread and block on a future; the collector waits at most
+# WINDOW_MS after the first item for others to arrive (or until MAX_BATCH
+# items), runs them as one batch call and hands every caller its own slice of
+# the result. A request that arrives alone waits at most one window. If a batch
+# call raises, its items are retried one by one so only the request with the
+# bad input gets the error. WINDOW_MS=0 turns batching off.
+WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", "2"))
+MAX_BATCH = int(os.getenv("PREDICT_BATCH_MAX", "64"))
+
+class MicroBatcher:
+    """Runs run_batch(list of items) -> list of results on behalf of many callers."""
+    def __init__(self, name, run_batch, window_ms=None, max_batch=None):
+        self.name = name
+        self.run_batch = run_batch
+        self.window = (WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_batch = MAX_BATCH if max_batch is None else max_batch
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._worker_pid = None
+
+    def submit(self, item):
+        """Result of run_batch for this item; blocks until its batch has run."""
+        if self.window <= 0 or self.max_batch <= 1:
+            return self.run_batch([item])[0]
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((item, future, time.perf_counter()))
+        return future.result()
+
+    def _ensure_worker(self):
+        # Threads don't survive a fork: each gunicorn worker starts its own collector
+        with self._lock:
+            if self._worker_pid != os.getpid():
+                self._worker_pid = os.getpid()
+                threading.Thread(target=self._collect_loop, name=f"batch-{self.name}", daemon=True).start()
+
+    def _collect_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run(batch)
+
+    def _run(self, batch):
+        items = [item for item, _, _ in batch]
+        start = time.perf_counter()
+        for _, _, queued_at in batch:
+            metrics.observe("praxis_stage_duration_seconds", start - queued_at, stage=f"{self.name}_batch_wait")
+        try:
+            with metrics.span(f"{self.name}_batch"):
+                results = self.run_batch(items)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # Find the culprit: every other caller still gets its answer
+            for entry in batch:
+                self._run([entry])
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
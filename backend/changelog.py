@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import threading
+
+# Data version and per-version change log of student positions, so clients can
+# sync deltas instead of refetching every student. Every change to the stored
+# students bumps the version and records which positions were inserted,
+# updated or deleted in it. Only the last RETAIN_VERSIONS versions are kept;
+# `floor` is the oldest version a delta can still start from, and anything
+# older (or a reset after the data changed outside the app) gets a full
+# snapshot instead. The log is shared by every worker but the students are
+# held per process, so answers are tagged with applied_version(): the newest
+# version this process's frames reflect, which lags while another worker's
+# upload hasn't been reloaded here yet (serve.py recycles workers on it).
+BASE_DIR = os.path.dirname(__file__)
+DB_PATH = os.getenv("CHANGELOG_DB", os.path.join(BASE_DIR, "data", "changelog.db"))
+RETAIN_VERSIONS = int(os.getenv("CHANGELOG_RETAIN_VERSIONS", "500"))
+
+INSERTED, UPDATED, DELETED = "inserted", "updated", "deleted"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    version INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    PRIMARY KEY (version, position)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_lock = threading.Lock()
+_applied = None  # newest version this process holds in memory
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+def _meta(conn):
+    values = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+    return values.get("version", 0), values.get("floor", 0), values.get("rows")
+
+def _set_meta(conn, **values):
+    conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", list(values.items()))
+
+def init_log(total_rows):
+    """Creates the log; resets it (everyone resyncs) if it doesn't describe total_rows students."""
+    global _applied
+    with _lock:
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+        conn = _connect()
+        try:
+            conn.executescript(SCHEMA)
+            version, _, rows = _meta(conn)
+            if rows != total_rows:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DELETE FROM changes")
+                version += 1
+                _set_meta(conn, version=version, floor=version, rows=total_rows)
+                conn.execute("COMMIT")
+            _applied = version  # the frames were just loaded from the stored data
+        finally:
+            conn.close()
+
+def current_version():
+    conn = _connect()
+    try:
+        return _meta(conn)[0]
+    finally:
+        conn.close()
+
+def applied_version():
+    """The version to tag this process's answers with (see the module comment)."""
+    return _applied
+
+def record(total_rows, inserted=(), updated=(), deleted=()):
+    """Logs one change set as a new version and returns it (the current version if nothing changed)."""
+    global _applied
+    entries = [(p, INSERTED) for p in inserted] + [(p, UPDATED) for p in updated] + [(p, DELETED) for p in deleted]
+    with _lock:
+        conn = _connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")  # serialises versions across worker processes
+            version, floor, _ = _meta(conn)
+            # Our frames only reach the new version if they already held every earlier one
+            caught_up = _applied == version
+            if entries:
+                version += 1
+                conn.executemany("INSERT OR REPLACE INTO changes (version, position, kind) VALUES (?, ?, ?)",
+                                 [(version, int(p), kind) for p, kind in entries])
+                if version - floor > RETAIN_VERSIONS:
+                    floor = version - RETAIN_VERSIONS
+                    conn.execute("DELETE FROM changes WHERE version <= ?", (floor,))
+            _set_meta(conn, version=version, floor=floor, rows=total_rows)
+            conn.execute("COMMIT")
+            if caught_up:
+                _applied = version
+            return version
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+def changes_since(since, until=None):
+    """{version, inserted, updated, deleted} from `since` up to `until` (default: the
+    latest version), or None when only a full snapshot will do."""
+    conn = _connect()
+    try:
+        conn.execute("BEGIN")  # meta and changes from one snapshot
+        version, floor, _ = _meta(conn)
+        version = version if until is None else min(until, version)
+        if since < floor or since > version:
+            return None
+        rows = conn.execute("SELECT position, kind FROM changes WHERE version > ? AND version <= ? ORDER BY version",
+                            (since, version)).fetchall()
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    # Net effect per position: inserted then updated is still an insert; deleted wins
+    net = {}
+    for position, kind in rows:
+        previous = net.get(position)
+        if kind == UPDATED and previous == INSERTED:
+            continue
+        net[position] = INSERTED if kind == UPDATED and previous == DELETED else kind
+    return {
+        "version": version,
+        INSERTED: sorted(p for p, k in net.items() if k == INSERTED),
+        UPDATED: sorted(p for p, k in net.items() if k == UPDATED),
+        DELETED: sorted(p for p, k in net.items() if k == DELETED),
+    }
@@ -1,110 +1,353 @@
 import pandas as pd
 import numpy as np
 import os
+import json
 import joblib
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import KMeans, MiniBatchKMeans
+import aggregates
+import drift
+import fairness
+import metrics
+import model_format
+import preprocessing
+import profiling
+import rollups
+import schema
 
 BASE_DIR = os.path.dirname(__file__)
 
 DATA_PATH = os.path.join(BASE_DIR, "data", "dashboard_ready_student_data_kmeans.csv")
+RAW_DATA_PATH = os.path.join(BASE_DIR, "data", "Student_data.csv")
 MODELS_DIR = os.path.join(BASE_DIR, "models")
 PREPROCESSOR_PATH = os.path.join(MODELS_DIR, "kmeans_preprocessor.pkl")
 KMEANS_PATH = os.path.join(MODELS_DIR, "kmeans_model.pkl")
+PERSONA_PATH = os.path.join(MODELS_DIR, "persona_mapping.json")
+
+# "kmeans" = full Lloyd fit on every retrain; "minibatch" = MiniBatchKMeans fitted
+# in bounded-memory chunks and updated with partial_fit on every upload
+CLUSTERING_ENGINE = os.getenv("CLUSTERING_ENGINE", "kmeans")
+N_CLUSTERS = int(os.getenv("N_CLUSTERS", "4"))  # see clustering/cluster_count_search.py
+CHUNK_SIZE = int(os.getenv("CLUSTERING_CHUNK_SIZE", "50000"))
+MINIBATCH_SIZE = int(os.getenv("MINIBATCH_SIZE", "4096"))
+MINIBATCH_EPOCHS = 3
+PREPROCESSOR_SAMPLE = 50_000
+NON_FEATURE_COLS = ['Exam_Score', 'Persona_Cluster', 'Class_Section']
 
 df_cluster = None
-kmeans_model = None
+df_raw = None
+kmeans_model = None         # sklearn objects: unpickled only when fitting/partial_fit needs them
 kmeans_preprocessor = None
+cluster_model = None        # model_format.KMeansModel behind every assignment
 persona_mapping = {}
+model_version = 0  # bumped on every load/fit/partial_fit; keys prediction_table
+drift_monitor = None  # feature sketches of what the model was fitted on vs. uploads since
+rollup = None  # rollups.RollupTree of df_cluster: class -> grade -> school
 
+@profiling.profiled("clustering.init_clustering")
 def init_clustering(retrain=False):
     """Loads the dashboard data and prepares the K-Means prediction engine."""
-    global df_cluster, df_raw, kmeans_model, kmeans_preprocessor, persona_mapping
+    global df_cluster, df_raw, kmeans_model, kmeans_preprocessor, persona_mapping, drift_monitor, model_version, rollup
     os.makedirs(MODELS_DIR, exist_ok=True)
     
     if not os.path.exists(DATA_PATH):
         raise FileNotFoundError(f"Clustering Data not found at {DATA_PATH}")
     
-    df_cluster = pd.read_csv(DATA_PATH)
-    
-    # Generate deterministic mock classes "10-A", "10-B", "10-C"
-    classes = ["10-A", "10-B", "10-C"]
-    df_cluster["Class_Section"] = [classes[i % 3] for i in range(len(df_cluster))]
+    df_cluster = schema.read_csv(DATA_PATH)
+    df_cluster["Class_Section"] = rollups.assign_classes(0, len(df_cluster))
     
-    raw_path = os.path.join(BASE_DIR, "data", "Student_data.csv")
-    if os.path.exists(raw_path):
-        df_raw = pd.read_csv(raw_path)
-        df_raw["Class_Section"] = [classes[i % 3] for i in range(len(df_raw))]
+    if os.path.exists(RAW_DATA_PATH):
+        df_raw = schema.read_csv(RAW_DATA_PATH)
+        df_raw["Class_Section"] = rollups.assign_classes(0, len(df_raw))
     else:
         df_raw = None
     
-    features_df = df_cluster.drop(columns=['Exam_Score', 'Persona_Cluster', 'Class_Section'], errors='ignore')
+    features_df = df_cluster.drop(columns=NON_FEATURE_COLS, errors='ignore')
     
     if not retrain and os.path.exists(KMEANS_PATH) and os.path.exists(PREPROCESSOR_PATH):
-        kmeans_model = joblib.load(KMEANS_PATH)
-        kmeans_preprocessor = joblib.load(PREPROCESSOR_PATH)
+        with metrics.span("kmeans_model_load"):
+            _load_model()
+        model_version += 1
+        # Names are saved with the model; only derive them from the data when missing
+        if not _load_persona_mapping():
+            _build_mapping_dictionary(features_df)
+            _save_persona_mapping()
     else:
-        numerical_cols = features_df.select_dtypes(include=[np.number]).columns.tolist()
-        categorical_cols = features_df.select_dtypes(exclude=[np.number]).columns.tolist()
+        _train_kmeans(features_df)
+    drift_monitor = drift.DriftMonitor("clustering", features_df)
+    rollup = rollups.RollupTree(rollups.leaf_partials(df_cluster))
+
+def _make_preprocessor(features_df, sparse=None):
+    numerical_cols = features_df.select_dtypes(include=[np.number]).columns.tolist()
+    categorical_cols = features_df.select_dtypes(exclude=[np.number]).columns.tolist()
+    return preprocessing.build_preprocessor(numerical_cols, categorical_cols, sparse)
+
+def _iter_processed_chunks(features_df, order=None):
+    """Transforms the frame CHUNK_SIZE rows at a time so the dense matrix is never materialised whole."""
+    for start in range(0, len(features_df), CHUNK_SIZE):
+        rows = order[start:start + CHUNK_SIZE] if order is not None else slice(start, start + CHUNK_SIZE)
+        yield kmeans_preprocessor.transform(features_df.iloc[rows])
+
+def _predict_raw_clusters(features_df):
+    if kmeans_model is None:
+        return assign_clusters(features_df)[0]
+    return np.concatenate([kmeans_model.predict(X) for X in _iter_processed_chunks(features_df)])
+
+def assign_clusters(features_df):
+    """(raw cluster ids, distance to the assigned centroid) for every row, CHUNK_SIZE rows at a time."""
+    if len(features_df) == 0:
+        return np.empty(0, dtype=np.int16), np.empty(0, dtype=np.float32)
+    clusters, distances = [], []
+    for start in range(0, len(features_df), CHUNK_SIZE):
+        d = cluster_model.transform(features_df.iloc[start:start + CHUNK_SIZE])
+        nearest = d.argmin(axis=1)
+        clusters.append(nearest.astype(np.int16))
+        distances.append(d[np.arange(len(nearest)), nearest].astype(np.float32))
+    return np.concatenate(clusters), np.concatenate(distances)
+
+@metrics.timed("kmeans_retrain")
+def _train_kmeans(features_df):
+    """Fits the preprocessor + clustering engine, keeps persona names stable, saves all three."""
+    global kmeans_model, kmeans_preprocessor, persona_mapping, model_version
+    
+    previous = _load_previous_model()
+    
+    if CLUSTERING_ENGINE == "minibatch":
+        # Scaler means/stds and category vocabularies are stable on a large sample
+        sample = features_df.sample(n=min(len(features_df), PREPROCESSOR_SAMPLE), random_state=42)
+        kmeans_preprocessor = _make_preprocessor(features_df).fit(sample)
+        kmeans_model = MiniBatchKMeans(n_clusters=N_CLUSTERS, batch_size=MINIBATCH_SIZE, n_init=3, random_state=42)
         
-        kmeans_preprocessor = ColumnTransformer(
-            transformers=[
-                ('num', StandardScaler(), numerical_cols),
-                ('cat', OneHotEncoder(sparse_output=False, handle_unknown='ignore'), categorical_cols)
-            ])
-            
+        rng = np.random.default_rng(42)
+        for _ in range(MINIBATCH_EPOCHS):
+            for X in _iter_processed_chunks(features_df, order=rng.permutation(len(features_df))):
+                for start in range(0, X.shape[0], MINIBATCH_SIZE):
+                    kmeans_model.partial_fit(X[start:start + MINIBATCH_SIZE])
+    else:
+        kmeans_preprocessor = _make_preprocessor(features_df)
         X_processed = kmeans_preprocessor.fit_transform(features_df)
-        kmeans_model = KMeans(n_clusters=4, init='k-means++', random_state=42)
-        kmeans_model.fit(X_processed) 
-        
-        joblib.dump(kmeans_preprocessor, PREPROCESSOR_PATH)
-        joblib.dump(kmeans_model, KMEANS_PATH)
-        
-    _build_mapping_dictionary(features_df)
+        kmeans_model = KMeans(n_clusters=N_CLUSTERS, init='k-means++', random_state=42)
+        try:
+            kmeans_model.fit(X_processed)
+        except TypeError as e:
+            if not preprocessing.is_sparse_rejection(e):
+                raise
+            print("Clustering engine rejected sparse input, refitting on the dense layout")
+            kmeans_preprocessor = _make_preprocessor(features_df, sparse=False)
+            kmeans_model.fit(kmeans_preprocessor.fit_transform(features_df))
+    
+    if previous is not None and len(previous[2]) == N_CLUSTERS:
+        persona_mapping = _match_personas(*previous, kmeans_model.cluster_centers_, kmeans_preprocessor)
+    else:
+        _build_mapping_dictionary(features_df)
+    
+    _save_model()
+    model_version += 1
 
-def _build_mapping_dictionary(features_df):
-    """Internally maps the raw KMeans IDs (0,1,2,3) to the human names."""
+def artifact_prefix():
+    """Pickle-free copy of the preprocessor + centroids next to the pickles (model_format)."""
+    return os.path.splitext(KMEANS_PATH)[0]
+
+def _export_model():
+    global cluster_model
+    model_format.export_kmeans(kmeans_preprocessor, kmeans_model, artifact_prefix())
+    cluster_model = model_format.load(artifact_prefix())
+
+def _load_model():
+    """Loads the served model from the artifact; pickles are only read to export a missing/stale one."""
+    global kmeans_model, kmeans_preprocessor, cluster_model
+    kmeans_model = kmeans_preprocessor = None
+    if model_format.is_fresh(artifact_prefix(), KMEANS_PATH):
+        try:
+            cluster_model = model_format.load(artifact_prefix())
+            return
+        except model_format.ArtifactError as e:
+            print(f"Warning: {e}; re-exporting from the pickled model")
+    _ensure_sklearn_model()
+    _export_model()
+
+def _ensure_sklearn_model():
+    global kmeans_model, kmeans_preprocessor
+    if kmeans_model is None:
+        kmeans_model = joblib.load(KMEANS_PATH)
+        kmeans_preprocessor = joblib.load(PREPROCESSOR_PATH)
+
+def _save_model():
+    joblib.dump(kmeans_preprocessor, PREPROCESSOR_PATH)
+    joblib.dump(kmeans_model, KMEANS_PATH)
+    _export_model()
+    _save_persona_mapping()
+
+def _save_persona_mapping():
+    with open(PERSONA_PATH, "w") as f:
+        json.dump({"engine": cluster_model.manifest["estimator"],
+                   "mapping": {str(k): v for k, v in persona_mapping.items()}}, f, indent=2)
+
+def _load_persona_mapping():
     global persona_mapping
+    if not os.path.exists(PERSONA_PATH) or os.path.getmtime(PERSONA_PATH) < os.path.getmtime(KMEANS_PATH):
+        return False
+    with open(PERSONA_PATH) as f:
+        mapping = {int(k): v for k, v in json.load(f)["mapping"].items()}
+    if len(mapping) != cluster_model.n_clusters:
+        return False
+    persona_mapping = mapping
+    return True
+
+def _load_previous_model():
+    """(centroids, preprocessor, mapping) of the version being replaced, or None on a first fit."""
+    if kmeans_model is not None and persona_mapping:
+        return kmeans_model.cluster_centers_.copy(), kmeans_preprocessor, dict(persona_mapping)
+    if not all(os.path.exists(p) for p in [KMEANS_PATH, PREPROCESSOR_PATH, PERSONA_PATH]):
+        return None
+    with open(PERSONA_PATH) as f:
+        mapping = {int(k): v for k, v in json.load(f)["mapping"].items()}
+    return joblib.load(KMEANS_PATH).cluster_centers_, joblib.load(PREPROCESSOR_PATH), mapping
+
+def _centroid_profile(centers, preprocessor):
+    """Centroids in interpretable units: raw numeric values + one-hot category shares."""
+    scaler = preprocessing.numeric_scaler(preprocessor)
+    num_cols = list(preprocessor.transformers_[0][2])
+    cat_cols = list(preprocessor.named_transformers_["cat"].get_feature_names_out())
+    numeric = centers[:, :len(num_cols)] * scaler.scale_ + scaler.mean_
+    profile = pd.DataFrame(np.hstack([numeric, centers[:, len(num_cols):]]), columns=num_cols + cat_cols)
+    scale = pd.Series(1.0, index=profile.columns)
+    scale[num_cols] = scaler.scale_
+    return profile, scale
+
+def _match_personas(old_centers, old_preprocessor, old_mapping, new_centers, new_preprocessor):
+    """Carries persona names over to the refitted clusters by optimal centroid matching."""
+    old_profile, _ = _centroid_profile(old_centers, old_preprocessor)
+    new_profile, scale = _centroid_profile(new_centers, new_preprocessor)
+    shared = new_profile.columns.intersection(old_profile.columns)
     
-    X_processed = kmeans_preprocessor.transform(features_df)
-    raw_clusters = kmeans_model.predict(X_processed)
+    new_c = (new_profile[shared] / scale[shared]).to_numpy()
+    old_c = (old_profile[shared] / scale[shared]).to_numpy()
+    cost = ((new_c[:, None, :] - old_c[None, :, :]) ** 2).sum(axis=2)
+    new_ids, old_ids = linear_sum_assignment(cost)
+    return {int(n): old_mapping[int(o)] for n, o in zip(new_ids, old_ids)}
+
+def name_personas(summary):
+    """Names raw cluster IDs from per-cluster means of Exam_Score, Burnout_Risk and Engagement_Index.
+    
+    Works for any K: the most burnt-out cluster is the Overworked Achiever, the least
+    engaged of the rest the Disengaged Learner, and the remaining clusters are split by
+    score into Balanced Achievers (top half) and Developing Learners. With K > 4 several
+    raw clusters share a persona, so the dashboard always shows the same four groups.
+    """
+    mapping = {}
+    highest_burnout = int(summary['Burnout_Risk'].idxmax())
+    mapping[highest_burnout] = "The Overworked Achiever"
+    
+    rest = summary.drop(index=highest_burnout)
+    if len(rest) == 0:
+        return mapping
+    lowest_eng = int(rest['Engagement_Index'].idxmin())
+    mapping[lowest_eng] = "The Disengaged Learner"
+    
+    remaining = rest.drop(index=lowest_eng).sort_values(by='Exam_Score', ascending=False).index
+    n_balanced = (len(remaining) + 1) // 2
+    for rank, raw_id in enumerate(remaining):
+        mapping[int(raw_id)] = "The Balanced Achiever" if rank < n_balanced else "The Developing Learner"
+    return mapping
+
+def _build_mapping_dictionary(features_df):
+    """Internally maps the raw KMeans IDs (0..K-1) to the human names."""
+    global persona_mapping
     
-    temp_df = df_cluster.copy()
-    temp_df['Raw_Cluster'] = raw_clusters
+    raw_clusters = _predict_raw_clusters(features_df)
     
     key_metrics = ['Exam_Score', 'Burnout_Risk', 'Engagement_Index']
-    summary = temp_df.groupby('Raw_Cluster')[key_metrics].mean()
+    summary = df_cluster[key_metrics].groupby(raw_clusters).mean()
+    # Rebuilt from scratch so re-initialising never sees stale IDs
+    persona_mapping = name_personas(summary)
+
+@metrics.timed("kmeans_update")
+def update_with_new_data(new_data_df, replace_positions=(), replace_rows=None):
+    """Adds uploaded students to the dashboard data (and overwrites replace_positions
+    with replace_rows in place); the minibatch engine also learns from them."""
+    global df_cluster, df_raw, persona_mapping, model_version
+    
+    dashboard_cols = [c for c in df_cluster.columns if c not in ('Persona_Cluster', 'Class_Section')]
+    if not all(col in new_data_df.columns for col in dashboard_cols):
+        return 0
+    
+    replace_positions = list(replace_positions)
+    new_rows = new_data_df[dashboard_cols].reset_index(drop=True)
+    changed_rows = replace_rows[dashboard_cols].reset_index(drop=True) if replace_positions else new_rows.iloc[:0]
+    features = pd.concat([new_rows, changed_rows], ignore_index=True).drop(columns=['Exam_Score'])
+    drift_monitor.observe(features)
     
-    highest_burnout = summary['Burnout_Risk'].idxmax()
-    lowest_eng = summary['Engagement_Index'].idxmin()
+    if cluster_model.manifest["estimator"] == MiniBatchKMeans.__name__:
+        _ensure_sklearn_model()
+        X_processed = kmeans_preprocessor.transform(features)
+        old_centers = kmeans_model.cluster_centers_.copy()
+        old_mapping = dict(persona_mapping)
+        for start in range(0, X_processed.shape[0], MINIBATCH_SIZE):
+            kmeans_model.partial_fit(X_processed[start:start + MINIBATCH_SIZE])
+        # Centres drift a little on every batch; re-match so names never shuffle
+        persona_mapping = _match_personas(old_centers, kmeans_preprocessor, old_mapping,
+                                          kmeans_model.cluster_centers_, kmeans_preprocessor)
+        _save_model()
+        model_version += 1
+        drift_monitor.rebase()
+    else:
+        # Full KMeans only refits on restart/retrain; say so if the new rows no longer look like its data
+        drift_monitor.check()
+    
+    personas = [persona_mapping[c] for c in cluster_model.predict(features)] if len(features) else []
+    new_rows.insert(0, 'Persona_Cluster', personas[:len(new_rows)])
+    
+    removed = df_cluster.iloc[replace_positions]
+    if replace_positions:
+        changed_rows.insert(0, 'Persona_Cluster', personas[len(new_rows):])
+        df_cluster = schema.assign(df_cluster, replace_positions, changed_rows, changed_rows.columns)
+        # Rows changed in the middle of the file: this upload has to rewrite it
+        df_cluster.drop(columns=['Class_Section']).to_csv(DATA_PATH, index=False)
     
-    persona_mapping[highest_burnout] = "The Overworked Achiever"
-    persona_mapping[lowest_eng] = "The Disengaged Learner"
+    # Append only the new rows on disk so an upload costs O(upload), not O(dataset)
+    new_rows.to_csv(DATA_PATH, mode='a', header=False, index=False)
+    new_rows['Class_Section'] = rollups.assign_classes(len(df_cluster), len(new_rows))
+    df_cluster = schema.append(df_cluster, new_rows)
+    added = df_cluster.iloc[replace_positions + list(range(len(df_cluster) - len(new_rows), len(df_cluster)))]
+    rollup.update(removed=rollups.leaf_partials(removed), added=rollups.leaf_partials(added))
     
-    remaining = [c for c in summary.index if c not in persona_mapping]
-    rem_sorted = summary.loc[remaining].sort_values(by='Exam_Score', ascending=False).index
-    persona_mapping[rem_sorted[0]] = "The Balanced Achiever"
-    persona_mapping[rem_sorted[1]] = "The Developing Learner"
+    # Keep the raw frame row-aligned with the dashboard frame
+    if df_raw is not None:
+        raw_cols = [c for c in df_raw.columns if c != 'Class_Section']
+        if replace_positions and all(col in replace_rows.columns for col in raw_cols):
+            df_raw = schema.assign(df_raw, replace_positions, replace_rows, raw_cols)
+            df_raw.drop(columns=['Class_Section']).to_csv(RAW_DATA_PATH, index=False)
+        if all(col in new_data_df.columns for col in raw_cols):
+            raw_rows = new_data_df[raw_cols].reset_index(drop=True)
+            raw_rows.to_csv(RAW_DATA_PATH, mode='a', header=False, index=False)
+            raw_rows['Class_Section'] = rollups.assign_classes(len(df_raw), len(raw_rows))
+            df_raw = schema.append(df_raw, raw_rows)
+    
+    return len(new_rows)
 
 def predict_persona(data_dict):
     """Predicts the Persona for a brand new student input from the frontend."""
-    input_df = pd.DataFrame([data_dict])
-    
+    return predict_personas([data_dict])[0]
+
+def predict_personas(data_dicts):
+    """predict_persona for many students in one model call (see batching.py)."""
     expected_cols = df_cluster.drop(columns=["Exam_Score", "Persona_Cluster"], errors='ignore').columns
     
-    for col in expected_cols:
-        if col not in input_df.columns:
-            input_df[col] = df_cluster[col].mode()[0]
-            
-    features = input_df[expected_cols].copy()
-    
-    for col in features.columns:
-        features[col] = features[col].astype(df_cluster[col].dtype)
+    with metrics.span("preprocessing"):
+        # A field a student leaves out gets the dataset mode, per student
+        missing = [col for col in expected_cols if any(col not in d for d in data_dicts)]
+        modes = {col: df_cluster[col].mode()[0] for col in missing}
+        features = pd.DataFrame([{col: d[col] if col in d else modes[col] for col in expected_cols} for d in data_dicts],
+                                columns=expected_cols)
+        
+        for col in features.columns:
+            features[col] = features[col].astype(schema.unpacked_dtype(df_cluster[col].dtype))
+        X = cluster_model.encode(features)
     
-    X_processed = kmeans_preprocessor.transform(features)
-    raw_cluster = kmeans_model.predict(X_processed)[0]
-    return persona_mapping[raw_cluster]
+    with metrics.span("kmeans"):
+        raw_clusters = cluster_model.predict_encoded(X)
+    return [persona_mapping[c] for c in raw_clusters]
 
 def get_recommendation(persona_name):
     recs = {
@@ -115,46 +358,42 @@ def get_recommendation(persona_name):
     }
     return recs.get(persona_name, "Monitor closely.")
 
+@metrics.timed("filter")
 def get_filtered_dfs(class_name=None):
     # If no class is specified or class is 'School' (all classes view), return full data
     if not class_name or str(class_name).lower() in ["school", "all classes", ""]:
         return df_cluster.copy(), df_raw.copy() if df_raw is not None else None
     
     # Filter to specific class
-    filtered_cluster = df_cluster[df_cluster["Class_Section"] == class_name].copy()
-    filtered_raw = df_raw[df_raw["Class_Section"] == class_name].copy() if df_raw is not None else None
+    filtered_cluster = df_cluster[schema.mask_equal(df_cluster["Class_Section"], class_name)].copy()
+    filtered_raw = df_raw[schema.mask_equal(df_raw["Class_Section"], class_name)].copy() if df_raw is not None else None
     return filtered_cluster, filtered_raw
 
+def _rollup_path(class_name):
+    # The whole school, one class ("10-A") or one grade ("10")
+    if not class_name or str(class_name).lower() in ["school", "all classes", ""]:
+        return (rollups.SCHOOL_ID,)
+    return rollup.resolve(rollups.SCHOOL_ID, class_name)
+
+def get_rollup(class_name=None):
+    """Rollup report for the school, a grade or a class, down to its classes."""
+    path = _rollup_path(class_name)
+    return rollup.report(path) if path is not None else None
+
 def get_cluster_summary(class_name=None):
-    f_cluster, _ = get_filtered_dfs(class_name)
-    counts = f_cluster["Persona_Cluster"].value_counts().to_dict()
-    avgs = f_cluster.groupby("Persona_Cluster")["Exam_Score"].mean().round(1).to_dict()
+    # Answered from the rollup node's partial: no pass over the students
+    path = _rollup_path(class_name)
+    partial = rollup.get(path) if path is not None else None
+    if not partial:
+        return []
+    personas = sorted(partial["personas"].items(), key=lambda item: -item[1]["count"])
+    total = partial["students"]
+    overall_avg_score = sum(stats["scoreSum"] for _, stats in personas) / total
     
-    # Calculate additional metrics per cluster
     cluster_metrics = []
-    overall_avg_score = f_cluster["Exam_Score"].mean()
-    
-    for name, count in counts.items():
-        cluster_data = f_cluster[f_cluster["Persona_Cluster"] == name]
-        avg_score = avgs.get(name, 0)
-        
-        # Engagement and burnout metrics
-        avg_engagement = round(cluster_data["Engagement_Index"].mean(), 1)
-        avg_burnout = round(cluster_data["Burnout_Risk"].mean(), 1)
-        
-        # Motivation levels
-        motivation_dist = cluster_data["Motivation_Level"].value_counts().to_dict()
-        high_motivation = motivation_dist.get("High", 0)
-        
-        # At-risk students within cluster
-        at_risk_count = len(cluster_data[cluster_data["Persona_Cluster"].isin(["The Disengaged Learner", "The Overworked Achiever"])])
-        
-        # Performance distribution
-        high_performers = len(cluster_data[cluster_data["Exam_Score"] >= 80])
-        low_performers = len(cluster_data[cluster_data["Exam_Score"] < 60])
-        
-        # Resource dependency
-        avg_resource_dependency = round(cluster_data["Resource_Dependency_Metric"].mean(), 1)
+    for name, stats in personas:
+        count = int(stats["count"])
+        avg_score = round(stats["scoreSum"] / count, 1)
         
         # Performance relative to overall average
         perf_vs_average = round(((avg_score - overall_avg_score) / overall_avg_score * 100) if overall_avg_score > 0 else 0, 1)
@@ -171,16 +410,16 @@ def get_cluster_summary(class_name=None):
             "id": name,
             "name": name,
             "count": count,
-            "percentage": round((count / len(f_cluster) * 100), 1),
+            "percentage": round((count / total * 100), 1),
             "avgScore": avg_score,
             "scoreVsAverage": perf_vs_average,
-            "avgEngagement": avg_engagement,
-            "avgBurnout": avg_burnout,
-            "highMotivation": high_motivation,
-            "atRiskCount": at_risk_count,
-            "highPerformers": high_performers,
-            "lowPerformers": low_performers,
-            "avgResourceDependency": avg_resource_dependency,
+            "avgEngagement": round(stats["engagementSum"] / count, 1),
+            "avgBurnout": round(stats["burnoutSum"] / count, 1),
+            "highMotivation": int(stats["highMotivation"]),
+            "atRiskCount": count if name in aggregates.AT_RISK_PERSONAS else 0,
+            "highPerformers": int(stats["highPerformers"]),
+            "lowPerformers": int(stats["lowPerformers"]),
+            "avgResourceDependency": round(stats["resourceSum"] / count, 1),
             "healthStatus": health_status,
             "recommendation": get_recommendation(name)
         })
@@ -188,10 +427,22 @@ def get_cluster_summary(class_name=None):
     return cluster_metrics
 
 def get_all_students(class_name=None):
+    return _student_rows(*get_filtered_dfs(class_name))
+
+def get_students_at(indices, class_name=None):
+    """get_all_students restricted to the given positions (a delta sync's changed rows)."""
+    positions = sorted(i for i in set(indices) if 0 <= i < len(df_cluster))
+    f_cluster = df_cluster.iloc[positions]
+    f_raw = df_raw.iloc[positions] if df_raw is not None and (not positions or positions[-1] < len(df_raw)) else None
+    if class_name and str(class_name).lower() not in ["school", "all classes", ""]:
+        keep = schema.mask_equal(f_cluster["Class_Section"], class_name)
+        f_cluster = f_cluster[keep]
+        f_raw = f_raw[keep] if f_raw is not None else None
+    return _student_rows(f_cluster, f_raw)
+
+def _student_rows(f_cluster, f_raw):
     students = []
     
-    f_cluster, f_raw = get_filtered_dfs(class_name)
-    
     # Pre-extract values to avoid pandas lookup overhead in the loop
     if f_raw is not None and len(f_raw) > 0:
         att_vals = f_raw.get("Attendance", pd.Series([0]*len(f_cluster))).values
@@ -239,13 +490,22 @@ def get_student_by_index(index):
 
 def get_early_warnings(class_name=None):
     f_cluster, _ = get_filtered_dfs(class_name)
-    at_risk = f_cluster[f_cluster["Persona_Cluster"].isin(["The Disengaged Learner", "The Overworked Achiever"])].head(30)
+    at_risk = f_cluster[schema.mask_isin(f_cluster["Persona_Cluster"], ["The Disengaged Learner", "The Overworked Achiever"])].head(30)
     warnings = []
     for idx, row in at_risk.iterrows():
         issues = ["Critically low engagement"] if row["Persona_Cluster"] == "The Disengaged Learner" else ["Severe burnout risk"]
         warnings.append({"index": int(idx), "score": int(row["Exam_Score"]), "clusterName": row["Persona_Cluster"], "issues": issues})
     return warnings
 
+def get_at_risk_indices(limit=None):
+    """Positions of at-risk students, most urgent first: Disengaged before Overworked, then lowest score."""
+    personas = df_cluster["Persona_Cluster"]
+    positions = np.flatnonzero(schema.mask_isin(personas, aggregates.AT_RISK_PERSONAS))
+    critical = schema.mask_equal(personas, "The Disengaged Learner")[positions]
+    scores = df_cluster["Exam_Score"].to_numpy()[positions]
+    order = np.lexsort((positions, scores, ~critical))
+    return positions[order][:limit].tolist()
+
 def get_summary_report(class_name=None):
     f_cluster, f_raw = get_filtered_dfs(class_name)
     
@@ -256,7 +516,7 @@ def get_summary_report(class_name=None):
             "avgSleep": 0, "avgPhysicalActivity": 0, "tutoringRate": 0, "disabilityRate": 0
         }
     
-    high_risk_count = len(f_cluster[f_cluster["Persona_Cluster"].isin(["The Disengaged Learner", "The Overworked Achiever"])])
+    high_risk_count = int(schema.mask_isin(f_cluster["Persona_Cluster"], ["The Disengaged Learner", "The Overworked Achiever"]).sum())
     
     try:
         avg_attendance = round(f_raw["Attendance"].mean(), 1) if f_raw is not None and "Attendance" in f_raw.columns else None
@@ -264,7 +524,7 @@ def get_summary_report(class_name=None):
         avg_sleep = round(f_raw["Sleep_Hours"].mean(), 1) if f_raw is not None and "Sleep_Hours" in f_raw.columns else None
         avg_physical_activity = round(f_raw["Physical_Activity"].mean(), 1) if f_raw is not None and "Physical_Activity" in f_raw.columns else None
         tutoring_rate = round(100 * len(f_raw[f_raw["Tutoring_Sessions"] > 0]) / len(f_raw), 1) if f_raw is not None and "Tutoring_Sessions" in f_raw.columns else None
-        disability_rate = round(100 * len(f_raw[f_raw["Learning_Disabilities"] == "Yes"]) / len(f_raw), 1) if f_raw is not None and "Learning_Disabilities" in f_raw.columns else None
+        disability_rate = round(100 * int(schema.mask_equal(f_raw["Learning_Disabilities"], "Yes").sum()) / len(f_raw), 1) if f_raw is not None and "Learning_Disabilities" in f_raw.columns else None
     except Exception:
         avg_attendance = avg_study_hours = avg_sleep = avg_physical_activity = tutoring_rate = disability_rate = None
 
@@ -272,7 +532,7 @@ def get_summary_report(class_name=None):
         "totalStudents": len(f_cluster),
         "avgExamScore": round(f_cluster["Exam_Score"].mean(), 1),
         "highRiskPercent": round(100 * high_risk_count / len(f_cluster), 1) if len(f_cluster) > 0 else 0,
-        "clusterDistribution": f_cluster["Persona_Cluster"].value_counts(normalize=True).round(3).to_dict(),
+        "clusterDistribution": schema.observed_counts(f_cluster["Persona_Cluster"], normalize=True).round(3).to_dict(),
         "avgAttendance": avg_attendance,
         "avgStudyHours": avg_study_hours,
         "avgSleep": avg_sleep,
@@ -281,59 +541,28 @@ def get_summary_report(class_name=None):
         "disabilityRate": disability_rate
     }
 
-def get_mock_timeline(student_data):
-    burnout_base = student_data.get("Burnout_Risk", 50)
-    burnout_vals = [burnout_base] + np.random.normal(burnout_base, 5, 4).tolist()
-    score_vals = [student_data.get("Exam_Score", 70)] + np.random.normal(student_data.get("Exam_Score", 70), 2, 4).tolist()
-    
-    sleep_base = student_data.get("sleepHours", student_data.get("Sleep_Hours", 7))
-    sleep_vals = [sleep_base] + np.random.normal(sleep_base, 0.5, 4).tolist()
-    
-    return {
-        "labels": ["Baseline", "Week 1", "Week 2", "Week 3", "Projection"],
-        "burnout_trend": [round(x, 1) for x in burnout_vals],
-        "scores": [round(x, 0) for x in score_vals],
-        "sleep": [round(max(0, min(24, x)), 1) for x in sleep_vals]
+def get_timeline_snapshot(start=0, indices=None):
+    """Current score/burnout/sleep of students start.. (or of the given indices)
+    as arrays for timeline_store.append_snapshot."""
+    positions = np.arange(start, len(df_cluster)) if indices is None else np.asarray(indices, dtype=np.int64)
+    rows = df_cluster.iloc[positions]
+    sleep = np.full(len(rows), np.nan)
+    if df_raw is not None and "Sleep_Hours" in df_raw.columns:
+        raw_sleep = df_raw["Sleep_Hours"].to_numpy()
+        known = positions < len(raw_sleep)
+        sleep[known] = raw_sleep[positions[known]]
+    snapshot = {
+        "score": rows["Exam_Score"].to_numpy(),
+        "burnout": rows["Burnout_Risk"].to_numpy(),
+        "sleep": sleep,
     }
+    if indices is None:
+        snapshot["start"] = start
+    else:
+        snapshot["indices"] = positions
+    return snapshot
 
+@metrics.timed("fairness")
 def compute_fairness(class_name=None):
-    f_cluster, _ = get_filtered_dfs(class_name)
-    
-    def disparate_impact(attribute, unprivileged, privileged, metric_name="outcome"):
-        if attribute not in f_cluster.columns: 
-            return {"ratio": 1.0, "flag": "Missing column", "unprivRate": 0, "privRate": 0, "sample_unpriv": 0, "sample_priv": 0}
-        
-        unpriv_group = f_cluster[f_cluster[attribute] == unprivileged]
-        priv_group = f_cluster[f_cluster[attribute] == privileged]
-        
-        if len(unpriv_group) == 0 or len(priv_group) == 0: 
-            return {"ratio": 1.0, "flag": "Insufficient data", "unprivRate": 0, "privRate": 0, "sample_unpriv": len(unpriv_group), "sample_priv": len(priv_group)}
-        
-        unfavorable = ["The Disengaged Learner", "The Overworked Achiever"]
-        unpriv_rate = len(unpriv_group[unpriv_group["Persona_Cluster"].isin(unfavorable)]) / len(unpriv_group)
-        priv_rate = len(priv_group[priv_group["Persona_Cluster"].isin(unfavorable)]) / len(priv_group)
-        ratio = unpriv_rate / priv_rate if priv_rate > 0 else 0
-        
-        flag = "Potential bias" if ratio < 0.8 or ratio > 1.25 else "Acceptable"
-        
-        return {
-            "ratio": round(ratio, 3), 
-            "flag": flag,
-            "unprivRate": round(unpriv_rate, 3),
-            "privRate": round(priv_rate, 3),
-            "sample_unpriv": len(unpriv_group),
-            "sample_priv": len(priv_group)
-        }
-        
-    fairness_results = {
-        "gender": disparate_impact("Gender", "Female", "Male", "Gender"),
-        "income": disparate_impact("Family_Income", "Low", "High", "Family Income"),
-        "parental_education": disparate_impact("Parental_Education_Level", "High School", "Postgraduate", "Parental Education"),
-        "learning_disabilities": disparate_impact("Learning_Disabilities", "Yes", "No", "Learning Disability Status"),
-        "school_type": disparate_impact("School_Type", "Public", "Private", "School Type"),
-        "internet_access": disparate_impact("Internet_Access", "No", "Yes", "Internet Access"),
-        "parental_involvement": disparate_impact("Parental_Involvement", "Low", "High", "Parental Involvement"),
-        "distance_from_home": disparate_impact("Distance_from_Home", "Far", "Near", "Distance from Home")
-    }
-    
-    return fairness_results
+    # Contingency tensor is cached per df_cluster, so no per-request copy/filter here
+    return fairness.compute_fairness(df_cluster, class_name)
@@ -3,9 +3,14 @@ import numpy as np
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
+import os
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from clustering import N_CLUSTERS, name_personas
+
 def generate_final_student_personas():
     print("Loading optimized dataset...")
     df = pd.read_csv('data/optimised_final_dataset.csv')
@@ -24,16 +29,22 @@ def generate_final_student_personas():
     print("Encoding and scaling data for K-Means...")
     X_processed = preprocessor.fit_transform(features_df)
     
-    print("Running K-Means Clustering (K=4)...")
-    kmeans = KMeans(n_clusters=4, init='k-means++', random_state=42)
+    print(f"Running K-Means Clustering (K={N_CLUSTERS})...")
+    kmeans = KMeans(n_clusters=N_CLUSTERS, init='k-means++', random_state=42)
     clusters = kmeans.fit_predict(X_processed)
     
-    persona_mapping = {
-        0: "The Disengaged Learner",       # Low Engagement, Low Burnout, Lowest Scores
-        1: "The Developing Learner",       # Moderate Engagement, Moderate Scores
-        2: "The Overworked Achiever",      # Max Engagement, Max Burnout, High Scores
-        3: "The Balanced Achiever"         # High Engagement, Safe Burnout, High Scores
-    }
+    if N_CLUSTERS == 4:
+        persona_mapping = {
+            0: "The Disengaged Learner",       # Low Engagement, Low Burnout, Lowest Scores
+            1: "The Developing Learner",       # Moderate Engagement, Moderate Scores
+            2: "The Overworked Achiever",      # Max Engagement, Max Burnout, High Scores
+            3: "The Balanced Achiever"         # High Engagement, Safe Burnout, High Scores
+        }
+    else:
+        # No curated names for other K: Overworked = max burnout, Disengaged = min
+        # engagement, the rest split by score (see clustering.name_personas)
+        summary = df[['Exam_Score', 'Burnout_Risk', 'Engagement_Index']].groupby(clusters).mean()
+        persona_mapping = name_personas(summary)
     
     final_df = df.copy()
     named_clusters = [persona_mapping[c] for c in clusters]
@@ -42,7 +53,7 @@ def generate_final_student_personas():
     output_path = 'data/dashboard_ready_student_data_kmeans.csv'
     final_df.to_csv(output_path, index=False)
     
-    print(f"\nSuccess! 4 Named Personas discovered.")
+    print(f"\nSuccess! {N_CLUSTERS} clusters named as {len(set(persona_mapping.values()))} Personas.")
     print(f"Final dataset saved to {output_path}")
     print("\nFINAL PERSONA PROFILES SUMMARY:")
     
@@ -0,0 +1,139 @@
+import os
+import sys
+import json
+import time
+import itertools
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics import silhouette_score, davies_bouldin_score, adjusted_rand_score
+from threadpoolctl import threadpool_limits
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+import clustering
+
+# Picks K for the persona clustering. Every K in K_RANGE gets one fit on the
+# whole dataset plus BOOTSTRAP_RUNS fits on bootstrap resamples, all spread over
+# a process pool. Silhouette is O(n^2), so it (and Davies-Bouldin) is scored on
+# a fixed random sample; stability is the mean pairwise adjusted Rand index of
+# the bootstrap models' labels on a shared evaluation sample.
+K_RANGE = range(int(os.getenv("K_MIN", "2")), int(os.getenv("K_MAX", "10")) + 1)
+BOOTSTRAP_RUNS = int(os.getenv("BOOTSTRAP_RUNS", "5"))
+BOOTSTRAP_SAMPLE = 100_000
+SILHOUETTE_SAMPLE = 10_000
+DB_SAMPLE = 100_000
+EVAL_SAMPLE = 20_000
+MIN_STABILITY = 0.8
+WORKERS = int(os.getenv("SEARCH_WORKERS", str(os.cpu_count() or 1)))
+RESAMPLE_ROWS = int(os.getenv("SEARCH_ROWS", "0"))  # >0 resamples the data to that size (scale tests)
+REPORT_PATH = os.getenv("CLUSTER_REPORT_PATH", os.path.join(BASE_DIR, "data", "cluster_count_report.json"))
+
+# Set once per worker by _init_worker; inherited without copying under fork
+_X = None
+_eval_idx = None
+
+def _init_worker(X, eval_idx):
+    global _X, _eval_idx
+    _X, _eval_idx = X, eval_idx
+    # One process per core already, don't let each KMeans spawn an OpenMP team too
+    threadpool_limits(limits=1)
+
+def _dense(X):
+    return X.toarray() if sparse.issparse(X) else X
+
+def _fit(k, seed, rows=None):
+    X = _X if rows is None else _X[rows]
+    return MiniBatchKMeans(n_clusters=k, batch_size=clustering.MINIBATCH_SIZE, n_init=3, random_state=seed).fit(X)
+
+def _score_k(k):
+    """Full-data fit for one K: inertia, sampled silhouette and Davies-Bouldin, labels for naming."""
+    start = time.perf_counter()
+    model = _fit(k, 42)
+    labels = model.predict(_X)
+    n_rows = _X.shape[0]
+
+    silhouette = silhouette_score(_X, labels, sample_size=min(SILHOUETTE_SAMPLE, n_rows), random_state=k)
+    db_idx = np.random.default_rng(k).choice(n_rows, size=min(DB_SAMPLE, n_rows), replace=False)
+    davies_bouldin = davies_bouldin_score(_dense(_X[db_idx]), labels[db_idx])
+
+    return {
+        "k": k,
+        "inertia": float(model.inertia_),
+        "silhouette": float(silhouette),
+        "daviesBouldin": float(davies_bouldin),
+        "clusterSizes": np.bincount(labels, minlength=k).tolist(),
+        "fitSeconds": round(time.perf_counter() - start, 2),
+    }, labels
+
+def _bootstrap_labels(k, seed):
+    """Fits on one bootstrap resample and labels the shared evaluation sample."""
+    n_rows = _X.shape[0]
+    rows = np.random.default_rng(seed).choice(n_rows, size=min(BOOTSTRAP_SAMPLE, n_rows), replace=True)
+    return _fit(k, seed, rows).predict(_X[_eval_idx])
+
+def _stability(label_runs):
+    scores = [adjusted_rand_score(a, b) for a, b in itertools.combinations(label_runs, 2)]
+    return float(np.mean(scores)) if scores else 1.0
+
+def _recommend(results):
+    """Best silhouette among the stable K values (lowest Davies-Bouldin breaks ties)."""
+    stable = [r for r in results if r["stability"] >= MIN_STABILITY] or results
+    return max(stable, key=lambda r: (round(r["silhouette"], 3), -r["daviesBouldin"]))["k"]
+
+def run_cluster_count_search():
+    print(f"Loading {clustering.DATA_PATH}...")
+    df = pd.read_csv(clustering.DATA_PATH)
+    if RESAMPLE_ROWS:
+        df = df.sample(n=RESAMPLE_ROWS, replace=True, random_state=42).reset_index(drop=True)
+    features_df = df.drop(columns=clustering.NON_FEATURE_COLS, errors='ignore')
+
+    print(f"Preprocessing {len(df):,} students...")
+    X = clustering._make_preprocessor(features_df).fit_transform(features_df)
+    eval_idx = np.random.default_rng(0).choice(X.shape[0], size=min(EVAL_SAMPLE, X.shape[0]), replace=False)
+
+    # fork shares X copy-on-write; elsewhere it is pickled once per worker
+    context = mp.get_context("fork") if "fork" in mp.get_all_start_methods() else None
+    start = time.perf_counter()
+    print(f"Searching K={K_RANGE.start}..{K_RANGE.stop - 1} with {BOOTSTRAP_RUNS} bootstrap runs each on {WORKERS} workers...")
+    with ProcessPoolExecutor(max_workers=WORKERS, mp_context=context,
+                             initializer=_init_worker, initargs=(X, eval_idx)) as pool:
+        score_futures = {k: pool.submit(_score_k, k) for k in K_RANGE}
+        bootstrap_futures = {k: [pool.submit(_bootstrap_labels, k, seed) for seed in range(BOOTSTRAP_RUNS)]
+                             for k in K_RANGE}
+
+        key_metrics = ['Exam_Score', 'Burnout_Risk', 'Engagement_Index']
+        results = []
+        for k in K_RANGE:
+            result, labels = score_futures[k].result()
+            result["stability"] = _stability([f.result() for f in bootstrap_futures[k]])
+            summary = df[key_metrics].groupby(labels).mean()
+            result["personas"] = {str(raw_id): name for raw_id, name in sorted(clustering.name_personas(summary).items())}
+            results.append(result)
+            print(f"  K={k}: silhouette={result['silhouette']:.3f} "
+                  f"davies_bouldin={result['daviesBouldin']:.3f} stability={result['stability']:.3f}")
+
+    report = {
+        "rows": int(len(df)),
+        "engine": "minibatch",
+        "bootstrapRuns": BOOTSTRAP_RUNS,
+        "silhouetteSample": min(SILHOUETTE_SAMPLE, len(df)),
+        "daviesBouldinSample": min(DB_SAMPLE, len(df)),
+        "minStability": MIN_STABILITY,
+        "recommendedK": _recommend(results),
+        "currentK": clustering.N_CLUSTERS,
+        "searchSeconds": round(time.perf_counter() - start, 2),
+        "results": results,
+    }
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\nRecommended K={report['recommendedK']} (currently N_CLUSTERS={clustering.N_CLUSTERS}).")
+    print(f"Report saved to {REPORT_PATH}")
+    return report
+
+if __name__ == "__main__":
+    run_cluster_count_search()
@@ -0,0 +1,170 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import schema
+
+# Histograms and 2D heatmaps for the dashboard charts, so a chart downloads a
+# few kilobytes of bin counts instead of every student. Each metric is binned
+# once for the whole selection (fixed-width or quantile edges, shared by every
+# group so persona histograms are comparable) and all groups are counted in
+# one np.bincount over group * bins + bin. Results are cached per data version
+# and query; a new version drops the whole cache.
+CACHE_SIZE = int(os.getenv("DISTRIBUTION_CACHE_SIZE", "64"))
+DEFAULT_BINS = 20
+DEFAULT_HEATMAP_BINS = 10
+MAX_BINS = 200
+
+# Query name -> dashboard column
+METRICS = {
+    "score": "Exam_Score",
+    "engagement": "Engagement_Index",
+    "burnout": "Burnout_Risk",
+    "momentum": "Academic_Momentum",
+    "efficiency": "Effort_Efficiency_Index",
+    "resourceDependency": "Resource_Dependency_Metric",
+}
+GROUP_BY = {"persona": "Persona_Cluster", "class": "Class_Section", "motivation": "Motivation_Level"}
+BINNINGS = ["fixed", "quantile"]
+DEFAULT_METRICS = ["score", "engagement", "burnout"]
+
+ALL_CLASSES = ["school", "all classes", ""]
+
+_cache_lock = threading.Lock()
+_cache = OrderedDict()
+_cached_version = None
+
+def _bin_count(value, default):
+    if value in (None, ""):
+        return default
+    try:
+        bins = int(value)
+    except ValueError:
+        raise ValueError("bins must be an integer") from None
+    if not 1 <= bins <= MAX_BINS:
+        raise ValueError(f"bins must be between 1 and {MAX_BINS}")
+    return bins
+
+def _metric(name):
+    if name not in METRICS:
+        raise ValueError(f"Unknown metric '{name}' (expected one of {', '.join(METRICS)})")
+    return name
+
+def parse_query(args):
+    """Validated get_distributions keyword arguments from request args; raises ValueError."""
+    metrics = [_metric(m) for m in (args.get("metrics") or ",".join(DEFAULT_METRICS)).split(",") if m]
+    heatmaps = []
+    for pair in ",".join(args.getlist("heatmap")).split(","):
+        if not pair:
+            continue
+        x, sep, y = pair.partition(":")
+        if not sep:
+            raise ValueError("heatmap must look like engagement:burnout")
+        heatmaps.append((_metric(x), _metric(y)))
+    binning = args.get("binning") or "fixed"
+    if binning not in BINNINGS:
+        raise ValueError(f"binning must be one of {', '.join(BINNINGS)}")
+    group_by = args.get("groupBy") or None
+    if group_by is not None and group_by not in GROUP_BY:
+        raise ValueError(f"groupBy must be one of {', '.join(GROUP_BY)}")
+    return {"class_name": args.get("className"), "metrics": tuple(metrics), "heatmaps": tuple(heatmaps),
+            "bins": _bin_count(args.get("bins"), DEFAULT_BINS),
+            "heatmap_bins": _bin_count(args.get("heatmapBins"), DEFAULT_HEATMAP_BINS),
+            "binning": binning, "group_by": group_by}
+
+def _edges(values, bins, binning):
+    if len(values) == 0:
+        return np.zeros(1)
+    if binning == "quantile":
+        # Ties collapse repeated quantiles, so a discrete metric can get fewer bins than asked
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)))
+    else:
+        edges = np.linspace(values.min(), values.max(), bins + 1)
+    return edges if len(edges) > 1 else np.array([edges[0], edges[0]])
+
+def _bin_index(values, edges):
+    # Right edge inclusive for the last bin, as np.histogram does
+    return np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 2)
+
+def _group_counts(index, codes, n_groups, size):
+    """(n_groups, size) counts of index (0..size-1) per group code, in one bincount."""
+    return np.bincount(codes * size + index, minlength=n_groups * size).reshape(n_groups, size)
+
+def _rounded(edges):
+    return [round(float(e), 3) for e in edges]
+
+def compute_distributions(df, metrics=tuple(DEFAULT_METRICS), heatmaps=(), bins=DEFAULT_BINS,
+                          heatmap_bins=DEFAULT_HEATMAP_BINS, binning="fixed", group_by=None):
+    """Histograms for `metrics` and 2D counts for each (x, y) in `heatmaps`, optionally split by a group column."""
+    if group_by is not None:
+        codes, labels = pd.factorize(df[GROUP_BY[group_by]], sort=True)
+        codes = codes.astype(np.int64)
+        labels = [str(label) for label in labels]
+    else:
+        codes, labels = np.zeros(len(df), dtype=np.int64), []
+    n_groups = max(len(labels), 1)
+    known = codes >= 0  # rows with no group label only count in the totals
+    codes = np.where(known, codes, 0)
+
+    values, binned = {}, {}
+    for name in set(metrics) | {m for pair in heatmaps for m in pair}:
+        column = df[METRICS[name]].to_numpy(dtype=np.float64)
+        values[name] = column
+        binned[name] = {}
+
+    def bin_metric(name, count):
+        if count not in binned[name]:
+            column = values[name]
+            valid = ~np.isnan(column)
+            edges = _edges(column[valid], count, binning)
+            binned[name][count] = (edges, _bin_index(column, edges), valid)
+        return binned[name][count]
+
+    result = {"students": int(len(df)), "binning": binning, "groupBy": group_by, "histograms": {}, "heatmaps": []}
+    for name in metrics:
+        edges, index, valid = bin_metric(name, bins)
+        size = len(edges) - 1
+        total = np.bincount(index[valid], minlength=size)
+        entry = {"edges": _rounded(edges), "counts": total.tolist()}
+        if labels:
+            keep = valid & known
+            grouped = _group_counts(index[keep], codes[keep], n_groups, size)
+            entry["groups"] = dict(zip(labels, grouped.tolist()))
+        result["histograms"][name] = entry
+
+    for x, y in heatmaps:
+        x_edges, x_index, x_valid = bin_metric(x, heatmap_bins)
+        y_edges, y_index, y_valid = bin_metric(y, heatmap_bins)
+        nx, ny = len(x_edges) - 1, len(y_edges) - 1
+        valid = x_valid & y_valid
+        cell = x_index * ny + y_index
+        total = np.bincount(cell[valid], minlength=nx * ny).reshape(nx, ny)
+        entry = {"x": x, "y": y, "xEdges": _rounded(x_edges), "yEdges": _rounded(y_edges), "counts": total.tolist()}
+        if labels:
+            keep = valid & known
+            grouped = _group_counts(cell[keep], codes[keep], n_groups, nx * ny)
+            entry["groups"] = {label: counts.reshape(nx, ny).tolist() for label, counts in zip(labels, grouped)}
+        result["heatmaps"].append(entry)
+    return result
+
+def get_distributions(df, version, class_name=None, **query):
+    """compute_distributions for one class (or the school), cached per data version and query."""
+    global _cached_version
+    all_classes = not class_name or str(class_name).lower() in ALL_CLASSES
+    key = (None if all_classes else class_name, tuple(sorted(query.items())))
+    with _cache_lock:
+        if _cached_version != version:
+            _cache.clear()
+            _cached_version = version
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    selection = df if all_classes else df[schema.mask_equal(df["Class_Section"], class_name)]
+    result = compute_distributions(selection, **query)
+    with _cache_lock:
+        if _cached_version == version:
+            _cache[key] = result
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return result
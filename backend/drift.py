@@ -0,0 +1,184 @@
+import os
+import threading
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+# Streaming drift checks for ML and clustering. Every feature keeps a small
+# mergeable sketch: numeric columns a histogram whose bin edges are the
+# training snapshot's quantiles, categoricals a frequency counter. Uploads only
+# touch the sketches of their own rows, and "pending" (ingested since the model
+# was last fitted) is compared against "baseline" (what it was fitted on) with
+# PSI and a binned two-sample KS statistic.
+N_BINS = 20
+PSI_ALERT = float(os.getenv("DRIFT_PSI_ALERT", "0.25"))
+PSI_WARN = 0.1
+MIN_SAMPLES = int(os.getenv("DRIFT_MIN_SAMPLES", "30"))
+KS_ALPHA_COEF = 1.36  # two-sample KS critical value coefficient at alpha = 0.05
+EPS = 1e-4
+
+class NumericSketch:
+    """Fixed-edge histogram; two sketches with the same edges merge by adding counts."""
+    def __init__(self, edges):
+        self.edges = edges
+        self.counts = np.zeros(len(edges) + 1, dtype=np.int64)
+        self.missing = 0
+        self.lo, self.hi = np.inf, -np.inf
+
+    @classmethod
+    def from_values(cls, values):
+        values = values[~np.isnan(values)]
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, N_BINS + 1)[1:-1])) if len(values) else np.array([])
+        return cls(edges)
+
+    def update(self, values):
+        present = values[~np.isnan(values)]
+        self.missing += len(values) - len(present)
+        if len(present):
+            self.counts += np.bincount(np.searchsorted(self.edges, present, side="right"), minlength=len(self.counts))
+            self.lo, self.hi = min(self.lo, present.min()), max(self.hi, present.max())
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.missing += other.missing
+        self.lo, self.hi = min(self.lo, other.lo), max(self.hi, other.hi)
+
+    def empty_like(self):
+        return NumericSketch(self.edges)
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def quantile(self, q):
+        """Interpolated quantile; the open end bins are bounded by the observed min/max."""
+        if self.count == 0:
+            return None
+        bounds = np.concatenate([[self.lo], self.edges, [self.hi]])
+        cdf = np.concatenate([[0], np.cumsum(self.counts)]) / self.count
+        return float(np.interp(q, cdf, bounds))
+
+    def compare(self, other):
+        p = self.counts / max(self.count, 1)
+        q = other.counts / max(other.count, 1)
+        ks = float(np.abs(np.cumsum(p) - np.cumsum(q)).max())
+        n, m = self.count, other.count
+        return {
+            "psi": _psi(p, q),
+            "ks": round(ks, 4),
+            "ksCritical": round(KS_ALPHA_COEF * np.sqrt((n + m) / (n * m)), 4) if n and m else None,
+            "baselineMedian": _round(self.quantile(0.5)),
+            "pendingMedian": _round(other.quantile(0.5)),
+        }
+
+class CategoricalSketch:
+    """Value -> count; merges by adding counters."""
+    def __init__(self):
+        self.counts = Counter()
+
+    def update(self, values):
+        self.counts.update(pd.Series(values).fillna("<missing>").value_counts().to_dict())
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+
+    def empty_like(self):
+        return CategoricalSketch()
+
+    @property
+    def count(self):
+        return int(sum(self.counts.values()))
+
+    def compare(self, other):
+        categories = sorted(set(self.counts) | set(other.counts), key=str)
+        p = np.array([self.counts[c] for c in categories]) / max(self.count, 1)
+        q = np.array([other.counts[c] for c in categories]) / max(other.count, 1)
+        return {
+            "psi": _psi(p, q),
+            "newCategories": [str(c) for c in categories if self.counts[c] == 0],
+        }
+
+def _psi(p, q):
+    p, q = np.clip(p, EPS, None), np.clip(q, EPS, None)
+    return round(float(np.sum((q - p) * np.log(q / p))), 4)
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+def _sketch_frame(frame):
+    sketches = {}
+    for col in frame.columns:
+        if pd.api.types.is_numeric_dtype(frame[col]):
+            values = frame[col].to_numpy(dtype=np.float64)
+            sketches[col] = NumericSketch.from_values(values)
+        else:
+            values = frame[col].to_numpy()
+            sketches[col] = CategoricalSketch()
+        sketches[col].update(values)
+    return sketches
+
+class DriftMonitor:
+    """Baseline vs pending sketches for one model's feature frame."""
+    def __init__(self, name, frame):
+        self.name = name
+        self._lock = threading.Lock()
+        self.baseline = _sketch_frame(frame)
+        self.pending = {col: s.empty_like() for col, s in self.baseline.items()}
+        self.last_report = None
+
+    def observe(self, frame):
+        """Folds newly ingested rows into the pending sketches in O(len(frame))."""
+        with self._lock:
+            for col, sketch in self.pending.items():
+                if col not in frame.columns:
+                    continue
+                if isinstance(sketch, NumericSketch):
+                    sketch.update(pd.to_numeric(frame[col], errors="coerce").to_numpy(dtype=np.float64))
+                else:
+                    sketch.update(frame[col].to_numpy())
+
+    def _compare(self):
+        with self._lock:
+            pending_rows = max((s.count for s in self.pending.values()), default=0)
+            baseline_rows = max((s.count for s in self.baseline.values()), default=0)
+            features = {col: {"pending": self.pending[col].count, **self.baseline[col].compare(self.pending[col])}
+                        for col in self.baseline if self.pending[col].count}
+
+        for stats in features.values():
+            psi = stats["psi"]
+            stats["status"] = "major" if psi >= PSI_ALERT else "moderate" if psi >= PSI_WARN else "stable"
+        drifted = sorted((c for c, s in features.items() if s["status"] == "major"),
+                         key=lambda c: -features[c]["psi"])
+        return {
+            "model": self.name,
+            "baselineRows": baseline_rows,
+            "pendingRows": pending_rows,
+            "retrainAdvised": pending_rows >= MIN_SAMPLES and bool(drifted),
+            "driftedFeatures": drifted,
+            "refitted": False,
+            "features": features,
+        }
+
+    def check(self):
+        """Compares pending against baseline after an ingest; alerts when a retrain is advisable."""
+        report = self._compare()
+        if report["retrainAdvised"]:
+            drifted = report["driftedFeatures"]
+            print(f"Drift alert ({self.name}): {len(drifted)} feature(s) shifted since the last fit "
+                  f"({', '.join(drifted[:5])}); retraining is advisable")
+        self.last_report = report
+        return report
+
+    def rebase(self):
+        """The model was refitted on baseline + pending: keep what shifted, merge, start a new window."""
+        self.last_report = {**self._compare(), "refitted": True, "retrainAdvised": False}
+        with self._lock:
+            for col, sketch in self.pending.items():
+                self.baseline[col].merge(sketch)
+                self.pending[col] = sketch.empty_like()
+
+    def report(self):
+        """Live comparison while rows are pending, otherwise the one taken at the last refit."""
+        if any(s.count for s in self.pending.values()) or self.last_report is None:
+            return self._compare()
+        return self.last_report
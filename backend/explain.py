@@ -0,0 +1,134 @@
+import threading
+import numpy as np
+
+# Per-student explanations for the exam-score pipeline. Linear regressors are
+# exact: coefficient x scaled value (centred on the background sample), folded
+# back onto the original columns by a single (encoded -> original) weight
+# matrix, so any number of students is one matrix product. Anything without coefficients falls back to a background
+# permutation estimate: a feature's contribution is how far the prediction
+# moves when that feature is swapped for values drawn from a background sample.
+BACKGROUND_SIZE = 50
+MAX_STUDENTS = 500
+PERMUTATION_BATCH_ROWS = 100_000  # bounds the perturbed frame fed to predict()
+GLOBAL_TOP = 15
+
+_cache_lock = threading.Lock()
+_cache = {}  # name -> (model_version, value)
+
+def _cached(name, version, build):
+    with _cache_lock:
+        hit = _cache.get(name)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+    value = build()
+    with _cache_lock:
+        _cache[name] = (version, value)
+    return value
+
+def is_linear(pipeline):
+    reg = pipeline.named_steps["reg"]
+    return hasattr(reg, "coef_") and np.ndim(reg.coef_) == 1
+
+def feature_layout(pipeline, version):
+    """(encoded feature names, original column of each encoded feature, original columns)."""
+    def build():
+        prep = pipeline.named_steps["prep"]
+        num_cols = list(prep.transformers_[0][2])
+        cat_cols = list(prep.transformers_[1][2])
+        encoder = prep.named_transformers_["cat"]
+        names = num_cols + list(encoder.get_feature_names_out(cat_cols))
+        owners = num_cols + [col for col, cats in zip(cat_cols, encoder.categories_) for _ in cats]
+        return names, np.array(owners), num_cols + cat_cols
+    return _cached("layout", version, build)
+
+def _linear_weights(pipeline, version):
+    """(encoded features x original columns) matrix: coef where the column owns the feature."""
+    def build():
+        _, owners, columns = feature_layout(pipeline, version)
+        ownership = (owners[:, None] == np.array(columns)[None, :]).astype(np.float64)
+        return pipeline.named_steps["reg"].coef_[:, None] * ownership
+    return _cached("linear_weights", version, build)
+
+def linear_contributions(pipeline, frame, version, background):
+    """Exact (n_students x n_columns) contributions and the base value they start from.
+
+    Contributions are taken relative to the background's mean encoded row, so a
+    one-hot column only counts when the student differs from the typical student;
+    they add up to prediction - base value, the same reading as the permutation method.
+    """
+    prep, reg = pipeline.named_steps["prep"], pipeline.named_steps["reg"]
+    weights = _linear_weights(pipeline, version)
+    offset = _cached("linear_offset", version,
+                     lambda: np.asarray(prep.transform(background()).mean(axis=0)).ravel())
+    contributions = np.asarray(prep.transform(frame) @ weights) - offset @ weights
+    return contributions, float(reg.intercept_ + offset @ reg.coef_)
+
+def permutation_contributions(pipeline, frame, background):
+    """Model-agnostic (n_students x n_columns) contributions against a background sample."""
+    columns = list(frame.columns)
+    n_features, n_background = len(columns), len(background)
+    per_student = n_features * n_background
+    background_values = [background[col].to_numpy() for col in columns]
+    base_value = float(pipeline.predict(background).mean())
+    predictions = pipeline.predict(frame)
+
+    chunk = max(1, PERMUTATION_BATCH_ROWS // per_student)
+    out = np.empty((len(frame), n_features))
+    for start in range(0, len(frame), chunk):
+        block = frame.iloc[start:start + chunk]
+        # Row r perturbs feature (r // B) % F of student r // (F * B) with background row r % B
+        perturbed = block.iloc[np.repeat(np.arange(len(block)), per_student)].reset_index(drop=True)
+        feature_of_row = np.tile(np.repeat(np.arange(n_features), n_background), len(block))
+        background_row = np.tile(np.arange(n_background), n_features * len(block))
+        for j, col in enumerate(columns):
+            rows = np.flatnonzero(feature_of_row == j)
+            perturbed.iloc[rows, j] = background_values[j][background_row[rows]]
+        swapped = pipeline.predict(perturbed).reshape(len(block), n_features, n_background).mean(axis=2)
+        out[start:start + len(block)] = predictions[start:start + len(block), None] - swapped
+    return out, base_value
+
+def explain(pipeline, frame, version, background, method=None, top=None):
+    """Per-student contributions, ranked by magnitude; method is "linear" or "permutation"."""
+    if method is None:
+        method = "linear" if is_linear(pipeline) else "permutation"
+    if method == "linear" and not is_linear(pipeline):
+        raise ValueError("The current model has no coefficients, use method=permutation")
+    if method not in ("linear", "permutation"):
+        raise ValueError(f"Unknown method: {method}")
+
+    if method == "linear":
+        contributions, base_value = linear_contributions(pipeline, frame, version, background)
+        predictions = base_value + contributions.sum(axis=1)
+    else:
+        contributions, base_value = permutation_contributions(pipeline, frame, background())
+        predictions = pipeline.predict(frame)
+
+    columns = list(frame.columns)
+    order = np.argsort(-np.abs(contributions), axis=1)[:, :top]
+    results = []
+    for i, ranked in enumerate(order):
+        row = frame.iloc[i]
+        results.append({
+            "prediction": round(float(predictions[i]), 2),
+            "baseValue": round(base_value, 2),
+            "contributions": [
+                {"feature": columns[j],
+                 "value": row.iloc[j].item() if hasattr(row.iloc[j], "item") else row.iloc[j],
+                 "contribution": round(float(contributions[i, j]), 3)}
+                for j in ranked
+            ],
+        })
+    return method, results
+
+def global_importance(pipeline, version, background):
+    """Top features for the whole model, computed once per model version."""
+    def build():
+        if is_linear(pipeline):
+            names, _, _ = feature_layout(pipeline, version)
+            pairs = sorted(zip(names, pipeline.named_steps["reg"].coef_), key=lambda x: abs(x[1]), reverse=True)
+        else:
+            sample = background()
+            contributions, _ = permutation_contributions(pipeline, sample, sample)
+            pairs = sorted(zip(sample.columns, np.abs(contributions).mean(axis=0)), key=lambda x: x[1], reverse=True)
+        return [{"name": f, "importance": round(float(c), 3)} for f, c in pairs[:GLOBAL_TOP]]
+    return _cached("global_importance", version, build)
@@ -0,0 +1,148 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import schema
+
+# Disparate-impact audit over the persona assignments. One groupby builds a
+# contingency tensor of class x persona x every audited attribute; all ratios
+# for any class filter are slices of it, and the bootstrap CIs come from
+# multinomial resampling of the collapsed per-attribute 2x2 cells, so the cost
+# no longer depends on the number of students.
+BOOTSTRAP_REPLICATES = int(os.getenv("FAIRNESS_BOOTSTRAP_REPLICATES", "1000"))
+CONFIDENCE = 0.95
+SEED = 42  # fixed so repeated audits of the same data return the same interval
+REPLICATES_PER_TASK = 20_000  # below this the pool costs more than it saves
+WORKERS = int(os.getenv("FAIRNESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+UNFAVORABLE = ["The Disengaged Learner", "The Overworked Achiever"]
+
+# (result key, column, unprivileged value, privileged value)
+AUDITS = [
+    ("gender", "Gender", "Female", "Male"),
+    ("income", "Family_Income", "Low", "High"),
+    ("parental_education", "Parental_Education_Level", "High School", "Postgraduate"),
+    ("learning_disabilities", "Learning_Disabilities", "Yes", "No"),
+    ("school_type", "School_Type", "Public", "Private"),
+    ("internet_access", "Internet_Access", "No", "Yes"),
+    ("parental_involvement", "Parental_Involvement", "Low", "High"),
+    ("distance_from_home", "Distance_from_Home", "Far", "Near"),
+]
+
+ALL_CLASSES = ["school", "all classes", ""]
+
+_cache_lock = threading.Lock()
+_cached_frame = None
+_cached_tensor = None
+_pool = None
+
+def build_contingency_tensor(df):
+    """Student counts per (Class_Section, Persona_Cluster, audited attributes...) cell, in one groupby."""
+    columns = ["Class_Section", "Persona_Cluster"] + [a[1] for a in AUDITS if a[1] in df.columns]
+    counts = df.groupby(columns, dropna=False, observed=True).size()
+    return counts.reset_index(name="count")
+
+def _get_tensor(df):
+    # Keyed on the frame object itself: clustering swaps df_cluster on every upload
+    global _cached_frame, _cached_tensor
+    with _cache_lock:
+        if _cached_frame is not df:
+            _cached_tensor = build_contingency_tensor(df)
+            _cached_frame = df
+        return _cached_tensor
+
+def _collapse(cells, column, unprivileged, privileged):
+    """Counts of [unpriv & unfavorable, unpriv & favorable, priv & unfavorable, priv & favorable, neither group]."""
+    counts = cells["count"].to_numpy()
+    unfavorable = schema.mask_isin(cells["Persona_Cluster"], UNFAVORABLE)
+    unpriv = schema.mask_equal(cells[column], unprivileged)
+    priv = schema.mask_equal(cells[column], privileged)
+    return np.array([
+        counts[unpriv & unfavorable].sum(),
+        counts[unpriv & ~unfavorable].sum(),
+        counts[priv & unfavorable].sum(),
+        counts[priv & ~unfavorable].sum(),
+        counts[~unpriv & ~priv].sum(),
+    ])
+
+def _ratios(cells):
+    """Disparate-impact ratio, rates and group sizes from [..., 5] collapsed counts."""
+    unpriv_n = cells[..., 0] + cells[..., 1]
+    priv_n = cells[..., 2] + cells[..., 3]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        unpriv_rate = cells[..., 0] / unpriv_n
+        priv_rate = cells[..., 2] / priv_n
+        ratio = np.where(priv_rate > 0, unpriv_rate / priv_rate, 0.0)
+    ratio = np.where((unpriv_n == 0) | (priv_n == 0), np.nan, ratio)
+    return ratio, unpriv_rate, priv_rate, unpriv_n, priv_n
+
+def _bootstrap_chunk(totals, probabilities, replicates, seed):
+    rng = np.random.default_rng(seed)
+    # pvals (A, 5) broadcast against size (R, A): every attribute resampled at once
+    samples = rng.multinomial(totals, probabilities, size=(replicates, len(totals)))
+    return _ratios(samples)[0]
+
+def _get_pool():
+    global _pool
+    with _cache_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="fairness")
+        return _pool
+
+def bootstrap_ratios(collapsed, replicates=BOOTSTRAP_REPLICATES):
+    """(replicates, A) resampled ratios; large runs are split across the worker pool."""
+    totals = collapsed.sum(axis=1, keepdims=True)
+    probabilities = collapsed / np.maximum(totals, 1)
+    totals = totals[:, 0]
+    seeds = np.random.SeedSequence(SEED)
+
+    if replicates <= REPLICATES_PER_TASK:
+        return _bootstrap_chunk(totals, probabilities, replicates, seeds)
+
+    sizes = [REPLICATES_PER_TASK] * (replicates // REPLICATES_PER_TASK)
+    if replicates % REPLICATES_PER_TASK:
+        sizes.append(replicates % REPLICATES_PER_TASK)
+    pool = _get_pool()
+    futures = [pool.submit(_bootstrap_chunk, totals, probabilities, size, child)
+               for size, child in zip(sizes, seeds.spawn(len(sizes)))]
+    return np.concatenate([f.result() for f in futures])
+
+def compute_fairness(df, class_name=None, replicates=BOOTSTRAP_REPLICATES):
+    """Disparate impact for every audited attribute, with bootstrap confidence intervals."""
+    cells = _get_tensor(df)
+    if class_name and str(class_name).lower() not in ALL_CLASSES:
+        cells = cells[schema.mask_equal(cells["Class_Section"], class_name)]
+
+    present = [a for a in AUDITS if a[1] in cells.columns]
+    results = {key: {"ratio": 1.0, "flag": "Missing column", "unprivRate": 0, "privRate": 0,
+                     "sample_unpriv": 0, "sample_priv": 0}
+               for key, column, _, _ in AUDITS if column not in cells.columns}
+    if not present:
+        return results
+
+    collapsed = np.stack([_collapse(cells, column, unpriv, priv) for _, column, unpriv, priv in present])
+    ratio, unpriv_rate, priv_rate, unpriv_n, priv_n = _ratios(collapsed)
+    samples = bootstrap_ratios(collapsed, replicates) if replicates else None
+    alpha = (1 - CONFIDENCE) / 2
+
+    for i, (key, _, _, _) in enumerate(present):
+        if unpriv_n[i] == 0 or priv_n[i] == 0:
+            results[key] = {"ratio": 1.0, "flag": "Insufficient data", "unprivRate": 0, "privRate": 0,
+                            "sample_unpriv": int(unpriv_n[i]), "sample_priv": int(priv_n[i])}
+            continue
+
+        results[key] = {
+            "ratio": round(float(ratio[i]), 3),
+            "flag": "Potential bias" if ratio[i] < 0.8 or ratio[i] > 1.25 else "Acceptable",
+            "unprivRate": round(float(unpriv_rate[i]), 3),
+            "privRate": round(float(priv_rate[i]), 3),
+            "sample_unpriv": int(unpriv_n[i]),
+            "sample_priv": int(priv_n[i]),
+        }
+        if samples is not None:
+            # A resample can empty a small group; those replicates carry no ratio
+            low, high = np.nanquantile(samples[:, i], [alpha, 1 - alpha])
+            results[key].update({"ciLow": round(float(low), 3), "ciHigh": round(float(high), 3),
+                                 "ciLevel": CONFIDENCE, "replicates": int(replicates)})
+
+    return {key: results[key] for key, _, _, _ in AUDITS}
@@ -3,6 +3,9 @@ import os
 import google.generativeai as genai
 from dotenv import load_dotenv
 import json
+import metrics
+import intervention_store
+import pregenerate  # imports this module too; each only uses the other inside functions
 
 load_dotenv()
 
@@ -34,14 +37,14 @@ def get_model():
         }
     )
 
-@gemini_bp.route("/explain-student", methods=["POST"])
-def explain_student():
-    payload = request.get_json()
-    if not payload or "student_data" not in payload:
-        return jsonify({"error": "Missing student_data"}), 400
-
-    student = payload["student_data"]
+def generate_text(prompt):
+    """One Gemini completion, stripped."""
+    model = get_model()
+    with metrics.span("llm"):
+        response = model.generate_content(prompt)
+    return response.text.strip()
 
+def explain_prompt(student):
     prompt = f"""
 You are an experienced, supportive educational advisor helping a teacher understand a student.
 
@@ -68,30 +71,19 @@ Closing encouraging note for the teacher and student.
 
 Use natural, empathetic, professional language. Refer to specific data points (attendance, study hours, family income, etc.). Make sure the response is complete, flows naturally, and ends properly — never truncate or use formatting.
 """
-
-    try:
-        model = get_model()
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-
-        print("\n" + "="*100)
-        print("Gemini EXPLAIN full raw response (plain text only):")
-        print(text)
-        print("="*100 + "\n")
-
-        return jsonify({"explanation": text})
-    except Exception as e:
-        print("Gemini explain error:", str(e))
-        return jsonify({"error": str(e)}), 500
-
-
-@gemini_bp.route("/generate-strategy", methods=["POST"])
-def generate_strategy():
-    payload = request.get_json()
-    cluster_name = payload.get("cluster_name", "Unknown Cluster")
-    student = payload["student_data"]
-    past = payload.get("past_interventions", [])
-
+    return prompt
+
+def past_interventions(student_index, fallback=()):
+    """The persisted intervention history, or `fallback` when there is none (or no index)."""
+    past = list(fallback)
+    if student_index is not None:
+        try:
+            past = intervention_store.get_student_history(student_index) or past
+        except Exception as e:
+            print("Intervention history lookup failed:", str(e))
+    return past
+
+def strategy_prompt(cluster_name, student, past):
     past_text = f"\nPrevious interventions and outcomes:\n{json.dumps(past, indent=2)}\n" if past else ""
 
     prompt = f"""
@@ -118,11 +110,55 @@ STRICT FORMATTING RULES — FOLLOW EXACTLY:
 
 Write the ideas as plain paragraphs separated by blank lines. Do not truncate or cut off.
 """
+    return prompt
+
+@gemini_bp.route("/explain-student", methods=["POST"])
+def explain_student():
+    payload = request.get_json()
+    if not payload or "student_data" not in payload:
+        return jsonify({"error": "Missing student_data"}), 400
+
+    student = payload["student_data"]
+
+    # At-risk students are usually pre-generated (see pregenerate.py)
+    text = pregenerate.lookup("explanation", payload.get("student_index", student.get("index")), student)
+    if text is not None:
+        return jsonify({"explanation": text, "pregenerated": True})
+
+    prompt = explain_prompt(student)
 
     try:
-        model = get_model()
-        response = model.generate_content(prompt)
-        text = response.text.strip()
+        text = generate_text(prompt)
+
+        print("\n" + "="*100)
+        print("Gemini EXPLAIN full raw response (plain text only):")
+        print(text)
+        print("="*100 + "\n")
+
+        return jsonify({"explanation": text})
+    except Exception as e:
+        print("Gemini explain error:", str(e))
+        return jsonify({"error": str(e)}), 500
+
+
+@gemini_bp.route("/generate-strategy", methods=["POST"])
+def generate_strategy():
+    payload = request.get_json()
+    cluster_name = payload.get("cluster_name", "Unknown Cluster")
+    student = payload["student_data"]
+
+    student_index = payload.get("student_index", student.get("index"))
+
+    text = pregenerate.lookup("strategies", student_index, student)
+    if text is not None:
+        return jsonify({"strategies": text, "pregenerated": True})
+
+    # Prefer the persisted history over whatever the client happened to send
+    past = past_interventions(student_index, payload.get("past_interventions", []))
+    prompt = strategy_prompt(cluster_name, student, past)
+
+    try:
+        text = generate_text(prompt)
 
         print("\n" + "="*100)
         print("Gemini STRATEGY full raw response (plain text only):")
@@ -259,7 +295,8 @@ INSTRUCTIONS:
         model = get_model()
         chat_session = model.start_chat(history=chat_history)
         full_message = f"{system_prompt}\n\nTeacher: {message}"
-        response = chat_session.send_message(full_message)
+        with metrics.span("llm"):
+            response = chat_session.send_message(full_message)
         reply = response.text.strip()
         return jsonify({"reply": reply})
     except Exception as e:
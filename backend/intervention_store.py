@@ -0,0 +1,183 @@
+import os
+import json
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+from concurrent.futures import Future
+
+BASE_DIR = os.path.dirname(__file__)
+DB_PATH = os.getenv("INTERVENTIONS_DB", os.path.join(BASE_DIR, "data", "interventions.db"))
+BATCH_WINDOW = float(os.getenv("INTERVENTION_BATCH_WINDOW_MS", "10")) / 1000
+MAX_BATCH = 256
+WRITE_TIMEOUT = 30
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS interventions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_index INTEGER NOT NULL,
+    class_section TEXT,
+    strategy TEXT NOT NULL,
+    outcome TEXT,
+    created_at TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_interventions_student ON interventions (student_index, created_at);
+CREATE INDEX IF NOT EXISTS idx_interventions_class ON interventions (class_section, created_at);
+CREATE INDEX IF NOT EXISTS idx_interventions_strategy ON interventions (strategy, created_at);
+CREATE INDEX IF NOT EXISTS idx_interventions_date ON interventions (created_at);
+"""
+
+INSERT_SQL = """INSERT INTO interventions (student_index, class_section, strategy, outcome, created_at, payload)
+                VALUES (?, ?, ?, ?, ?, ?)"""
+
+_local = threading.local()
+_write_queue = queue.Queue()
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, timeout=WRITE_TIMEOUT, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # safe under WAL, one fsync per checkpoint
+    return conn
+
+def _get_connection():
+    """One connection per thread, re-opened after fork (sqlite handles must not cross it)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.pid != os.getpid():
+        conn = _local.conn = _connect()
+        _local.pid = os.getpid()
+    return conn
+
+def init_store():
+    """Creates the intervention table and its indexes if they don't exist yet."""
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    _get_connection().executescript(SCHEMA)
+
+def _to_row(record):
+    created_at = record.get("date") or record.get("createdAt") or datetime.now().isoformat()
+    outcome = record.get("outcome")
+    return (
+        int(record["studentIndex"]),
+        record.get("className"),
+        str(record["strategy"]),
+        None if outcome is None else str(outcome),
+        str(created_at),
+        json.dumps(record),
+    )
+
+def _from_row(row):
+    data = json.loads(row["payload"])
+    data.update({
+        "id": row["id"],
+        "studentIndex": row["student_index"],
+        "className": row["class_section"],
+        "strategy": row["strategy"],
+        "createdAt": row["created_at"],
+    })
+    return data
+
+def _fail_batch(batch, error):
+    for _, future in batch:
+        if not future.done():
+            future.set_exception(error)
+
+def _write_batch(conn, batch):
+    try:
+        conn.execute("BEGIN IMMEDIATE")  # "database is locked" lands here when workers contend
+        ids = [conn.execute(INSERT_SQL, row).lastrowid for row, _ in batch]
+        conn.execute("COMMIT")
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        _fail_batch(batch, e)
+        return
+    for (_, future), new_id in zip(batch, ids):
+        future.set_result(new_id)
+
+def _writer_loop():
+    """Group commit: everything queued within BATCH_WINDOW shares one transaction."""
+    global _writer_pid
+    conn = None
+    try:
+        while True:
+            batch = [_write_queue.get()]
+            try:
+                while len(batch) < MAX_BATCH:
+                    batch.append(_write_queue.get(timeout=BATCH_WINDOW))
+            except queue.Empty:
+                pass
+            try:
+                if conn is None:
+                    conn = _connect()
+                _write_batch(conn, batch)
+            except Exception as e:
+                # Fail this batch, not the writer: the next one reconnects
+                print(f"Warning: intervention write failed: {e}")
+                _fail_batch(batch, e)
+                conn = None
+    finally:
+        with _writer_lock:
+            _writer_pid = None  # the next add_intervention starts a new writer
+
+def _ensure_writer():
+    global _writer_pid
+    with _writer_lock:
+        if _writer_pid != os.getpid():
+            _writer_pid = os.getpid()
+            threading.Thread(target=_writer_loop, daemon=True).start()
+
+def add_intervention(record):
+    """Queues one intervention for the batched writer and returns its new id."""
+    row = _to_row(record)
+    _ensure_writer()
+    future = Future()
+    _write_queue.put((row, future))
+    return future.result(timeout=WRITE_TIMEOUT)
+
+def add_interventions(records):
+    """Bulk insert in a single transaction (imports, migrations)."""
+    conn = _get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(INSERT_SQL, [_to_row(r) for r in records])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return len(records)
+
+def list_interventions(student_index=None, class_name=None, strategy=None, limit=DEFAULT_PAGE_SIZE, offset=0):
+    """Newest-first page of interventions, optionally filtered; returns (items, total)."""
+    clauses, params = [], []
+    if student_index is not None:
+        clauses.append("student_index = ?")
+        params.append(int(student_index))
+    if class_name:
+        clauses.append("class_section = ?")
+        params.append(class_name)
+    if strategy:
+        clauses.append("strategy = ?")
+        params.append(strategy)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+    conn = _get_connection()
+    total = conn.execute(f"SELECT COUNT(*) FROM interventions {where}", params).fetchone()[0]
+    rows = conn.execute(
+        f"SELECT * FROM interventions {where} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+        params + [limit, int(offset)]
+    ).fetchall()
+    return [_from_row(r) for r in rows], total
+
+def get_student_history(student_index, limit=20):
+    """A student's most recent interventions in one lookup on the (student, date) index."""
+    rows = _get_connection().execute(
+        "SELECT * FROM interventions WHERE student_index = ? ORDER BY created_at DESC, id DESC LIMIT ?",
+        (int(student_index), int(limit))
+    ).fetchall()
+    return [_from_row(r) for r in rows]
@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from datetime import datetime
 import pandas as pd
@@ -6,18 +6,48 @@ import io
 import traceback
 import ML
 import clustering
+import explain
+import metrics
+import profiling
+import tenants
+import intervention_store
+import timeline_store
+import row_index
+import prediction_table
+import batching
+import changelog
+import wire
+import distributions
+import pregenerate
 from gemini_service import gemini_bp
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 app.register_blueprint(gemini_bp)
+metrics.init_app(app)
+profiling.init_app(app)
+tenants.init_app(app)
+wire.init_app(app)
+pregenerate.init_app(app)
 
-INTERVENTIONS = []
+def init_all():
+    """Loads the data and models and opens every store; run at startup and on serve.py reloads."""
+    ML.init_ml(retrain=False)
+    clustering.init_clustering(retrain=False)
+    intervention_store.init_store()
+    row_index.init_index(ML.df_reference, ML.RAW_COLUMNS)
+    prediction_table.refresh()
+    changelog.init_log(len(clustering.df_cluster))
+    pregenerate.init_store()
+    timeline_store.init_store()
+    if timeline_store.is_empty():
+        # First run: today's data becomes every student's baseline week
+        timeline_store.append_snapshot(**clustering.get_timeline_snapshot())
+    tenants.publish_rollup(clustering.rollup)
 
 print("Initializing AI Backend...")
 try:
-    ML.init_ml(retrain=False)
-    clustering.init_clustering(retrain=False)
+    init_all()
     print("ML and Clustering Engines Online!")
 except Exception as e:
     print(f"Warning during startup: {e}")
@@ -26,11 +56,23 @@ except Exception as e:
 def health():
     return jsonify({"status": "ok", "timestamp": datetime.now().isoformat()})
 
+def _versioned(build, version=None, table=None):
+    """build() in the negotiated format, tagged with the data version this process holds; a client holding that version gets a bodiless 304."""
+    mimetype = wire.negotiate(table is not None)
+    etag = f"data-v{changelog.applied_version() if version is None else version}{wire.ETAG_SUFFIXES[mimetype]}"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.vary.add("Accept")
+    else:
+        response = wire.respond(build(), table, mimetype)
+    response.set_etag(etag)
+    return response
+
 @app.route("/api/clusters/summary", methods=["GET"])
 @app.route("/api/clusters", methods=["GET"])
 def cluster_summary():
     class_name = request.args.get("className")
-    return jsonify({"clusters": clustering.get_cluster_summary(class_name)})
+    return _versioned(lambda: {"clusters": clustering.get_cluster_summary(class_name)})
 
 @app.route("/api/early-warnings", methods=["GET"])
 def early_warnings():
@@ -40,7 +82,18 @@ def early_warnings():
 @app.route("/api/students", methods=["GET"])
 def get_students_list():
     class_name = request.args.get("className")
-    return jsonify({"students": clustering.get_all_students(class_name)})
+    since = request.args.get("sinceVersion", type=int)
+    # Never past what this process holds: a lagging worker would skip rows it doesn't have yet
+    delta = changelog.changes_since(since, changelog.applied_version()) if since is not None else None
+    if delta is not None:
+        # Only what changed after the client's version; a compacted log (or a client
+        # ahead of this worker) falls through to the full list
+        changed = delta["inserted"] + delta["updated"]
+        return wire.respond({"version": delta["version"], "full": False, "deleted": delta["deleted"],
+                             "students": clustering.get_students_at(changed, class_name)}, "students")
+    version = changelog.applied_version()  # read before the data so a racing upload is re-sent, not lost
+    return _versioned(lambda: {"version": version, "full": True, "students": clustering.get_all_students(class_name)},
+                      version, "students")
 
 @app.route("/api/student/<int:index>", methods=["GET"])
 def get_student(index):
@@ -49,17 +102,46 @@ def get_student(index):
         return jsonify({"error": "Student index out of range"}), 404
     return jsonify(student_data)
 
+@app.route("/api/student/<int:index>/prediction", methods=["GET"])
+def student_prediction(index):
+    prediction = prediction_table.lookup(index)
+    if prediction is None:
+        return jsonify({"error": "Student index out of range"}), 404
+    return jsonify(prediction)
+
 @app.route("/api/student/<int:index>/timeline", methods=["GET"])
 def student_timeline(index):
-    student = clustering.get_student_by_index(index)
-    if not student:
+    try:
+        start, end = (datetime.fromisoformat(request.args[k]).timestamp() if request.args.get(k) else None
+                      for k in ("from", "to"))
+    except ValueError:
+        return jsonify({"error": "from/to must be ISO dates"}), 400
+    timeline = timeline_store.get_timeline(index, start=start, end=end,
+                                           max_points=request.args.get("maxPoints", type=int))
+    if timeline is None:
         return jsonify({"error": "Invalid index"}), 404
-    return jsonify(clustering.get_mock_timeline(student))
+    return jsonify(timeline)
 
 @app.route("/api/summary-report", methods=["GET"])
 def summary_report():
     class_name = request.args.get("className")
-    return jsonify(clustering.get_summary_report(class_name))
+    return _versioned(lambda: clustering.get_summary_report(class_name))
+
+@app.route("/api/distributions", methods=["GET"])
+def get_distributions():
+    try:
+        query = distributions.parse_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    version = changelog.applied_version()
+    return _versioned(lambda: distributions.get_distributions(clustering.df_cluster, version, **query), version)
+
+@app.route("/api/rollups", methods=["GET"])
+def rollup_report():
+    report = clustering.get_rollup(request.args.get("className"))
+    if report is None:
+        return jsonify({"error": "Unknown class or grade"}), 404
+    return jsonify(report)
 
 @app.route("/api/fairness-audit", methods=["GET"])
 def fairness_audit():
@@ -70,14 +152,61 @@ def fairness_audit():
 def feature_importance():
     return jsonify({"importance": ML.get_feature_importance()})
 
+@app.route("/api/drift", methods=["GET"])
+def drift_report():
+    reports = {"ml": ML.drift_monitor.report(), "clustering": clustering.drift_monitor.report()}
+    return jsonify({**reports, "retrainAdvised": any(r["retrainAdvised"] for r in reports.values())})
+
+@app.route("/api/explain/contributions", methods=["POST"])
+def explain_contributions():
+    payload = request.get_json() or {}
+    indices = payload.get("studentIndices") or ([payload["studentIndex"]] if "studentIndex" in payload else [])
+    students = payload.get("students") or []
+    if not indices and not students:
+        return jsonify({"error": "Provide studentIndex, studentIndices or students"}), 400
+    if len(indices) + len(students) > explain.MAX_STUDENTS:
+        return jsonify({"error": f"At most {explain.MAX_STUDENTS} students per request"}), 400
+    if any(not isinstance(i, int) or i < 0 or i >= len(ML.df_ml) for i in indices):
+        return jsonify({"error": "Student index out of range"}), 404
+    try:
+        return jsonify(ML.explain_contributions(indices=indices, students=students,
+                                                method=payload.get("method"), top=payload.get("top")))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _score_students(groups):
+    """Score and persona for every student of every batched request, in one call to each model."""
+    students = [student for group in groups for student in group]
+    scores = ML.predict_scores(students)
+    personas = clustering.predict_personas(students)
+    results, start = [], 0
+    for group in groups:
+        results.append(list(zip(scores[start:start + len(group)], personas[start:start + len(group)])))
+        start += len(group)
+    return results
+
+# Concurrent /api/predict and /api/what-if calls share model calls (see batching.py)
+student_batcher = batching.MicroBatcher("predict", _score_students)
+
 @app.route("/api/predict", methods=["POST"])
 def predict():
     data = request.get_json()
     if not data:
         return jsonify({"error": "No student data provided"}), 400
+    if set(data) == {"studentIndex"}:
+        # A stored student: serve the materialised row instead of re-running both models
+        try:
+            index = int(data["studentIndex"])
+        except (TypeError, ValueError):
+            return jsonify({"error": "studentIndex must be an integer"}), 400
+        prediction = prediction_table.lookup(index)
+        if prediction is None:
+            return jsonify({"error": "Student index out of range"}), 404
+        return jsonify(prediction)
     try:
-        predicted_score = ML.predict_score(data)
-        predicted_persona = clustering.predict_persona(data)
+        [(predicted_score, predicted_persona)] = student_batcher.submit([data])
         
         return jsonify({
             "predictedScore": predicted_score,
@@ -97,11 +226,7 @@ def what_if():
     modified.update(payload["changes"])
 
     try:
-        orig_score = ML.predict_score(original)
-        mod_score = ML.predict_score(modified)
-        
-        orig_persona = clustering.predict_persona(original)
-        mod_persona = clustering.predict_persona(modified)
+        (orig_score, orig_persona), (mod_score, mod_persona) = student_batcher.submit([original, modified])
         
         return jsonify({
             "original": orig_score,
@@ -127,12 +252,49 @@ def upload_data():
         content = file.read().decode('utf-8', errors='replace')
         new_df = pd.read_csv(io.StringIO(content))
         
-        new_total = ML.retrain_model_with_new_data(new_df)
+        if not row_index.covers(new_df):
+            # Without the raw student fields rows can't be keyed, engineered or kept
+            # aligned with the raw frame, so they are refused instead of appended blindly
+            missing = [col for col in ML.RAW_COLUMNS if col not in new_df.columns]
+            return jsonify({"error": f"CSV is missing student columns: {', '.join(missing)}"}), 400
+        
+        # Raw roster exports get their engineered columns (and the cleaner's gap
+        # filling) first, so they hash like the stored rows and feed both models
+        new_df = ML.engineer_features(new_df)
+        plan = row_index.plan_upload(new_df)
+        if plan.is_noop:
+            row_index.commit(plan, len(ML.df_ml))  # still records any student keys it named
+            return jsonify({
+                "success": True,
+                "newStudentsUploaded": 0,
+                "unchanged": plan.unchanged,
+                "replaced": 0,
+                "retrained": False,
+                "totalStudentsNow": len(ML.df_reference),
+                "retrainAdvised": False
+            })
+        
+        first_new = len(ML.df_ml)
+        new_total = ML.retrain_model_with_new_data(plan.new_rows, plan.replace_positions, plan.replace_rows)
+        added = clustering.update_with_new_data(plan.new_rows, plan.replace_positions, plan.replace_rows)
+        tenants.publish_rollup(clustering.rollup)
+        row_index.commit(plan, first_new)
+        prediction_table.refresh(touched=plan.replace_positions)
+        total = len(clustering.df_cluster)
+        changelog.record(total, inserted=range(total - added, total), updated=plan.replace_positions)
+        if added:
+            timeline_store.append_snapshot(**clustering.get_timeline_snapshot(start=len(clustering.df_cluster) - added))
+        if plan.replace_positions:
+            timeline_store.append_snapshot(**clustering.get_timeline_snapshot(indices=plan.replace_positions))
         
         return jsonify({
             "success": True,
-            "newStudentsUploaded": len(new_df),
-            "totalStudentsNow": new_total
+            "newStudentsUploaded": len(plan.new_rows),
+            "unchanged": plan.unchanged,
+            "replaced": len(plan.replace_positions),
+            "retrained": True,
+            "totalStudentsNow": new_total,
+            "retrainAdvised": clustering.drift_monitor.report()["retrainAdvised"] or ML.drift_monitor.report()["retrainAdvised"]
         })
     except Exception as e:
         print("Upload error:\n", traceback.format_exc())
@@ -140,15 +302,39 @@ def upload_data():
 
 @app.route("/api/interventions", methods=["GET"])
 def get_interventions():
-    return jsonify({"interventions": INTERVENTIONS})
+    try:
+        student_index = request.args.get("studentIndex", type=int)
+        limit = request.args.get("limit", intervention_store.DEFAULT_PAGE_SIZE, type=int)
+        offset = request.args.get("offset", 0, type=int)
+        items, total = intervention_store.list_interventions(
+            student_index=student_index,
+            class_name=request.args.get("className"),
+            strategy=request.args.get("strategy"),
+            limit=limit,
+            offset=offset
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    next_offset = offset + len(items) if offset + len(items) < total else None
+    return jsonify({"interventions": items, "total": total, "nextOffset": next_offset})
 
 @app.route("/api/intervention", methods=["POST"])
 def add_intervention():
     data = request.get_json()
     if not data or "studentIndex" not in data or "strategy" not in data or "outcome" not in data:
         return jsonify({"error": "Missing required fields"}), 400
-    INTERVENTIONS.append(data)
-    return jsonify({"success": True, "interventionId": len(INTERVENTIONS) - 1})
+    try:
+        data["studentIndex"] = int(data["studentIndex"])
+    except (TypeError, ValueError):
+        return jsonify({"error": "studentIndex must be an integer"}), 400
+    if not data.get("className"):
+        student = clustering.get_student_by_index(data["studentIndex"])
+        data["className"] = student.get("Class_Section") if student else None
+    try:
+        intervention_id = intervention_store.add_intervention(data)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"success": True, "interventionId": intervention_id})
 
 if __name__ == "__main__":
     app.run(debug=True, port=5001, host="0.0.0.0")
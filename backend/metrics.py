@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import glob
+import bisect
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from flask import Blueprint, Response, request, g
+from flask.json.provider import DefaultJSONProvider
+
+# Lightweight Prometheus-style latency histograms. Each process keeps its own
+# in-memory counters; when METRICS_DIR is set (serve.py does this), every
+# worker periodically flushes a snapshot there and /api/metrics merges them so
+# a scrape sees the whole server, not just the worker that answered it.
+ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+METRICS_DIR = os.getenv("METRICS_DIR")
+FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    "praxis_http_request_duration_seconds": "Latency of API requests by endpoint.",
+    "praxis_stage_duration_seconds": "Time spent in internal pipeline stages.",
+}
+
+metrics_bp = Blueprint('metrics', __name__, url_prefix='/api')
+
+_lock = threading.Lock()
+_series = {}  # (metric, labels tuple) -> [bucket counts..., +Inf count, sum]
+_flusher_pid = None
+
+def observe(metric, seconds, **labels):
+    """Records one observation in the histogram `metric` with the given labels."""
+    if not ENABLED:
+        return
+    key = (metric, tuple(sorted(labels.items())))
+    slot = bisect.bisect_left(BUCKETS, seconds)
+    with _lock:
+        series = _series.get(key)
+        if series is None:
+            series = _series[key] = [0] * (len(BUCKETS) + 2)
+        series[slot] += 1
+        series[-1] += seconds
+    _ensure_flusher()
+
+@contextmanager
+def span(stage):
+    """Times the enclosed block as an internal pipeline stage."""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("praxis_stage_duration_seconds", time.perf_counter() - start, stage=stage)
+
+def timed(stage):
+    """Decorator form of span() for whole functions."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _snapshot():
+    with _lock:
+        return {key: list(series) for key, series in _series.items()}
+
+def _snapshot_path(pid):
+    return os.path.join(METRICS_DIR, f"metrics_{pid}.json")
+
+def _flush():
+    data = [[metric, list(labels), series] for (metric, labels), series in _snapshot().items()]
+    tmp_path = _snapshot_path(os.getpid()) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, _snapshot_path(os.getpid()))
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            _flush()
+        except OSError as e:
+            print("Metrics flush error:", str(e))
+
+def _ensure_flusher():
+    # Started lazily and re-started after fork, since threads don't survive it
+    global _flusher_pid
+    if METRICS_DIR is None or _flusher_pid == os.getpid():
+        return
+    _flusher_pid = os.getpid()
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    threading.Thread(target=_flush_loop, daemon=True).start()
+
+def _merged_series():
+    merged = _snapshot()
+    if METRICS_DIR is None:
+        return merged
+    own_path = _snapshot_path(os.getpid())
+    for path in glob.glob(os.path.join(METRICS_DIR, "metrics_*.json")):
+        if path == own_path:
+            continue
+        try:
+            with open(path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for metric, labels, series in entries:
+            key = (metric, tuple(tuple(pair) for pair in labels))
+            if key in merged:
+                merged[key] = [a + b for a, b in zip(merged[key], series)]
+            else:
+                merged[key] = series
+    return merged
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def render_prometheus():
+    """Renders every histogram in the Prometheus text exposition format."""
+    by_metric = {}
+    for (metric, labels), series in _merged_series().items():
+        by_metric.setdefault(metric, []).append((labels, series))
+
+    lines = []
+    for metric in sorted(by_metric):
+        lines.append(f"# HELP {metric} {HELP.get(metric, metric)}")
+        lines.append(f"# TYPE {metric} histogram")
+        for labels, series in sorted(by_metric[metric]):
+            cumulative = 0
+            for bound, count in zip(BUCKETS, series):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_format_labels(labels, ('le', repr(bound)))} {cumulative}")
+            cumulative += series[len(BUCKETS)]
+            lines.append(f"{metric}_bucket{_format_labels(labels, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {series[-1]:.6f}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that records jsonify() cost as the serialization stage."""
+    def dumps(self, obj, **kwargs):
+        with span("serialization"):
+            return super().dumps(obj, **kwargs)
+
+def _start_timer():
+    g.metrics_start = time.perf_counter()
+
+def _record_request(response):
+    start = g.pop("metrics_start", None)
+    if start is not None:
+        # Label by route template so /api/student/<int:index> is one series
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        observe("praxis_http_request_duration_seconds", time.perf_counter() - start,
+                endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+def init_app(app):
+    """Registers the request timing hooks, JSON timing and the /api/metrics route."""
+    app.json = TimedJSONProvider(app)
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.register_blueprint(metrics_bp)
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,366 @@
+import os
+import sys
+import json
+import hashlib
+import numpy as np
+
+# Pickle-free model artifacts and the inference code that runs them. An
+# artifact is <prefix>.bin, a flat buffer of little-endian arrays (scaler
+# stats, coefficients, centroids) each aligned to ALIGNMENT bytes, plus
+# <prefix>.json, a manifest with every array's dtype/shape/offset, the column
+# names and category vocabularies, and the SHA-256 of the buffer. Tree
+# ensembles are flattened into parallel node arrays (feature, threshold,
+# children, leaf value) so a batch is scored by walking every row down every
+# tree at once, one numpy step per tree level. Loading
+# memory-maps the buffer, so pages are shared between processes and nothing
+# is deserialised. This module only needs numpy: exporting reads the fitted
+# sklearn objects' attributes, and inference never imports sklearn.
+FORMAT_NAME = "praxis-model"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+VERIFY_CHECKSUM = os.getenv("MODEL_VERIFY_CHECKSUM", "1") == "1"
+
+class ArtifactError(ValueError):
+    """The artifact is missing, corrupt, or not one this module understands."""
+
+def _paths(prefix):
+    return prefix + ".bin", prefix + ".json"
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def write_artifact(prefix, kind, arrays, meta):
+    """Writes the buffer and manifest; the manifest is replaced last so readers never see a torn pair."""
+    bin_path, manifest_path = _paths(prefix)
+    os.makedirs(os.path.dirname(bin_path) or ".", exist_ok=True)
+    layout, offset = {}, 0
+    with open(bin_path + ".tmp", "wb") as f:
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array, dtype=np.asarray(array).dtype.newbyteorder("<"))
+            padding = -offset % ALIGNMENT
+            f.write(b"\0" * padding)
+            offset += padding
+            layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            f.write(array.tobytes())
+            offset += array.nbytes
+    os.replace(bin_path + ".tmp", bin_path)
+
+    manifest = {"format": FORMAT_NAME, "formatVersion": FORMAT_VERSION, "kind": kind,
+                "sha256": _sha256(bin_path), "arrays": layout, **meta}
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+def read_artifact(prefix, verify=None):
+    """(manifest, {name: read-only memory-mapped array})."""
+    bin_path, manifest_path = _paths(prefix)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ArtifactError(f"Cannot read manifest {manifest_path}: {e}")
+    if manifest.get("format") != FORMAT_NAME or manifest.get("formatVersion") != FORMAT_VERSION:
+        raise ArtifactError(f"{manifest_path} is not a {FORMAT_NAME} v{FORMAT_VERSION} manifest")
+    if not os.path.exists(bin_path):
+        raise ArtifactError(f"Missing model buffer {bin_path}")
+    if (VERIFY_CHECKSUM if verify is None else verify) and _sha256(bin_path) != manifest["sha256"]:
+        raise ArtifactError(f"Checksum mismatch for {bin_path}")
+
+    arrays = {}
+    if os.path.getsize(bin_path):
+        buffer = np.memmap(bin_path, dtype=np.uint8, mode="r")
+        for name, spec in manifest["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"], dtype=np.int64))
+            start = spec["offset"]
+            arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+    return manifest, arrays
+
+def is_fresh(prefix, source_path):
+    """True when the artifact exists and is at least as new as the pickle it was exported from."""
+    bin_path, manifest_path = _paths(prefix)
+    if not (os.path.exists(bin_path) and os.path.exists(manifest_path)):
+        return False
+    return not os.path.exists(source_path) or os.path.getmtime(manifest_path) >= os.path.getmtime(source_path)
+
+# ---------------------------------------------------------------- export
+
+def _json_value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+def _preprocessor_parts(preprocessor):
+    """Scaler stats and vocabularies of a fitted preprocessing.build_preprocessor() transformer."""
+    numeric = preprocessor.named_transformers_["num"]
+    scaler = numeric.steps[-1][1] if hasattr(numeric, "steps") else numeric
+    encoder = preprocessor.named_transformers_["cat"]
+    arrays = {
+        "mean": np.asarray(scaler.mean_, dtype=np.float64),
+        "scale": np.asarray(scaler.scale_, dtype=np.float64),
+    }
+    meta = {
+        "numeric": list(preprocessor.transformers_[0][2]),
+        "categorical": list(preprocessor.transformers_[1][2]),
+        "categories": [[_json_value(v) for v in cats] for cats in encoder.categories_],
+    }
+    return arrays, meta
+
+def export_linear_pipeline(pipeline, prefix, meta=None):
+    """Pipeline(prep, linear reg) -> artifact; needs a 1-D coef_ and a scalar intercept_."""
+    arrays, layout = _preprocessor_parts(pipeline.named_steps["prep"])
+    reg = pipeline.named_steps["reg"]
+    arrays["coef"] = np.asarray(reg.coef_, dtype=np.float64)
+    arrays["intercept"] = np.atleast_1d(np.asarray(reg.intercept_, dtype=np.float64))
+    write_artifact(prefix, "linear_pipeline", arrays,
+                   {**layout, "estimator": type(reg).__name__, **(meta or {})})
+
+def is_tree_ensemble(reg):
+    """Gradient-boosted sklearn regressors whose raw prediction is the score (identity link)."""
+    link = getattr(getattr(reg, "_loss", None), "link", None)
+    return (hasattr(reg, "_predictors") or hasattr(reg, "estimators_") and hasattr(reg, "init_")) \
+        and type(link).__name__ == "IdentityLink"
+
+def _flatten_trees(reg):
+    """(node arrays, baseline, input dtype) for HistGradientBoosting- or GradientBoostingRegressor."""
+    if hasattr(reg, "_predictors"):
+        trees = []
+        for (predictor,) in reg._predictors:
+            nodes = predictor.nodes
+            trees.append((nodes["feature_idx"], nodes["num_threshold"], nodes["left"], nodes["right"],
+                          nodes["is_leaf"].astype(bool), nodes["missing_go_to_left"].astype(bool), nodes["value"]))
+        return trees, float(np.ravel(reg._baseline_prediction)[0]), "float64"
+    trees = []
+    for (estimator,) in reg.estimators_:
+        tree = estimator.tree_
+        trees.append((tree.feature, tree.threshold, tree.children_left, tree.children_right,
+                      tree.children_left == -1, getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, bool)),
+                      tree.value[:, 0, 0] * reg.learning_rate))
+    # Trees compare float32 copies of the features, like DecisionTreeRegressor.predict
+    return trees, float(np.ravel(reg.init_.predict(np.zeros((1, reg.n_features_in_))))[0]), "float32"
+
+def _renumber(left, right, is_leaf):
+    """Breadth-first order in which every split's right child directly follows its left one.
+    Returns (order: new -> old node, depth of the tree)."""
+    order, level, depth = [0], [0], 0
+    while True:
+        splits = [n for n in level if not is_leaf[n]]
+        if not splits:
+            return np.asarray(order), depth
+        level = [c for n in splits for c in (left[n], right[n])]
+        order.extend(level)
+        depth += 1
+
+def export_tree_pipeline(pipeline, prefix, meta=None):
+    """Pipeline(prep, gradient-boosted trees) -> artifact of concatenated node arrays.
+
+    Nodes are renumbered so a split's children are adjacent: stepping down is
+    child[node] + went_right. Leaves point at themselves with an infinite
+    threshold, so rows that reach a leaf early just stay there.
+    """
+    arrays, layout = _preprocessor_parts(pipeline.named_steps["prep"])
+    reg = pipeline.named_steps["reg"]
+    trees, baseline, input_dtype = _flatten_trees(reg)
+    columns = {name: [] for name in ("feature", "threshold", "child", "missing_right", "value")}
+    roots, depths, offset = [], [], 0
+    for feature, threshold, left, right, is_leaf, missing_left, value in trees:
+        order, depth = _renumber(np.asarray(left), np.asarray(right), np.asarray(is_leaf))
+        new_id = np.empty(len(feature), dtype=np.int64)
+        new_id[order] = np.arange(len(order)) + offset
+        leaf = np.asarray(is_leaf)[order]
+        left_new = np.where(leaf, 0, new_id[np.where(leaf, 0, np.asarray(left)[order])])
+        columns["feature"].append(np.where(leaf, 0, np.asarray(feature)[order]))
+        columns["threshold"].append(np.where(leaf, np.inf, np.asarray(threshold)[order]))
+        columns["child"].append(np.where(leaf, np.arange(len(order)) + offset, left_new))
+        columns["missing_right"].append(~np.asarray(missing_left)[order] & ~leaf)
+        columns["value"].append(np.where(leaf, np.asarray(value)[order], 0))
+        roots.append(offset)
+        depths.append(depth)
+        offset += len(order)
+
+    dtypes = {"feature": np.int32, "threshold": np.float64, "child": np.int32,
+              "missing_right": np.bool_, "value": np.float64}
+    for name, parts in columns.items():
+        arrays[name] = np.concatenate(parts).astype(dtypes[name])
+    arrays["roots"] = np.asarray(roots, dtype=np.int32)
+    arrays["depths"] = np.asarray(depths, dtype=np.int32)
+    write_artifact(prefix, "tree_ensemble", arrays,
+                   {**layout, "estimator": type(reg).__name__, "baseline": baseline,
+                    "inputDtype": input_dtype, **(meta or {})})
+
+def export_kmeans(preprocessor, model, prefix, meta=None):
+    arrays, layout = _preprocessor_parts(preprocessor)
+    arrays["centers"] = np.asarray(model.cluster_centers_, dtype=np.float64)
+    write_artifact(prefix, "kmeans", arrays,
+                   {**layout, "estimator": type(model).__name__, **(meta or {})})
+
+# ---------------------------------------------------------------- inference
+
+class Encoder:
+    """StandardScaler + OneHotEncoder(handle_unknown="ignore") rebuilt from an artifact."""
+    def __init__(self, manifest, arrays):
+        self.numeric = manifest["numeric"]
+        self.categorical = manifest["categorical"]
+        self.vocabularies = [{v: i for i, v in enumerate(cats)} for cats in manifest["categories"]]
+        self.mean = arrays["mean"]
+        self.scale = arrays["scale"]
+        sizes = [len(cats) for cats in manifest["categories"]]
+        self.offsets = len(self.numeric) + np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        self.n_features = len(self.numeric) + sum(sizes)
+
+    def numeric_block(self, frame):
+        return np.column_stack([np.asarray(frame[col], dtype=np.float64) for col in self.numeric]) \
+            if self.numeric else np.empty((0, 0))
+
+    def codes(self, frame, i):
+        """Vocabulary index of every value in column i; len(vocabulary) marks unknown values."""
+        column = frame[self.categorical[i]]
+        vocabulary = self.vocabularies[i]
+        unknown = len(vocabulary)
+        pandas = sys.modules.get("pandas")
+        if pandas is not None and isinstance(column, pandas.Series) and isinstance(column.dtype, pandas.CategoricalDtype):
+            # Already integer codes: look up each category once, missing (-1) lands on unknown
+            lookup = [vocabulary.get(v, unknown) for v in column.cat.categories] + [unknown]
+            return np.array(lookup, dtype=np.int64)[column.cat.codes.to_numpy()]
+        if pandas is not None and isinstance(column, pandas.Series):
+            # Hash-based and far faster than sorting strings; missing values come back as -1
+            codes, uniques = pandas.factorize(column)
+            return np.array([vocabulary.get(v, unknown) for v in uniques] + [unknown], dtype=np.int64)[codes]
+        values = np.asarray(column, dtype=object)
+        try:
+            # Look up each distinct value once instead of once per row
+            uniques, inverse = np.unique(values, return_inverse=True)
+            return np.array([vocabulary.get(v, unknown) for v in uniques], dtype=np.int64)[inverse.reshape(-1)]
+        except TypeError:
+            return np.fromiter((vocabulary.get(v, unknown) for v in values), dtype=np.int64, count=len(values))
+
+    def transform(self, frame):
+        """Dense (n, n_features) matrix laid out exactly like the fitted ColumnTransformer's."""
+        numeric = self.numeric_block(frame)
+        n = len(numeric) if self.numeric else len(np.asarray(frame[self.categorical[0]]))
+        X = np.zeros((n, self.n_features))
+        if self.numeric:
+            X[:, :len(self.numeric)] = (numeric - self.mean) / self.scale
+        rows = np.arange(n)
+        for i in range(len(self.categorical)):
+            codes = self.codes(frame, i)
+            known = codes < len(self.vocabularies[i])
+            X[rows[known], self.offsets[i] + codes[known]] = 1.0
+        return X
+
+class LinearModel:
+    """A linear pipeline with the scaler folded into the weights and each
+    categorical's coefficients as a lookup table, so prediction never builds
+    the one-hot matrix."""
+    def __init__(self, manifest, arrays):
+        self.manifest = manifest
+        self.encoder = Encoder(manifest, arrays)
+        coef = arrays["coef"]
+        n_num = len(self.encoder.numeric)
+        self.weights = coef[:n_num] / self.encoder.scale
+        self.bias = float(arrays["intercept"][0] - np.dot(self.encoder.mean, self.weights))
+        self.tables = [np.append(coef[start:start + len(vocab)], 0.0)  # trailing 0 = unknown category
+                       for start, vocab in zip(self.encoder.offsets, self.encoder.vocabularies)]
+
+    def encode(self, frame):
+        """(numeric block, vocabulary codes of every categorical): all predict_encoded needs."""
+        numeric = self.encoder.numeric_block(frame) if self.encoder.numeric else None
+        return numeric, [self.encoder.codes(frame, i) for i in range(len(self.tables))]
+
+    def predict_encoded(self, encoded):
+        numeric, codes = encoded
+        pred = numeric @ self.weights + self.bias if numeric is not None else self.bias
+        for table, column in zip(self.tables, codes):
+            pred = pred + table[column]
+        return np.asarray(pred, dtype=np.float64)
+
+    def predict(self, frame):
+        return self.predict_encoded(self.encode(frame))
+
+class KMeansModel:
+    """Nearest-centroid assignment over the encoded rows."""
+    def __init__(self, manifest, arrays):
+        self.manifest = manifest
+        self.encoder = Encoder(manifest, arrays)
+        self.centers = arrays["centers"]
+        self.center_norms = np.einsum("ij,ij->i", self.centers, self.centers)
+        self.n_clusters = len(self.centers)
+
+    def encode(self, frame):
+        return self.encoder.transform(frame)
+
+    def distances(self, X):
+        squared = np.einsum("ij,ij->i", X, X)[:, None] - 2 * X @ self.centers.T + self.center_norms
+        return np.sqrt(np.maximum(squared, 0))
+
+    def transform(self, frame):
+        """Euclidean distance from every row to every centroid, like KMeans.transform."""
+        return self.distances(self.encode(frame))
+
+    def predict_encoded(self, X):
+        return self.distances(X).argmin(axis=1)
+
+    def predict(self, frame):
+        return self.predict_encoded(self.encode(frame))
+
+NODE_DTYPE = np.dtype([("threshold", "f8"), ("feature", "i4"), ("child", "i4")])  # 16 bytes, stays aligned
+
+class TreeEnsembleModel:
+    """Gradient-boosted trees scored for a whole batch at once: a (rows x trees)
+    matrix of node ids advances one level per numpy step, no per-row Python.
+    Trees are grouped by depth so shallow trees stop walking early."""
+    MAX_CELLS = 2_000_000  # rows x trees walked per chunk, bounds the index matrices
+
+    def __init__(self, manifest, arrays):
+        self.manifest = manifest
+        self.encoder = Encoder(manifest, arrays)
+        # One record per node so each level is a single gather instead of three
+        self.nodes = np.empty(len(arrays["feature"]), dtype=NODE_DTYPE)
+        for field in NODE_DTYPE.names:
+            self.nodes[field] = arrays[field]
+        self.missing_right = arrays["missing_right"]
+        self.value = arrays["value"]
+        self.baseline = manifest["baseline"]
+        self.input_dtype = np.dtype(manifest["inputDtype"])
+        depths = arrays["depths"]
+        self.groups = [(int(d), np.asarray(arrays["roots"][depths == d])) for d in np.unique(depths)]
+        self.n_trees = len(depths)
+
+    def _walk(self, X):
+        flat = X.ravel()
+        has_missing = np.isnan(flat).any()
+        total = np.full(len(X), self.baseline)
+        offsets = (np.arange(len(X), dtype=np.int64) * X.shape[1])[:, None]
+        for depth, roots in self.groups:
+            nodes = np.broadcast_to(roots, (len(X), len(roots)))
+            for _ in range(depth):
+                node = self.nodes[nodes]
+                x = flat[offsets + node["feature"]]
+                went_right = ~(x <= node["threshold"])  # NaN compares False: goes right...
+                if has_missing:
+                    went_right &= ~np.isnan(x) | self.missing_right[nodes]  # ...unless it belongs left
+                nodes = node["child"] + went_right
+            total += self.value[nodes].sum(axis=1)
+        return total
+
+    def encode(self, frame):
+        return self.encoder.transform(frame).astype(self.input_dtype).astype(np.float64)
+
+    def predict_encoded(self, X):
+        chunk = max(1, self.MAX_CELLS // max(self.n_trees, 1))
+        return np.concatenate([self._walk(X[start:start + chunk]) for start in range(0, len(X), chunk)]) \
+            if len(X) else np.empty(0)
+
+    def predict(self, frame):
+        return self.predict_encoded(self.encode(frame))
+
+KINDS = {"linear_pipeline": LinearModel, "kmeans": KMeansModel, "tree_ensemble": TreeEnsembleModel}
+
+def load(prefix, verify=None):
+    """The inference model stored at prefix (LinearModel, KMeansModel or TreeEnsembleModel)."""
+    manifest, arrays = read_artifact(prefix, verify)
+    if manifest["kind"] not in KINDS:
+        raise ArtifactError(f"Unknown model kind {manifest['kind']!r} in {prefix}.json")
+    return KINDS[manifest["kind"]](manifest, arrays)
@@ -0,0 +1,91 @@
+import threading
+import numpy as np
+import ML
+import clustering
+import metrics
+
+# Materialised predictions for every stored student: exam score from the live
+# regression pipeline, persona and distance to its centroid from the live
+# clustering model. Each half is tagged with the model version it was computed
+# with; a new version recomputes that half in bulk, otherwise only rows an
+# upload touched (plus rows appended since) are recomputed. Reads are an array
+# lookup by student index.
+_refresh_lock = threading.Lock()  # one writer at a time
+_lock = threading.Lock()          # guards the swap below against readers
+_score_version = None
+_scores = np.empty(0, dtype=np.float32)
+_cluster_version = None
+_clusters = np.empty(0, dtype=np.int16)
+_distances = np.empty(0, dtype=np.float32)
+_personas = {}  # raw cluster id -> persona name at _cluster_version
+
+def _rows_to_update(current, total, touched):
+    """Touched rows that already exist plus everything appended since the last refresh."""
+    touched = np.asarray([i for i in touched if i < current], dtype=np.int64)
+    return np.concatenate([touched, np.arange(current, total, dtype=np.int64)])
+
+def _extend(array, total):
+    grown = np.empty(total, dtype=array.dtype)
+    grown[:min(len(array), total)] = array[:total]
+    return grown
+
+def _refresh_scores(touched):
+    version, frame = ML.model_version, ML.df_ml
+    if version == _score_version and len(frame) == len(_scores) and not len(touched):
+        return _scores, _score_version
+    features = frame.drop(columns=["Exam_Score"])
+    if version != _score_version:
+        return ML.predict_frame(features), version
+    rows = _rows_to_update(len(_scores), len(frame), touched)
+    scores = _extend(_scores, len(frame))
+    scores[rows] = ML.predict_frame(features.iloc[rows])
+    return scores, version
+
+def _refresh_clusters(touched):
+    version, frame = clustering.model_version, clustering.df_cluster
+    if version == _cluster_version and len(frame) == len(_clusters) and not len(touched):
+        return _clusters, _distances, _personas, _cluster_version
+    features = frame.drop(columns=clustering.NON_FEATURE_COLS, errors="ignore")
+    personas = dict(clustering.persona_mapping)
+    if version != _cluster_version:
+        return (*clustering.assign_clusters(features), personas, version)
+    rows = _rows_to_update(len(_clusters), len(frame), touched)
+    clusters, distances = _extend(_clusters, len(frame)), _extend(_distances, len(frame))
+    clusters[rows], distances[rows] = clustering.assign_clusters(features.iloc[rows])
+    return clusters, distances, personas, version
+
+@metrics.timed("prediction_table_refresh")
+def refresh(touched=()):
+    """Brings the table in line with the live models and data.
+
+    `touched` are existing rows whose values changed in place (an upload's
+    replacements); rows appended since the last refresh are always included.
+    """
+    global _score_version, _scores, _cluster_version, _clusters, _distances, _personas
+    with _refresh_lock:
+        scores, score_version = _refresh_scores(touched)
+        clusters, distances, personas, cluster_version = _refresh_clusters(touched)
+        with _lock:
+            _scores, _score_version = scores, score_version
+            _clusters, _distances, _personas, _cluster_version = clusters, distances, personas, cluster_version
+
+def is_current():
+    return (_score_version == ML.model_version and _cluster_version == clustering.model_version
+            and len(_scores) == len(ML.df_ml) and len(_clusters) == len(clustering.df_cluster))
+
+def lookup(index):
+    """Stored predictions for one student, or None for an unknown index."""
+    if not is_current():
+        # A model went live without going through refresh(); catch up before answering
+        refresh()
+    with _lock:
+        if index < 0 or index >= min(len(_scores), len(_clusters)):
+            return None
+        return {
+            "index": index,
+            "predictedScore": round(float(_scores[index]), 1),
+            "predictedPersona": _personas.get(int(_clusters[index]), "Unknown"),
+            "distanceToCentroid": round(float(_distances[index]), 4),
+            "modelVersion": _score_version,
+            "clusteringVersion": _cluster_version,
+        }
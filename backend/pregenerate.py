@@ -0,0 +1,284 @@
+import os
+import time
+import atexit
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import changelog
+import clustering
+import gemini_service
+
+# Background pre-generation of the Gemini explanation and strategies for
+# at-risk students, so opening one serves stored text instead of waiting on
+# the model. Whenever a process sees a data version it hasn't covered yet it
+# walks the at-risk students, most urgent first, through a pool of WORKERS
+# threads. Prompts are built on the server from clustering.get_student_by_index
+# and results are stored per (student, data version, kind) with a hash of the
+# prompt. The endpoints look a student up by index, not by the client's copy
+# of the student (the dashboard sends its own reshaped one), and serve the
+# stored text only while the prompt the server would build now hashes the
+# same, so new data or intervention history never serves stale text. Rows are
+# claimed in SQLite before generating, so gunicorn workers never
+# duplicate a call, and RATE_PER_MINUTE is a sliding window shared by all of
+# them. PREGEN_MODEL=fake swaps Gemini for a local stand-in (see fake_generate).
+BASE_DIR = os.path.dirname(__file__)
+DB_PATH = os.getenv("PREGEN_DB", os.path.join(BASE_DIR, "data", "pregenerated.db"))
+ENABLED = os.getenv("PREGEN_ENABLED", "1") == "1"  # 0: no background runs; stored text is still served
+MODEL = os.getenv("PREGEN_MODEL", "gemini")
+WORKERS = int(os.getenv("PREGEN_WORKERS", "2"))
+RATE_PER_MINUTE = int(os.getenv("PREGEN_RATE_PER_MINUTE", "20"))
+MAX_STUDENTS = int(os.getenv("PREGEN_MAX_STUDENTS", "100"))
+CLAIM_TIMEOUT = float(os.getenv("PREGEN_CLAIM_TIMEOUT", "300"))  # a claim older than this was abandoned
+FAKE_LATENCY_MS = float(os.getenv("PREGEN_FAKE_LATENCY_MS", "0"))
+CHECK_INTERVAL = float(os.getenv("PREGEN_CHECK_INTERVAL", "5"))  # seconds between data version checks
+MAX_FAILURES_PER_RUN = 5  # the model is down or misconfigured: stop spending budget on it
+
+EXPLANATION, STRATEGIES = "explanation", "strategies"
+PENDING, DONE, FAILED = "pending", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pregenerated (
+    student_index INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    text TEXT,
+    claimed_at REAL NOT NULL,
+    PRIMARY KEY (student_index, version, kind)
+);
+CREATE TABLE IF NOT EXISTS llm_calls (
+    called_at REAL NOT NULL
+);
+"""
+
+_lock = threading.Lock()
+_state = {"pid": None, "version": None, "checked_at": 0.0}
+_stopping = threading.Event()  # set at shutdown: runs stop submitting and skip queued prompts
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+def init_store():
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    conn = _connect()
+    try:
+        conn.executescript(SCHEMA)
+    finally:
+        conn.close()
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+def fake_generate(prompt):
+    """Stand-in model for tests and local runs: deterministic text, optional latency, no network."""
+    if FAKE_LATENCY_MS:
+        time.sleep(FAKE_LATENCY_MS / 1000)
+    return f"[fake model] response to prompt {prompt_hash(prompt)[:12]}"
+
+def default_generate():
+    return fake_generate if MODEL == "fake" else gemini_service.generate_text
+
+def _same_student(client, server):
+    """False when the client's copy visibly belongs to another student (or another data version)."""
+    score = client.get("examScore", client.get("Exam_Score"))
+    try:
+        return score is None or float(score) == float(server["Exam_Score"])
+    except (TypeError, ValueError):
+        return True  # a placeholder like "—" says nothing either way
+
+def lookup(kind, student_index, student=None):
+    """Stored text for this student at the current data version, or None.
+    `student` is the client's copy, only used to reject an index that doesn't match it."""
+    try:
+        index = int(student_index)
+    except (TypeError, ValueError):
+        return None
+    server_student = clustering.get_student_by_index(index)
+    if server_student is None or (isinstance(student, dict) and not _same_student(student, server_student)):
+        return None
+    prompt = _prompts(index, server_student, (kind,))[kind]
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT text FROM pregenerated WHERE student_index = ? AND version = ? AND kind = ? "
+                "AND prompt_hash = ? AND status = ?",
+                (index, changelog.applied_version(), kind, prompt_hash(prompt), DONE)
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print("Pregenerated lookup failed:", str(e))
+        return None
+    return row[0] if row else None
+
+def _claim(index, version, kind, digest):
+    """True if this process should generate (index, version, kind) for the prompt with this digest."""
+    now = time.time()
+    conn = _connect()
+    try:
+        inserted = conn.execute(
+            "INSERT OR IGNORE INTO pregenerated (student_index, version, kind, prompt_hash, status, claimed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)", (index, version, kind, digest, PENDING, now)
+        ).rowcount
+        if inserted:
+            return True
+        # Someone else's row: take it over only if it is for another prompt or was abandoned/failed
+        return conn.execute(
+            "UPDATE pregenerated SET prompt_hash = ?, status = ?, text = NULL, claimed_at = ? "
+            "WHERE student_index = ? AND version = ? AND kind = ? "
+            "AND (prompt_hash != ? OR (status != ? AND claimed_at < ?))",
+            (digest, PENDING, now, index, version, kind, digest, DONE, now - CLAIM_TIMEOUT)
+        ).rowcount == 1
+    finally:
+        conn.close()
+
+def _finish(index, version, kind, digest, text):
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE pregenerated SET status = ?, text = ? "
+            "WHERE student_index = ? AND version = ? AND kind = ? AND prompt_hash = ?",
+            (DONE if text is not None else FAILED, text, index, version, kind, digest)
+        )
+    finally:
+        conn.close()
+
+def _take_budget(rate_per_minute):
+    """Blocks until a model call fits in the shared per-minute window, then records it."""
+    while True:
+        conn = _connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            conn.execute("DELETE FROM llm_calls WHERE called_at <= ?", (now - 60,))
+            calls = conn.execute("SELECT called_at FROM llm_calls ORDER BY called_at").fetchall()
+            if len(calls) < rate_per_minute:
+                conn.execute("INSERT INTO llm_calls (called_at) VALUES (?)", (now,))
+                conn.execute("COMMIT")
+                return
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        time.sleep(max(calls[0][0] + 60 - now, 0.05))
+
+def prompts_for(index, kinds=(EXPLANATION, STRATEGIES)):
+    """{kind: prompt} for one student, built from the server's copy of the student; {} if unknown."""
+    student = clustering.get_student_by_index(index)
+    return {} if student is None else _prompts(index, student, kinds)
+
+def _prompts(index, student, kinds):
+    # Same text (and hash) whatever order the columns are in
+    student = dict(sorted(student.items()))
+    prompts = {}
+    if EXPLANATION in kinds:
+        prompts[EXPLANATION] = gemini_service.explain_prompt(student)
+    if STRATEGIES in kinds:
+        past = gemini_service.past_interventions(index)
+        prompts[STRATEGIES] = gemini_service.strategy_prompt(student["clusterName"], student, past)
+    return prompts
+
+def run(version=None, generate=None, workers=None, rate_per_minute=None, max_students=None):
+    """Generates everything missing for the at-risk students at `version`; returns counts per outcome."""
+    version = changelog.applied_version() if version is None else version
+    generate = generate or default_generate()
+    rate_per_minute = RATE_PER_MINUTE if rate_per_minute is None else rate_per_minute
+    max_students = MAX_STUDENTS if max_students is None else max_students
+    stats = {"generated": 0, "cached": 0, "failed": 0, "stale": 0}
+    stats_lock = threading.Lock()
+
+    def count(outcome):
+        with stats_lock:
+            stats[outcome] += 1
+
+    def work(index, kind, prompt):
+        if _stopping.is_set():
+            return
+        digest = prompt_hash(prompt)
+        if changelog.applied_version() != version:
+            count("stale")  # the data moved on; the next run covers the new version
+            return
+        if not _claim(index, version, kind, digest):
+            count("cached")
+            return
+        text = None
+        try:
+            if rate_per_minute > 0:
+                _take_budget(rate_per_minute)
+            text = generate(prompt)
+        except Exception as e:
+            print(f"Pre-generation failed for student {index} ({kind}):", str(e))
+        _finish(index, version, kind, digest, text)
+        count("generated" if text is not None else "failed")
+
+    init_store()
+    workers = WORKERS if workers is None else workers
+    slots = threading.BoundedSemaphore(workers * 2)  # bounds queued prompts, not just running ones
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pregen") as pool:
+        for index in clustering.get_at_risk_indices(max_students):
+            if stats["failed"] >= MAX_FAILURES_PER_RUN:
+                print(f"Pre-generation stopped after {stats['failed']} failed model calls")
+                break
+            if _stopping.is_set():
+                break
+            for kind, prompt in prompts_for(index).items():
+                slots.acquire()
+                try:
+                    future = pool.submit(work, index, kind, prompt)
+                except RuntimeError:
+                    # The interpreter is shutting down and the pool takes no more work
+                    _stopping.set()
+                    slots.release()
+                    break
+                future.add_done_callback(lambda _: slots.release())
+    if not _stopping.is_set():
+        _prune(version)
+    return stats
+
+def _prune(version):
+    conn = _connect()
+    try:
+        conn.execute("DELETE FROM pregenerated WHERE version < ?", (version,))
+    finally:
+        conn.close()
+
+def _run_in_background(version):
+    try:
+        stats = run(version)
+        if not _stopping.is_set():
+            print(f"Pre-generated LLM text for data version {version}: {stats}")
+    except Exception as e:
+        if not _stopping.is_set():
+            print(f"Warning: pre-generation for data version {version} failed: {e}")
+
+def stop():
+    """Stops background runs: nothing new is submitted and queued prompts are skipped.
+    Prompts already at the model finish (their claims expire after CLAIM_TIMEOUT otherwise)."""
+    _stopping.set()
+
+atexit.register(stop)
+
+def ensure_current():
+    """Starts a background run if this process hasn't covered the current data version yet."""
+    if not ENABLED or _stopping.is_set():
+        return
+    now = time.monotonic()
+    with _lock:
+        # Threads don't survive a fork: every gunicorn worker checks for itself (claims dedupe the calls)
+        if _state["pid"] == os.getpid() and now - _state["checked_at"] < CHECK_INTERVAL:
+            return
+        _state["checked_at"] = now
+    version = changelog.applied_version()
+    with _lock:
+        if _state["pid"] == os.getpid() and _state["version"] == version:
+            return
+        _state.update(pid=os.getpid(), version=version)
+    threading.Thread(target=_run_in_background, args=(version,), name="pregen-run", daemon=True).start()
+
+def init_app(app):
+    """Checks for a new data version before each request."""
+    app.before_request(ensure_current)
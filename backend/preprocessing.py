@@ -0,0 +1,47 @@
+import os
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, StandardScaler
+
+# Shared ColumnTransformer factory for ML and clustering. The default keeps the
+# original dense float64 layout; SPARSE_PREPROCESSING=1 keeps the thirteen
+# one-hot columns as CSR and casts the numeric block to float32, which roughly
+# halves the training matrix and lets KMeans/Huber skip the zeros.
+SPARSE_PREPROCESSING = os.getenv("SPARSE_PREPROCESSING", "0") == "1"
+
+def to_float32(X):
+    return np.asarray(X, dtype=np.float32)
+
+def build_preprocessor(num_cols, cat_cols, sparse=None):
+    """StandardScaler on numeric columns + OneHotEncoder on categoricals, dense or sparse/float32."""
+    if sparse is None:
+        sparse = SPARSE_PREPROCESSING
+
+    if not sparse:
+        return ColumnTransformer(
+            transformers=[
+                ("num", StandardScaler(), num_cols),
+                ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), cat_cols)
+            ])
+
+    numeric = Pipeline([
+        ("float32", FunctionTransformer(to_float32, feature_names_out="one-to-one")),
+        ("scale", StandardScaler())
+    ])
+    return ColumnTransformer(
+        transformers=[
+            ("num", numeric, num_cols),
+            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=True, dtype=np.float32), cat_cols)
+        ],
+        sparse_threshold=1.0  # always hand back CSR, the numeric block is small anyway
+    )
+
+def numeric_scaler(preprocessor):
+    """The fitted StandardScaler of a preprocessor from either mode."""
+    numeric = preprocessor.named_transformers_["num"]
+    return numeric[-1] if isinstance(numeric, Pipeline) else numeric
+
+def is_sparse_rejection(error):
+    """True when an estimator refused CSR input, i.e. we should refit on a dense matrix."""
+    return isinstance(error, TypeError) and "sparse" in str(error).lower()
@@ -0,0 +1,199 @@
+import os
+import io
+import json
+import time
+import hmac
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from functools import wraps
+from flask import Blueprint, request, jsonify, send_file, g
+
+# Opt-in per-request profiling. A caller holding PROFILING_TOKEN sends
+# `X-Profile: 1` (or `?profile=1`) plus `X-Profile-Token: <token>`; that one
+# request runs under cProfile + tracemalloc and the result lands in a bounded
+# on-disk ring buffer that /api/debug/profiles serves back. Without a token
+# configured the whole feature is off.
+BASE_DIR = os.path.dirname(__file__)
+PROFILES_DIR = os.getenv("PROFILES_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", "50"))
+PROFILE_MODEL_PATHS = os.getenv("PROFILE_MODEL_PATHS", "0") == "1"
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+profiling_bp = Blueprint('profiling', __name__, url_prefix='/api/debug')
+
+# tracemalloc is process-wide, so only one capture may run at a time
+_capture_lock = threading.Lock()
+
+def _authorized():
+    if not PROFILING_TOKEN:
+        return False
+    token = request.headers.get("X-Profile-Token", "")
+    return hmac.compare_digest(token.encode(), PROFILING_TOKEN.encode())
+
+def _profile_requested():
+    return request.headers.get("X-Profile") == "1" or request.args.get("profile") == "1"
+
+class _Capture:
+    """One cProfile + tracemalloc session."""
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.started_tracemalloc = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self.started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self.start_time = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.duration = time.perf_counter() - self.start_time
+        self.snapshot = tracemalloc.take_snapshot()
+        _, self.peak_bytes = tracemalloc.get_traced_memory()
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+
+    def save(self, label, **extra):
+        """Writes <id>.prof (raw pstats) and <id>.json (summary) and trims the ring."""
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        profile_id = f"{time.time_ns()}-{os.getpid()}"
+
+        stats_stream = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stats_stream)
+        stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        stats.dump_stats(os.path.join(PROFILES_DIR, f"{profile_id}.prof"))
+
+        allocations = [
+            {"location": str(stat.traceback[0]), "sizeKB": round(stat.size / 1024, 1), "count": stat.count}
+            for stat in self.snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+        ]
+        summary = {
+            "id": profile_id,
+            "label": label,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "durationMs": round(self.duration * 1000, 2),
+            "peakAllocatedKB": round(self.peak_bytes / 1024, 1),
+            "topAllocations": allocations,
+            "profile": stats_stream.getvalue(),
+            **extra,
+        }
+        with open(os.path.join(PROFILES_DIR, f"{profile_id}.json"), "w") as f:
+            json.dump(summary, f)
+        _trim_ring()
+        return profile_id
+
+def _trim_ring():
+    summaries = sorted(f for f in os.listdir(PROFILES_DIR) if f.endswith(".json"))
+    for name in summaries[:-RING_SIZE]:
+        profile_id = name[:-len(".json")]
+        for ext in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(PROFILES_DIR, profile_id + ext))
+            except FileNotFoundError:
+                pass
+
+def _start_request_profile():
+    # Never profile the profile viewer itself, it would push real captures out of the ring
+    if request.blueprint == profiling_bp.name or not _profile_requested() or not _authorized():
+        return
+    if not _capture_lock.acquire(blocking=False):
+        g.profile_busy = True
+        return
+    g.profile_capture = _Capture()
+    g.profile_capture.start()
+
+def _finish_request_profile(response):
+    capture = g.pop("profile_capture", None)
+    if capture is not None:
+        try:
+            capture.stop()
+            profile_id = capture.save(f"{request.method} {request.path}", method=request.method,
+                                      path=request.full_path, status=response.status_code)
+            response.headers["X-Profile-Id"] = profile_id
+        finally:
+            _capture_lock.release()
+    elif g.pop("profile_busy", False):
+        response.headers["X-Profile-Id"] = "busy"
+    return response
+
+def _abort_request_profile(exc):
+    # after_request is skipped if the response itself fails; never leak the lock
+    capture = g.pop("profile_capture", None)
+    if capture is not None:
+        capture.profiler.disable()
+        if capture.started_tracemalloc:
+            tracemalloc.stop()
+        _capture_lock.release()
+
+def profiled(label):
+    """Profiles a model init/retrain path when PROFILE_MODEL_PATHS=1."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            # A profiled request already covers anything it calls
+            if not PROFILE_MODEL_PATHS or not _capture_lock.acquire(blocking=False):
+                return func(*args, **kwargs)
+            capture = _Capture()
+            try:
+                capture.start()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    capture.stop()
+                    capture.save(label)
+            finally:
+                _capture_lock.release()
+        return wrapper
+    return decorator
+
+def init_app(app):
+    """Registers the per-request hooks and the /api/debug/profiles routes."""
+    app.before_request(_start_request_profile)
+    app.after_request(_finish_request_profile)
+    app.teardown_request(_abort_request_profile)
+    app.register_blueprint(profiling_bp)
+
+@profiling_bp.route("/profiles", methods=["GET"])
+def list_profiles():
+    if not _authorized():
+        return jsonify({"error": "Profiling not authorized"}), 403
+    if not os.path.isdir(PROFILES_DIR):
+        return jsonify({"profiles": []})
+
+    profiles = []
+    for name in sorted(os.listdir(PROFILES_DIR), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILES_DIR, name)) as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue  # evicted or half-written by another worker
+        profiles.append({k: summary.get(k) for k in ["id", "label", "timestamp", "durationMs", "peakAllocatedKB", "status"]})
+    return jsonify({"profiles": profiles})
+
+@profiling_bp.route("/profiles/<profile_id>", methods=["GET"])
+def get_profile(profile_id):
+    if not _authorized():
+        return jsonify({"error": "Profiling not authorized"}), 403
+    if not profile_id.replace("-", "").isdigit():
+        return jsonify({"error": "Invalid profile id"}), 400
+
+    if request.args.get("format") == "prof":
+        path = os.path.join(PROFILES_DIR, f"{profile_id}.prof")
+        if not os.path.exists(path):
+            return jsonify({"error": "Profile not found"}), 404
+        return send_file(path, mimetype="application/octet-stream", as_attachment=True,
+                         download_name=f"{profile_id}.prof")
+
+    path = os.path.join(PROFILES_DIR, f"{profile_id}.json")
+    if not os.path.exists(path):
+        return jsonify({"error": "Profile not found"}), 404
+    with open(path) as f:
+        return jsonify(json.load(f))
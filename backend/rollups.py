@@ -0,0 +1,99 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+import aggregates
+
+# Hierarchical rollups: class -> grade -> school -> district. Every node holds
+# the mergeable partial (aggregates.py) of everything below it, so any level is
+# answered from one stored partial instead of a scan of its students. Classes
+# are the leaves, addressed by the path (school, grade, class); each prefix of
+# that path is an ancestor and () is the district. Adding or removing rows only
+# touches the ancestors of their classes: O(depth) per changed class.
+SCHOOL_ID = os.getenv("PRAXIS_SCHOOL_ID") or "school"  # the shard's school, or the single-school app
+LEVELS = ["district", "school", "grade", "class"]
+CLASSES = ["10-A", "10-B", "10-C"]
+
+def assign_classes(start, count):
+    """Class sections of rows start..start+count by position: deterministic mock classes."""
+    return pd.Categorical.from_codes(np.arange(start, start + count) % len(CLASSES), CLASSES)
+
+def grade_of(class_name):
+    """Grade a class section belongs to: "10-A" -> "10"."""
+    return str(class_name).split("-", 1)[0]
+
+def leaf_partials(df, school_id=SCHOOL_ID):
+    """{(school, grade, class): partial} for every Class_Section in df, from one groupby."""
+    if len(df) == 0:
+        return {}
+    return {(school_id, grade_of(name), str(name)): partial
+            for name, partial in aggregates.partials_by(df, "Class_Section").items()}
+
+def leaf_partials_from_csv(path, school_id):
+    """leaf_partials of a dashboard CSV read in chunks, classes assigned by row position."""
+    leaves = {}
+    if not os.path.exists(path):
+        return leaves
+    start = 0
+    for chunk in pd.read_csv(path, usecols=aggregates.COLUMNS, chunksize=aggregates.CSV_CHUNK_SIZE):
+        chunk["Class_Section"] = assign_classes(start, len(chunk))
+        start += len(chunk)
+        for leaf, partial in leaf_partials(chunk, school_id).items():
+            aggregates.merge_into(leaves.setdefault(leaf, aggregates.empty_partial()), partial)
+    return leaves
+
+class RollupTree:
+    """Partials for every node above a set of class leaves, kept current as rows change."""
+    def __init__(self, leaves=None):
+        self._lock = threading.Lock()
+        self.nodes = {(): aggregates.empty_partial()}
+        for leaf, partial in (leaves or {}).items():
+            self._apply(leaf, partial, 1)
+
+    def _apply(self, leaf, partial, sign):
+        for depth in range(len(leaf) + 1):
+            path = leaf[:depth]
+            node = aggregates.merge_into(self.nodes.setdefault(path, aggregates.empty_partial()), partial, sign)
+            if path and node["students"] <= 0:
+                del self.nodes[path]
+
+    def update(self, removed=None, added=None):
+        """Takes the `removed` leaf partials out and puts the `added` ones in."""
+        with self._lock:
+            for leaf, partial in (removed or {}).items():
+                self._apply(leaf, partial, -1)
+            for leaf, partial in (added or {}).items():
+                self._apply(leaf, partial, 1)
+
+    def leaves(self):
+        """Copies of the class partials, {(school, grade, class): partial}."""
+        with self._lock:
+            return {path: aggregates.merge([node]) for path, node in self.nodes.items()
+                    if len(path) == len(LEVELS) - 1}
+
+    def get(self, path):
+        """Copy of the partial at path, or None for a node with no students."""
+        with self._lock:
+            node = self.nodes.get(tuple(path))
+            return aggregates.merge([node]) if node is not None else None
+
+    def resolve(self, school_id, name):
+        """Path of the class or grade called name within school_id, or None."""
+        for path in ((school_id, grade_of(name), str(name)), (school_id, str(name))):
+            if path in self.nodes:
+                return path
+        return None
+
+    def report(self, path=(), depth=None):
+        """Finalized summary of path and its descendants (down to `depth` more levels)."""
+        with self._lock:
+            return self._report(tuple(path), depth)
+
+    def _report(self, path, depth):
+        node = self.nodes.get(path, aggregates.empty_partial())
+        report = {"level": LEVELS[len(path)], "name": path[-1] if path else "district",
+                  "summary": aggregates.finalize(node)}
+        if len(path) + 1 < len(LEVELS) and depth != 0:
+            children = sorted(p for p in self.nodes if len(p) == len(path) + 1 and p[:len(path)] == path)
+            report["children"] = [self._report(child, None if depth is None else depth - 1) for child in children]
+        return report
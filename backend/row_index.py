@@ -0,0 +1,189 @@
+import os
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+
+# Persistent row-hash index over the stored students, used to upsert uploads.
+# Each dataset position has a content hash (over the raw student fields, which
+# every upload format carries; ML.RAW_COLUMNS) and,
+# once an upload has supplied one, a student key (STUDENT_KEY_COLUMN). Both
+# lookups are dicts, so planning an upload costs O(upload) and never rescans
+# the dataset. The table is rebuilt from the data only when it is missing, out
+# of step with it, or was hashed over other columns.
+BASE_DIR = os.path.dirname(__file__)
+DB_PATH = os.getenv("ROW_INDEX_DB", os.path.join(BASE_DIR, "data", "row_index.db"))
+STUDENT_KEY_COLUMN = os.getenv("STUDENT_KEY_COLUMN", "Student_ID")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS row_index (
+    position INTEGER PRIMARY KEY,
+    student_key TEXT UNIQUE,
+    content_hash INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS row_index_columns (
+    columns TEXT NOT NULL
+);
+"""
+
+_lock = threading.Lock()
+_columns = []        # content columns the hashes cover
+_hash_at = []        # position -> content hash
+_hash_to_pos = {}    # content hash -> first position holding it
+_key_to_pos = {}     # student key -> position
+_pos_to_key = {}
+
+class UploadPlan:
+    """What an upload changes: rows to append, rows to replace in place, rows to skip."""
+    def __init__(self, new_rows, new_hashes, new_keys, replace_positions, replace_rows,
+                 replace_hashes, replace_keys, claimed_keys, unchanged):
+        self.new_rows = new_rows
+        self.new_hashes = new_hashes
+        self.new_keys = new_keys
+        self.replace_positions = replace_positions
+        self.replace_rows = replace_rows
+        self.replace_hashes = replace_hashes
+        self.replace_keys = replace_keys
+        self.claimed_keys = claimed_keys  # unchanged unkeyed rows an upload just named
+        self.unchanged = unchanged
+
+    @property
+    def is_noop(self):
+        return len(self.new_rows) == 0 and len(self.replace_positions) == 0
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def content_hashes(frame, columns=None):
+    """uint64 -> int64 hash per row; numerics as float64 and the rest as str so
+    `67` from one CSV and `67.0` from another hash the same."""
+    columns = columns or _columns
+    canonical = pd.DataFrame({
+        col: pd.to_numeric(frame[col], errors="coerce").astype(np.float64)
+        if pd.api.types.is_numeric_dtype(frame[col]) else frame[col].astype(str)
+        for col in columns
+    })
+    return pd.util.hash_pandas_object(canonical, index=False).to_numpy().view(np.int64)
+
+def init_index(frame, columns):
+    """Loads the index for the stored frame's `columns`, rebuilding it if it doesn't match."""
+    global _columns, _hash_at, _hash_to_pos, _key_to_pos, _pos_to_key
+    with _lock:
+        _columns = list(columns)
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+        conn = _connect()
+        conn.executescript(SCHEMA)
+        rows = conn.execute("SELECT position, student_key, content_hash FROM row_index ORDER BY position").fetchall()
+        hashed = conn.execute("SELECT columns FROM row_index_columns").fetchone()
+
+        if (len(rows) != len(frame) or (rows and rows[-1][0] != len(frame) - 1)
+                or hashed is None or hashed[0] != ",".join(_columns)):
+            print(f"Rebuilding row index for {len(frame):,} rows")
+            hashes = content_hashes(frame, _columns)
+            # Rows still line up when only the hashed columns changed: keep their student keys
+            keys = [key for _, key, _ in rows] if len(rows) == len(frame) else [None] * len(frame)
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM row_index")
+            conn.execute("DELETE FROM row_index_columns")
+            conn.execute("INSERT INTO row_index_columns (columns) VALUES (?)", (",".join(_columns),))
+            conn.executemany("INSERT INTO row_index (position, student_key, content_hash) VALUES (?, ?, ?)",
+                             zip(range(len(hashes)), keys, hashes.tolist()))
+            conn.execute("COMMIT")
+            rows = list(zip(range(len(hashes)), keys, hashes.tolist()))
+        conn.close()
+
+        _hash_at = [h for _, _, h in rows]
+        _key_to_pos = {key: pos for pos, key, _ in rows if key is not None}
+        _pos_to_key = {pos: key for key, pos in _key_to_pos.items()}
+        _hash_to_pos = {}
+        for pos, _, h in rows:
+            _hash_to_pos.setdefault(h, pos)
+
+def covers(upload):
+    """True when the upload has every content column, i.e. it can be upserted
+    (raw rows are engineered first, see ML.engineer_features)."""
+    return bool(_columns) and all(col in upload.columns for col in _columns)
+
+def plan_upload(upload):
+    """Splits an upload into new / changed / unchanged rows with O(1) lookups per row."""
+    has_keys = STUDENT_KEY_COLUMN in upload.columns
+    upload = upload.reset_index(drop=True)
+    hashes = content_hashes(upload)
+    keys = upload[STUDENT_KEY_COLUMN].astype(str).tolist() if has_keys else [None] * len(upload)
+
+    # Within one upload the last row for a key (or an exact duplicate) wins
+    seen, keep = set(), []
+    for i in range(len(upload) - 1, -1, -1):
+        ident = keys[i] if keys[i] is not None else ("hash", hashes[i])
+        if ident not in seen:
+            seen.add(ident)
+            keep.append(i)
+    keep.reverse()
+
+    new, replace, claimed, claimed_positions = [], [], [], set()
+    with _lock:
+        for i in keep:
+            key, h = keys[i], int(hashes[i])
+            pos = _key_to_pos.get(key) if key is not None else None
+            if pos is None:
+                match = _hash_to_pos.get(h)
+                if match is None or (key is not None and (match in _pos_to_key or match in claimed_positions)):
+                    # Unseen content, or identical content already owned by another student
+                    new.append(i)
+                elif key is not None:
+                    claimed.append((key, match))
+                    claimed_positions.add(match)
+            elif _hash_at[pos] != h:
+                replace.append((i, pos))
+
+    rows = upload.drop(columns=[STUDENT_KEY_COLUMN], errors="ignore")
+    return UploadPlan(
+        new_rows=rows.iloc[new].reset_index(drop=True),
+        new_hashes=[int(hashes[i]) for i in new],
+        new_keys=[keys[i] for i in new],
+        replace_positions=[pos for _, pos in replace],
+        replace_rows=rows.iloc[[i for i, _ in replace]].reset_index(drop=True),
+        replace_hashes=[int(hashes[i]) for i, _ in replace],
+        replace_keys=[keys[i] for i, _ in replace],
+        claimed_keys=claimed,
+        unchanged=len(upload) - len(new) - len(replace),
+    )
+
+def commit(plan, first_new_position):
+    """Records an applied plan; new rows were appended starting at first_new_position."""
+    new_positions = range(first_new_position, first_new_position + len(plan.new_rows))
+    with _lock:
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO row_index (position, student_key, content_hash) VALUES (?, ?, ?)",
+                list(zip(new_positions, plan.new_keys, plan.new_hashes))
+                + list(zip(plan.replace_positions, plan.replace_keys, plan.replace_hashes)))
+            conn.executemany("UPDATE row_index SET student_key = ? WHERE position = ?", plan.claimed_keys)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        for pos, key, h in zip(new_positions, plan.new_keys, plan.new_hashes):
+            _hash_at.append(h)
+            _hash_to_pos.setdefault(h, pos)
+            if key is not None:
+                _key_to_pos[key] = pos
+                _pos_to_key[pos] = key
+        for pos, key, h in zip(plan.replace_positions, plan.replace_keys, plan.replace_hashes):
+            old = _hash_at[pos]
+            if _hash_to_pos.get(old) == pos:
+                del _hash_to_pos[old]
+            _hash_at[pos] = h
+            _hash_to_pos.setdefault(h, pos)
+            _key_to_pos[key] = pos
+        for key, pos in plan.claimed_keys:
+            _key_to_pos[key] = pos
+            _pos_to_key[pos] = key
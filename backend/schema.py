@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+# One place that decides how the student datasets sit in memory. Low-cardinality
+# text columns become pandas categoricals (one small integer code per row and
+# one copy of each label) and integers shrink to the smallest signed type that
+# holds them. Floats stay float64: float32 means come back as numpy scalars the
+# JSON responses can't carry, and the engineered ratios aren't exact in float32.
+# Values never change, only their representation, so the frames hash, export
+# and predict exactly as before. Arithmetic that can leave a column's range
+# (squares, products) has to convert to float64 first.
+CATEGORICAL_COLUMNS = [
+    'Parental_Involvement', 'Access_to_Resources', 'Extracurricular_Activities',
+    'Motivation_Level', 'Internet_Access', 'Family_Income', 'Teacher_Quality',
+    'School_Type', 'Peer_Influence', 'Learning_Disabilities',
+    'Parental_Education_Level', 'Distance_from_Home', 'Gender',
+    'Persona_Cluster', 'Class_Section', 'Class',
+]
+
+def read_csv(path, **kwargs):
+    """pd.read_csv with categoricals parsed directly and numerics downcast."""
+    dtype = {col: "category" for col in CATEGORICAL_COLUMNS}
+    dtype.update(kwargs.pop("dtype", {}))
+    return compact(pd.read_csv(path, dtype=dtype, **kwargs))
+
+def _smallest_int(values):
+    low, high = (values.min(), values.max()) if len(values) else (0, 0)
+    for candidate in (np.int8, np.int16, np.int32):
+        info = np.iinfo(candidate)
+        if info.min <= low and high <= info.max:
+            return np.dtype(candidate)
+    return np.dtype(np.int64)
+
+def compact_dtype(series):
+    """The dtype compact() gives this column."""
+    if series.name in CATEGORICAL_COLUMNS and not isinstance(series.dtype, pd.CategoricalDtype):
+        return "category"
+    if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+        return series.dtype
+    if pd.api.types.is_integer_dtype(series):
+        return _smallest_int(series.to_numpy())
+    return series.dtype
+
+def compact(frame):
+    """Frame with every column in its compact dtype (columns already compact are not copied)."""
+    changes = {col: compact_dtype(frame[col]) for col in frame.columns}
+    changes = {col: dtype for col, dtype in changes.items() if dtype != frame[col].dtype}
+    return frame.astype(changes) if changes else frame
+
+def _common_dtype(stored, incoming):
+    """A dtype for `stored` that also holds `incoming`'s values, keeping stored's if it does."""
+    if isinstance(stored.dtype, pd.CategoricalDtype):
+        if isinstance(incoming.dtype, pd.CategoricalDtype):
+            incoming = incoming.astype(object)
+        extra = pd.Index(incoming.dropna().unique()).difference(stored.cat.categories)
+        if len(extra):
+            return pd.CategoricalDtype(stored.cat.categories.append(extra))
+        return stored.dtype
+    incoming_dtype = compact_dtype(incoming)
+    if incoming_dtype == "category" or not pd.api.types.is_numeric_dtype(incoming_dtype):
+        return np.dtype(object) if stored.dtype != incoming_dtype else stored.dtype
+    return np.result_type(stored.dtype, incoming_dtype)
+
+def conform(frame, rows, columns=None):
+    """(frame, rows) with each of `columns` (default: the shared ones) in one dtype.
+
+    Stored columns only widen when the incoming values need it (a new category,
+    a larger integer, a non-integral float), so appending or overwriting rows
+    keeps the compact layout instead of falling back to object/int64.
+    """
+    columns = [c for c in (columns if columns is not None else frame.columns) if c in rows.columns]
+    widened, matched = {}, {}
+    for col in columns:
+        dtype = _common_dtype(frame[col], rows[col])
+        if dtype != frame[col].dtype:
+            widened[col] = dtype
+        if dtype != rows[col].dtype:
+            matched[col] = dtype
+    if widened:
+        frame = frame.astype(widened)
+    if matched:
+        rows = rows.astype(matched)
+    return frame, rows
+
+def append(frame, rows):
+    """pd.concat([frame, rows]) that keeps the compact dtypes."""
+    frame, rows = conform(frame, rows)
+    return pd.concat([frame, rows], ignore_index=True)
+
+def assign(frame, positions, rows, columns):
+    """Writes rows[columns] over the given positions of frame; returns the (possibly widened) frame."""
+    frame, rows = conform(frame, rows, columns)
+    positions = list(positions)
+    for col in columns:
+        frame.loc[positions, col] = rows[col].to_numpy()
+    return frame
+
+def unpacked_dtype(dtype):
+    """The plain dtype to parse free-form input into before matching a stored column."""
+    if isinstance(dtype, pd.CategoricalDtype):
+        return np.dtype(object)
+    if pd.api.types.is_integer_dtype(dtype):
+        return np.dtype(np.int64)
+    if pd.api.types.is_float_dtype(dtype):
+        return np.dtype(np.float64)
+    return dtype
+
+def observed_counts(series, normalize=False):
+    """value_counts() without the zero rows a categorical reports for labels absent from this slice."""
+    counts = series.value_counts(normalize=normalize)
+    return counts[counts > 0]
+
+def mask_equal(series, value):
+    """Boolean array of series == value; one integer comparison over the codes for categoricals."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        code = series.cat.categories.get_indexer([value])[0]
+        if code < 0:
+            return np.zeros(len(series), dtype=bool)
+        return series.cat.codes.to_numpy() == code
+    return (series == value).to_numpy()
+
+def mask_isin(series, values):
+    """Boolean array of series.isin(values); a lookup table over the codes for categoricals."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        wanted = np.zeros(len(series.cat.categories) + 1, dtype=bool)  # last slot: missing (code -1)
+        wanted[:-1] = series.cat.categories.isin(values)
+        return wanted[series.cat.codes.to_numpy()]
+    return series.isin(values).to_numpy()
@@ -0,0 +1,115 @@
+import os
+import gc
+import signal
+import tempfile
+import threading
+import time
+from gunicorn.app.base import BaseApplication
+
+# Each worker flushes its latency histograms here so /api/metrics can merge
+# them; must be set before ML/clustering pull in the metrics module.
+os.environ.setdefault("METRICS_DIR", tempfile.mkdtemp(prefix="praxis_metrics_"))
+
+import ML
+import clustering
+import timeline_store
+
+# Production entry point: the master process imports main (which loads the
+# datasets and both models once), then forks workers that share those pages
+# copy-on-write. `python main.py` is still the single-process dev server.
+BIND = os.getenv("SERVER_BIND", "0.0.0.0:5001")
+WORKERS = int(os.getenv("SERVER_WORKERS", "4"))
+THREADS = int(os.getenv("SERVER_THREADS", "4"))
+TIMEOUT = int(os.getenv("SERVER_TIMEOUT", "120"))
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "5"))
+
+_loaded_signature = None
+
+def _artifact_paths():
+    return [
+        ML.MODEL_PATH, ML.artifact_prefix() + ".json", ML.DATA_PATH, ML.REFERENCE_DATA_PATH,
+        clustering.KMEANS_PATH, clustering.PREPROCESSOR_PATH, clustering.PERSONA_PATH,
+        clustering.artifact_prefix() + ".json",
+        clustering.DATA_PATH, clustering.RAW_DATA_PATH, timeline_store.TIMELINE_PATH,
+    ]
+
+def model_signature():
+    """Cheap version stamp of the model and data artifacts on disk (mtime + size)."""
+    signature = []
+    for path in _artifact_paths():
+        try:
+            st = os.stat(path)
+            signature.append((path, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+def _watch_models(server):
+    """Master-side poller: HUPs the arbiter once the artifacts change and settle."""
+    last_seen = _loaded_signature
+    while True:
+        time.sleep(MODEL_WATCH_INTERVAL)
+        current = model_signature()
+        # Only reload once two consecutive polls agree, so a worker that is
+        # still writing a pickle doesn't hand the master a half-written file.
+        if current == last_seen and current != _loaded_signature:
+            server.log.info("Model artifacts changed, reloading workers")
+            os.kill(os.getpid(), signal.SIGHUP)
+        last_seen = current
+
+def when_ready(server):
+    global _loaded_signature
+    _loaded_signature = model_signature()
+    if MODEL_WATCH_INTERVAL > 0:
+        threading.Thread(target=_watch_models, args=(server,), daemon=True).start()
+
+def on_reload(server):
+    """Runs in the master on SIGHUP, before the replacement workers are forked."""
+    global _loaded_signature
+    # Record the version first so a bad artifact isn't retried on every poll
+    _loaded_signature = model_signature()
+    try:
+        from main import init_all  # already loaded by run(); importing serve alone loads no data
+        init_all()  # the same sequence as startup, so the two can't drift apart
+        server.log.info("Models reloaded in master")
+    except Exception as e:
+        # Keep serving the previous models rather than forking broken workers
+        server.log.error(f"Model reload failed, keeping previous models: {e}")
+
+def pre_fork(server, worker):
+    # Move everything loaded so far into the permanent generation so the
+    # cyclic GC in the workers never touches (and un-shares) those pages.
+    gc.freeze()
+
+class ProductionServer(BaseApplication):
+    def __init__(self, app, options=None):
+        self.application = app
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key.lower(), value)
+
+    def load(self):
+        return self.application
+
+def run():
+    from main import app  # loads data and models once, in the master
+
+    options = {
+        "bind": BIND,
+        "workers": WORKERS,
+        "threads": THREADS,
+        "worker_class": "gthread",
+        "timeout": TIMEOUT,
+        "preload_app": True,
+        "when_ready": when_ready,
+        "on_reload": on_reload,
+        "pre_fork": pre_fork,
+    }
+    ProductionServer(app, options).run()
+
+if __name__ == "__main__":
+    run()
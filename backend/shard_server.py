@@ -0,0 +1,22 @@
+import os
+import sys
+from werkzeug.serving import make_server
+
+# Entry point of one school's shard process, started by tenants.py:
+#   python shard_server.py <school_id> <port>
+# Points ML/clustering and the stores at data/schools/<school_id>/ before main
+# loads anything, then serves the regular app on localhost only.
+if __name__ == "__main__":
+    school_id, port = sys.argv[1], int(sys.argv[2])
+    os.environ["PRAXIS_SCHOOL_ID"] = school_id
+
+    import tenants
+    tenants.SHARD_SCHOOL = school_id
+    tenants.apply_school_paths(school_id)
+
+    import main
+    import ML
+    if ML.model_version == 0:
+        sys.exit(f"Shard for school {school_id} failed to load its data")
+    print(f"Shard for school {school_id} listening on 127.0.0.1:{port}")
+    make_server("127.0.0.1", port, main.app, threaded=True).serve_forever()
@@ -0,0 +1,463 @@
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import signal
+import socket
+import sqlite3
+import threading
+import subprocess
+import http.client
+from flask import Blueprint, request, jsonify, Response
+import aggregates
+import rollups
+
+# Multi-school layer. Each school lives in SCHOOLS_DIR/<school_id>/ with the same
+# files the single-school app reads from data/ and models/. ML and clustering
+# keep one dataset per process, so a school is served by its own shard process
+# (shard_server.py) that runs this same app pointed at that directory. Requests
+# carrying X-School-Id (or ?schoolId=) are proxied to the owning shard; shards
+# start on first use and the least recently used idle one is stopped once more
+# than MAX_ACTIVE_SHARDS are running. Requests without a school id are served
+# in-process from data/ exactly as before. Shards are shared by every gunicorn
+# worker through a SQLite registry (SHARD_REGISTRY): one process per school,
+# whichever worker started it, with per-worker in-flight leases so no worker
+# evicts a shard another one is still using. Shards outlive the worker that
+# started them and are stopped when the master exits. District endpoints read
+# a long-lived RollupTree per router process: shards publish their per-class
+# partials to DISTRICT_DB at startup and after every upload, and the router
+# applies only the schools published since its last look (RollupTree.update).
+# A school whose shard never ran is seeded once from its data file.
+
+REGISTRY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    school_id TEXT PRIMARY KEY,
+    port INTEGER,
+    pid INTEGER,               -- NULL while the starter waits for it to come up
+    starter INTEGER NOT NULL,  -- pid of the worker that started it
+    started_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    school_id TEXT NOT NULL,
+    worker INTEGER NOT NULL,
+    in_flight INTEGER NOT NULL,
+    PRIMARY KEY (school_id, worker)
+);
+"""
+DISTRICT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS class_partials (
+    school_id TEXT NOT NULL,
+    grade TEXT NOT NULL,
+    class TEXT NOT NULL,
+    partial TEXT NOT NULL,   -- aggregates partial as JSON
+    PRIMARY KEY (school_id, grade, class)
+);
+CREATE TABLE IF NOT EXISTS published (
+    school_id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL     -- increases with every publish, across schools
+);
+"""
+BASE_DIR = os.path.dirname(__file__)
+SCHOOLS_DIR = os.getenv("SCHOOLS_DIR", os.path.join(BASE_DIR, "data", "schools"))
+MAX_ACTIVE_SHARDS = int(os.getenv("MAX_ACTIVE_SHARDS", "4"))
+SHARD_START_TIMEOUT = float(os.getenv("SHARD_START_TIMEOUT", "180"))
+SHARD_REQUEST_TIMEOUT = float(os.getenv("SHARD_REQUEST_TIMEOUT", "300"))
+SHARD_SCHOOL = os.getenv("PRAXIS_SCHOOL_ID")  # set inside a shard process
+SHARD_REGISTRY = os.getenv("SHARD_REGISTRY", os.path.join(SCHOOLS_DIR, "shards.db"))
+DISTRICT_DB = os.getenv("DISTRICT_DB", os.path.join(SCHOOLS_DIR, "district.db"))
+SUPERVISOR_PID = os.getpid()  # the gunicorn master under serve.py (preloaded), else this process
+SCHOOL_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+HOP_BY_HOP = {"connection", "keep-alive", "transfer-encoding", "te", "trailer", "upgrade",
+              "proxy-authorization", "proxy-authenticate", "host", "content-length"}
+
+tenants_bp = Blueprint('tenants', __name__, url_prefix='/api')
+
+class Shard:
+    """A shard process this worker started (other workers only know its port)."""
+    def __init__(self, school_id):
+        self.school_id = school_id
+        self.port = None
+        self.process = None
+
+    def start(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(BASE_DIR, "shard_server.py"), self.school_id, str(self.port)],
+            cwd=BASE_DIR
+        )
+        deadline = time.monotonic() + SHARD_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Shard for school {self.school_id} exited during startup")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=2)
+                conn.request("GET", "/api/health")
+                if conn.getresponse().status == 200:
+                    return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"Shard for school {self.school_id} did not start in {SHARD_START_TIMEOUT}s")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+_lock = threading.Lock()
+_children = {}        # pid -> Shard this process started, reaped once it exits
+_registry_ready = None  # pid that created the registry tables
+_district_ready = None  # pid that created the district tables
+_district_lock = threading.Lock()
+_district = rollups.RollupTree()  # this router process's district tree
+_district_leaves = {}   # school_id -> the class partials _district holds for it
+_district_seq = 0       # newest publish applied to _district
+
+def school_dir(school_id):
+    return os.path.join(SCHOOLS_DIR, school_id)
+
+def list_schools():
+    if not os.path.isdir(SCHOOLS_DIR):
+        return []
+    return sorted(d for d in os.listdir(SCHOOLS_DIR)
+                  if SCHOOL_ID_PATTERN.match(d) and os.path.isdir(school_dir(d)))
+
+def apply_school_paths(school_id):
+    """Points every data/model path at the school's directory; call before `import main`."""
+    import ML
+    import clustering
+    import intervention_store
+    import timeline_store
+    import row_index
+    import changelog
+    import pregenerate
+
+    root = school_dir(school_id)
+    models = os.path.join(root, "models")
+    ML.DATA_PATH = os.path.join(root, "optimised_final_dataset.csv")
+    ML.REFERENCE_DATA_PATH = os.path.join(root, "combined_student_data.csv")
+    ML.MODELS_DIR = models
+    ML.MODEL_PATH = os.path.join(models, "huber_pipeline.pkl")
+    ML.REGRESSOR_CONFIG_PATH = os.path.join(models, "regressor_config.json")
+    clustering.DATA_PATH = os.path.join(root, "dashboard_ready_student_data_kmeans.csv")
+    clustering.RAW_DATA_PATH = os.path.join(root, "Student_data.csv")
+    clustering.MODELS_DIR = models
+    clustering.PREPROCESSOR_PATH = os.path.join(models, "kmeans_preprocessor.pkl")
+    clustering.KMEANS_PATH = os.path.join(models, "kmeans_model.pkl")
+    clustering.PERSONA_PATH = os.path.join(models, "persona_mapping.json")
+    intervention_store.DB_PATH = os.path.join(root, "interventions.db")
+    timeline_store.TIMELINE_PATH = os.path.join(root, "timeline.npylog")
+    row_index.DB_PATH = os.path.join(root, "row_index.db")
+    changelog.DB_PATH = os.path.join(root, "changelog.db")
+    pregenerate.DB_PATH = os.path.join(root, "pregenerated.db")
+
+def _pid_alive(pid):
+    if pid in _children and _children[pid].process.poll() is not None:
+        del _children[pid]  # our own shard exited: reap it
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"  # exited, not yet reaped by its starter
+    except (OSError, IndexError):
+        return True
+
+def _connect():
+    global _registry_ready
+    conn = sqlite3.connect(SHARD_REGISTRY, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    if _registry_ready != os.getpid():
+        conn.executescript(REGISTRY_SCHEMA)
+        _registry_ready = os.getpid()
+    return conn
+
+def _lease(conn, school_id, delta):
+    conn.execute("INSERT OR IGNORE INTO leases (school_id, worker, in_flight) VALUES (?, ?, 0)",
+                 (school_id, os.getpid()))
+    conn.execute("UPDATE leases SET in_flight = MAX(in_flight + ?, 0) WHERE school_id = ? AND worker = ?",
+                 (delta, school_id, os.getpid()))
+
+def _stop_pid(pid):
+    with _lock:
+        shard = _children.pop(pid, None)
+    if shard is not None:
+        shard.stop()
+    else:
+        try:
+            os.kill(pid, signal.SIGTERM)  # started by another worker, which reaps it
+        except ProcessLookupError:
+            pass
+
+def _evict_idle():
+    """Stops least recently used idle shards, across all workers, until at most MAX_ACTIVE_SHARDS remain."""
+    victims = []
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        with _lock:
+            for pid in list(_children):
+                _pid_alive(pid)  # reaps our shards that another worker evicted
+            rows = conn.execute("SELECT school_id, pid FROM shards ORDER BY last_used").fetchall()
+            running = [(school_id, pid) for school_id, pid in rows if pid is not None and _pid_alive(pid)]
+            for school_id, pid in rows:
+                if pid is not None and (school_id, pid) not in running:
+                    conn.execute("DELETE FROM shards WHERE school_id = ?", (school_id,))  # crashed
+            busy = {school_id for school_id, worker in
+                    conn.execute("SELECT school_id, worker FROM leases WHERE in_flight > 0").fetchall()
+                    if _pid_alive(worker)}
+        starting = sum(1 for _, pid in rows if pid is None)
+        excess = len(running) + starting - MAX_ACTIVE_SHARDS
+        for school_id, pid in running:
+            if excess <= 0:
+                break
+            if school_id not in busy:
+                conn.execute("DELETE FROM shards WHERE school_id = ?", (school_id,))
+                conn.execute("DELETE FROM leases WHERE school_id = ?", (school_id,))
+                victims.append(pid)
+                excess -= 1
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    for pid in victims:
+        _stop_pid(pid)
+
+def _acquire(school_id):
+    """Port of the school's running shard (started by this worker if no one runs it), leased by this worker."""
+    deadline = time.monotonic() + SHARD_START_TIMEOUT
+    while True:
+        conn = _connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute("SELECT port, pid, starter, started_at FROM shards WHERE school_id = ?",
+                               (school_id,)).fetchone()
+            with _lock:
+                if row is not None and row[1] is not None and _pid_alive(row[1]):
+                    state = "running"
+                elif row is not None and row[1] is None and _pid_alive(row[2]) and now - row[3] < SHARD_START_TIMEOUT:
+                    state = "starting"  # another worker is bringing it up
+                else:
+                    state = "cold"  # never started, crashed, or its starter died mid-start
+            if state == "cold":
+                conn.execute("INSERT OR REPLACE INTO shards (school_id, port, pid, starter, started_at, last_used) "
+                             "VALUES (?, NULL, NULL, ?, ?, ?)", (school_id, os.getpid(), now, now))
+            if state != "starting":
+                conn.execute("UPDATE shards SET last_used = ? WHERE school_id = ?", (now, school_id))
+                _lease(conn, school_id, 1)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        if state == "running":
+            return row[0]
+        if state == "cold":
+            break
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Shard for school {school_id} did not start in {SHARD_START_TIMEOUT}s")
+        time.sleep(0.2)
+
+    shard = Shard(school_id)
+    try:
+        shard.start()
+    except Exception:
+        _forget(school_id)
+        _release(school_id)
+        raise
+    with _lock:
+        _children[shard.process.pid] = shard
+    conn = _connect()
+    try:
+        conn.execute("UPDATE shards SET port = ?, pid = ? WHERE school_id = ? AND starter = ?",
+                     (shard.port, shard.process.pid, school_id, os.getpid()))
+    finally:
+        conn.close()
+    _evict_idle()
+    return shard.port
+
+def _forget(school_id):
+    """Drops this worker's failed start so the next request tries again."""
+    conn = _connect()
+    try:
+        conn.execute("DELETE FROM shards WHERE school_id = ? AND starter = ? AND pid IS NULL",
+                     (school_id, os.getpid()))
+    finally:
+        conn.close()
+
+def _release(school_id):
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        _lease(conn, school_id, -1)
+        conn.execute("DELETE FROM leases WHERE school_id = ? AND worker = ? AND in_flight = 0",
+                     (school_id, os.getpid()))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    _evict_idle()
+
+def active_shards():
+    """School ids with a running shard, in any worker."""
+    if not os.path.exists(SHARD_REGISTRY):
+        return []
+    conn = _connect()
+    try:
+        rows = conn.execute("SELECT school_id, pid FROM shards WHERE pid IS NOT NULL ORDER BY school_id").fetchall()
+    finally:
+        conn.close()
+    with _lock:
+        return [school_id for school_id, pid in rows if _pid_alive(pid)]
+
+def _forward(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=SHARD_REQUEST_TIMEOUT)
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP}
+    conn.request(request.method, request.full_path, body=request.get_data(), headers=headers)
+    upstream = conn.getresponse()
+    body = upstream.read()
+    response_headers = [(k, v) for k, v in upstream.getheaders() if k.lower() not in HOP_BY_HOP]
+    return Response(body, status=upstream.status, headers=response_headers)
+
+def _requested_school():
+    return request.headers.get("X-School-Id") or request.args.get("schoolId")
+
+def _route_to_shard():
+    if SHARD_SCHOOL or request.blueprint == tenants_bp.name:
+        return None
+    school_id = _requested_school()
+    if not school_id:
+        return None
+    if not SCHOOL_ID_PATTERN.match(school_id) or not os.path.isdir(school_dir(school_id)):
+        return jsonify({"error": f"Unknown school: {school_id}"}), 404
+    try:
+        port = _acquire(school_id)
+    except Exception as e:
+        return jsonify({"error": f"School {school_id} is unavailable: {e}"}), 503
+    try:
+        return _forward(port)
+    except OSError as e:
+        return jsonify({"error": f"School {school_id} did not respond: {e}"}), 502
+    finally:
+        _release(school_id)
+
+def _connect_district():
+    global _district_ready
+    conn = sqlite3.connect(DISTRICT_DB, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    if _district_ready != os.getpid():
+        conn.executescript(DISTRICT_SCHEMA)
+        _district_ready = os.getpid()
+    return conn
+
+def publish_leaves(school_id, leaves, seed=False):
+    """Replaces a school's class partials in DISTRICT_DB; a seed is dropped if the school already published."""
+    conn = _connect_district()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        if seed and conn.execute("SELECT 1 FROM published WHERE school_id = ?", (school_id,)).fetchone():
+            conn.execute("ROLLBACK")
+            return
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM published").fetchone()[0]
+        conn.execute("DELETE FROM class_partials WHERE school_id = ?", (school_id,))
+        conn.executemany("INSERT INTO class_partials (school_id, grade, class, partial) VALUES (?, ?, ?, ?)",
+                         [(school_id, grade, name, json.dumps(partial)) for (_, grade, name), partial in leaves.items()])
+        conn.execute("INSERT OR REPLACE INTO published (school_id, seq) VALUES (?, ?)", (school_id, seq))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def publish_rollup(tree):
+    """Inside a shard: publishes its school's class partials (at startup and after every upload)."""
+    if not SHARD_SCHOOL:
+        return
+    try:
+        publish_leaves(SHARD_SCHOOL, tree.leaves())
+    except sqlite3.Error as e:
+        print(f"Warning: could not publish rollups for school {SHARD_SCHOOL}: {e}")
+
+def district_tree():
+    """The district RollupTree, brought up to date with the schools published since the last call."""
+    global _district_seq
+    schools = list_schools()
+    with _district_lock:
+        conn = _connect_district()
+        try:
+            seen = {school_id for (school_id,) in conn.execute("SELECT school_id FROM published")}
+        finally:
+            conn.close()
+        for school_id in schools:
+            if school_id not in seen:
+                path = os.path.join(school_dir(school_id), "dashboard_ready_student_data_kmeans.csv")
+                publish_leaves(school_id, rollups.leaf_partials_from_csv(path, school_id), seed=True)
+
+        conn = _connect_district()
+        try:
+            conn.execute("BEGIN")  # publishes and partials from one snapshot
+            changed = conn.execute("SELECT school_id, seq FROM published WHERE seq > ?", (_district_seq,)).fetchall()
+            wanted = {school_id for school_id, _ in changed} | (set(schools) - set(_district_leaves))
+            partials = {school_id: conn.execute("SELECT grade, class, partial FROM class_partials "
+                                                "WHERE school_id = ?", (school_id,)).fetchall()
+                        for school_id in wanted & set(schools)}
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        for school_id, rows in partials.items():
+            leaves = {(school_id, grade, name): json.loads(partial) for grade, name, partial in rows}
+            _district.update(removed=_district_leaves.pop(school_id, None), added=leaves)
+            _district_leaves[school_id] = leaves
+        for school_id in set(_district_leaves) - set(schools):
+            _district.update(removed=_district_leaves.pop(school_id))  # its directory was removed
+        _district_seq = max([_district_seq] + [seq for _, seq in changed])
+        return _district
+
+@tenants_bp.route("/schools", methods=["GET"])
+def schools():
+    return jsonify({"schools": list_schools(), "active": active_shards(), "maxActive": MAX_ACTIVE_SHARDS})
+
+@tenants_bp.route("/district/summary", methods=["GET"])
+def district_summary():
+    tree = district_tree()
+    return jsonify({
+        "district": aggregates.finalize(tree.get(())),
+        "schools": {school_id: aggregates.finalize(tree.get((school_id,)) or aggregates.empty_partial())
+                    for school_id in list_schools()},
+    })
+
+@tenants_bp.route("/district/rollup", methods=["GET"])
+def district_rollup_report():
+    depth = request.args.get("depth", type=int)
+    return jsonify(district_tree().report(depth=depth))
+
+def _stop_all():
+    """Stops every shard when the supervisor exits; a recycled worker leaves them to the others."""
+    if os.getpid() != SUPERVISOR_PID or not os.path.exists(SHARD_REGISTRY):
+        return
+    conn = _connect()
+    try:
+        pids = [pid for (pid,) in conn.execute("SELECT pid FROM shards WHERE pid IS NOT NULL")]
+        conn.execute("DELETE FROM shards")
+        conn.execute("DELETE FROM leases")
+    finally:
+        conn.close()
+    for pid in pids:
+        _stop_pid(pid)
+
+def init_app(app):
+    """Registers the school router and the district endpoints."""
+    app.before_request(_route_to_shard)
+    app.register_blueprint(tenants_bp)
+    if not SHARD_SCHOOL:
+        atexit.register(_stop_all)
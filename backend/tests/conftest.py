@@ -0,0 +1,32 @@
+import os
+import sys
+import shutil
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("GEMINI_API_KEY", "test")  # gemini_service refuses to import without one
+os.environ["PREGEN_MODEL"] = "fake"
+os.environ["PREGEN_ENABLED"] = "0"  # pre-generation passes are run by hand, not by requests
+
+SCHOOL_FILES = ["optimised_final_dataset.csv", "combined_student_data.csv",
+                "dashboard_ready_student_data_kmeans.csv", "Student_data.csv"]
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    # A throwaway copy of the shipped data, so nothing under backend/ is written
+    import tenants
+    tenants.SCHOOLS_DIR = str(tmp_path_factory.mktemp("schools"))
+    root = tenants.school_dir("test")
+    os.makedirs(root)
+    for name in SCHOOL_FILES:
+        shutil.copy(os.path.join(BACKEND_DIR, "data", name), root)
+    # Trained artifacts aren't versioned: reuse a local set (but not a local tuning
+    # result) if there is one, otherwise the app trains its own on init
+    if os.path.isdir(os.path.join(BACKEND_DIR, "models")):
+        shutil.copytree(os.path.join(BACKEND_DIR, "models"), os.path.join(root, "models"),
+                        ignore=shutil.ignore_patterns("regressor_config.json"))
+    tenants.apply_school_paths("test")
+
+    import main
+    return main.app
@@ -0,0 +1,76 @@
+import pytest
+
+def dashboard_student(full):
+    """The student_data StudentModal.tsx posts: its safeStudent reshaping of the detail query."""
+    def pick(*keys, default="—"):
+        return next((full[k] for k in keys if full.get(k) is not None), default)
+    return {
+        "name": pick("name", "Name"),
+        "index": pick("index", "Index", "id", default=0),
+        "examScore": pick("examScore", "Exam_Score", "score"),
+        "clusterName": pick("clusterName", "cluster"),
+        "hoursStudied": float(pick("hoursStudied", "Hours_Studied", default=20)),
+        "attendance": float(pick("attendance", "Attendance", default=80)),
+        "tutoringSessions": float(pick("tutoringSessions", "Tutoring_Sessions", default=0)),
+        "sleepHours": float(pick("sleepHours", "Sleep_Hours", default=7)),
+        "physicalActivity": float(pick("physicalActivity", "Physical_Activity", default=3)),
+        "motivationLevel": pick("motivationLevel", "Motivation_Level"),
+        "parentalInvolvement": pick("parentalInvolvement", "Parental_Involvement"),
+        "familyIncome": pick("familyIncome", "Family_Income"),
+        "learningDisabilities": pick("learningDisabilities", "Learning_Disabilities"),
+        "gender": pick("gender", "Gender"),
+        "parentalEducation": pick("parentalEducationLevel", "Parental_Education_Level"),
+        "internetAccess": pick("internetAccess", "Internet_Access"),
+        "teacherQuality": pick("teacherQuality", "Teacher_Quality"),
+        "accessToResources": pick("accessToResources", "Access_to_Resources"),
+        "extracurricularActivities": pick("extracurricularActivities", "Extracurricular_Activities"),
+        "schoolType": pick("schoolType", "School_Type"),
+        "peerInfluence": pick("peerInfluence", "Peer_Influence"),
+        "distanceFromHome": pick("distanceFromHome", "Distance_from_Home"),
+    }
+
+@pytest.fixture(scope="module")
+def pregenerated(app):
+    import clustering
+    import pregenerate
+    stats = pregenerate.run(rate_per_minute=0, max_students=2)
+    assert stats["generated"] == 4 and stats["failed"] == 0
+    return clustering.get_at_risk_indices(2)
+
+def detail(client, index):
+    """What useStudentDetail hands the modal: /api/student/<index> plus its index and a display name."""
+    return {**client.get(f"/api/student/{index}").get_json(), "index": index, "name": "Test Student"}
+
+def test_explanation_is_served_for_the_dashboard_payload(app, pregenerated):
+    client = app.test_client()
+    for index in pregenerated:
+        response = client.post("/api/gemini/explain-student",
+                               json={"student_data": dashboard_student(detail(client, index))})
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body["pregenerated"] is True
+        assert body["explanation"].startswith("[fake model]")
+
+def test_strategies_are_served_for_the_dashboard_payload(app, pregenerated):
+    client = app.test_client()
+    student = dashboard_student(detail(client, pregenerated[0]))
+    response = client.post("/api/gemini/generate-strategy", json={
+        "cluster_name": student["clusterName"], "student_data": student, "past_interventions": []})
+    assert response.status_code == 200
+    assert response.get_json()["pregenerated"] is True
+
+def test_mismatched_or_stale_students_are_not_served(app, pregenerated):
+    import pregenerate
+    client = app.test_client()
+    index = pregenerated[0]
+    student = dashboard_student(detail(client, index))
+    assert pregenerate.lookup("explanation", index, student) is not None
+    # An index that doesn't belong to the posted student
+    assert pregenerate.lookup("explanation", index, {**student, "examScore": -1}) is None
+    # New intervention history changes the strategy prompt, so the stored text is stale
+    assert pregenerate.lookup("strategies", index, student) is not None
+    response = client.post("/api/intervention", json={"studentIndex": index, "strategy": "Peer tutoring",
+                                                      "outcome": "Pending"})
+    assert response.status_code == 200
+    assert pregenerate.lookup("strategies", index, student) is None
+    assert pregenerate.lookup("explanation", index, student) is not None
@@ -0,0 +1,49 @@
+import io
+import pandas as pd
+
+def upload(client, frame):
+    return client.post("/api/upload-data", content_type="multipart/form-data",
+                       data={"csv": (io.BytesIO(frame.to_csv(index=False).encode()), "upload.csv")})
+
+def stored_lengths():
+    import ML
+    import clustering
+    import row_index
+    return {len(ML.df_ml), len(ML.df_reference), len(clustering.df_cluster), len(clustering.df_raw),
+            len(row_index._hash_at)}
+
+def test_engineered_only_then_keyed_upserts_survive_a_restart(app):
+    import ML
+    import clustering
+    client = app.test_client()
+    total = len(clustering.df_cluster)
+
+    # No raw student fields: refused, nothing is appended
+    engineered = ML.df_ml.iloc[:3].astype(object)
+    response = upload(client, engineered)
+    assert response.status_code == 400
+    assert "Hours_Studied" in response.get_json()["error"]
+    assert stored_lengths() == {total}
+
+    roster = clustering.df_raw.drop(columns=["Class_Section"]).iloc[:1].astype(object)
+    roster["Student_ID"] = "T-1"
+    roster["Exam_Score"] = 17
+    body = upload(client, roster).get_json()
+    assert body["newStudentsUploaded"] == 1
+    assert stored_lengths() == {total + 1}
+
+    roster["Hours_Studied"] = 30
+    body = upload(client, roster).get_json()
+    assert (body["replaced"], body["newStudentsUploaded"]) == (1, 0)
+    assert clustering.df_raw["Hours_Studied"].iloc[-1] == 30
+
+    # The key is still known after a restart: a change replaces, a repeat is a no-op
+    import main
+    main.init_all()
+    assert stored_lengths() == {total + 1}
+    roster["Hours_Studied"] = 31
+    body = upload(client, roster).get_json()
+    assert (body["replaced"], body["newStudentsUploaded"]) == (1, 0)
+    body = upload(client, roster).get_json()
+    assert (body["unchanged"], body["retrained"]) == (1, False)
+    assert stored_lengths() == {total + 1}
@@ -0,0 +1,226 @@
+import io
+import os
+import time
+import fcntl
+import threading
+import numpy as np
+
+# Weekly per-student snapshots of score, burnout and sleep. In memory it is one
+# float32 block of shape (weeks, metric, students): a snapshot of the whole
+# school is a single row write and a student's timeline is one column slice.
+# On disk it is an append-only log of (timestamp delta, first student, values)
+# records written with np.save, replayed on startup. A snapshot of scattered
+# students (rows an upload changed in place) stores first student -1 followed
+# by an index array. Several gunicorn workers share the log: each record is
+# written as one buffer under an exclusive flock, after the writer has replayed
+# whatever other processes appended since it last read, so timestamp deltas are
+# always relative to the log's real last record.
+BASE_DIR = os.path.dirname(__file__)
+TIMELINE_PATH = os.getenv("TIMELINE_PATH", os.path.join(BASE_DIR, "data", "timeline.npylog"))
+METRICS = ("score", "burnout", "sleep")
+DAY = 86400
+WEEK = 7 * DAY
+EPOCH_MONDAY_OFFSET = 3 * DAY  # 1970-01-01 was a Thursday
+PROJECTION_WINDOW = 4
+
+_lock = threading.Lock()
+_weeks = np.empty(0, dtype=np.int64)  # week number of each row, ascending
+_values = np.full((0, len(METRICS), 0), np.nan, dtype=np.float32)
+_n_weeks = 0
+_n_students = 0
+_last_timestamp = 0
+_offset = 0  # bytes of the log already replayed into memory
+
+def _week_of(timestamp):
+    return (int(timestamp) + EPOCH_MONDAY_OFFSET) // WEEK
+
+def _week_start(week):
+    return week * WEEK - EPOCH_MONDAY_OFFSET
+
+def _grow(n_weeks, n_students):
+    """Doubles the backing block until it fits; amortised O(1) per appended row."""
+    global _weeks, _values
+    cap_weeks, _, cap_students = _values.shape
+    if n_weeks <= cap_weeks and n_students <= cap_students:
+        return
+    new_weeks = cap_weeks if n_weeks <= cap_weeks else max(n_weeks, 2 * cap_weeks, 8)
+    new_students = cap_students if n_students <= cap_students else max(n_students, 2 * cap_students)
+    values = np.full((new_weeks, len(METRICS), new_students), np.nan, dtype=np.float32)
+    values[:_n_weeks, :, :_n_students] = _values[:_n_weeks, :, :_n_students]
+    weeks = np.zeros(new_weeks, dtype=np.int64)
+    weeks[:_n_weeks] = _weeks[:_n_weeks]
+    _values, _weeks = values, weeks
+
+def _apply(timestamp, start, values, indices=None):
+    """Writes one (metric, n) snapshot into the row of its week; no IO."""
+    global _n_weeks, _n_students, _last_timestamp
+    # Clocks can step back; never reorder rows because of it
+    timestamp = max(int(timestamp), _last_timestamp)
+    week = _week_of(timestamp)
+    if indices is None:
+        columns = slice(start, start + values.shape[1])
+        end = start + values.shape[1]
+    else:
+        columns = indices
+        end = int(indices.max()) + 1 if len(indices) else 0
+
+    if _n_weeks == 0 or week > _weeks[_n_weeks - 1]:
+        _grow(_n_weeks + 1, max(end, _n_students))
+        _weeks[_n_weeks] = week
+        _n_weeks += 1
+    else:
+        _grow(_n_weeks, max(end, _n_students))
+    _values[_n_weeks - 1][:, columns] = values
+    _n_students = max(_n_students, end)
+    _last_timestamp = timestamp
+
+def _catch_up(f):
+    """Replays the records appended to the log since _offset (lock and flock held).
+    Returns False if the log ends in a torn record, which is left unread."""
+    global _offset
+    f.seek(_offset)
+    while True:
+        try:
+            delta, start = np.load(f)
+            indices = np.load(f) if start < 0 else None
+            values = np.load(f)
+        except (EOFError, ValueError):
+            # A clean end of file, or a crash mid-append; everything before it is intact
+            torn = f.tell() != _offset
+            f.seek(_offset)
+            return not torn
+        _apply(_last_timestamp + int(delta), int(start), values, indices)
+        _offset = f.tell()
+
+def init_store():
+    """(Re)loads the in-memory block by replaying the on-disk log."""
+    global _weeks, _values, _n_weeks, _n_students, _last_timestamp, _offset
+    with _lock:
+        _weeks = np.empty(0, dtype=np.int64)
+        _values = np.full((0, len(METRICS), 0), np.nan, dtype=np.float32)
+        _n_weeks = _n_students = _last_timestamp = _offset = 0
+        if not os.path.exists(TIMELINE_PATH):
+            return
+        with open(TIMELINE_PATH, "rb") as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            if not _catch_up(f):
+                print(f"Warning: ignoring truncated record at the end of {TIMELINE_PATH}")
+
+def refresh():
+    """Replays records other processes appended since this one last read the log."""
+    try:
+        if os.path.getsize(TIMELINE_PATH) == _offset:
+            return
+    except FileNotFoundError:
+        return
+    with _lock, open(TIMELINE_PATH, "rb") as f:
+        fcntl.flock(f, fcntl.LOCK_SH)
+        _catch_up(f)
+
+def is_empty():
+    return _n_weeks == 0
+
+def append_snapshot(score, burnout, sleep, start=0, timestamp=None, indices=None):
+    """Bulk-appends one snapshot for students start..start+n (a whole school is one call),
+    or for the given student indices."""
+    global _offset
+    values = np.vstack([np.asarray(score, dtype=np.float32),
+                        np.asarray(burnout, dtype=np.float32),
+                        np.asarray(sleep, dtype=np.float32)])
+    timestamp = int(time.time() if timestamp is None else timestamp)
+    if indices is not None:
+        indices = np.asarray(indices, dtype=np.int64)
+
+    os.makedirs(os.path.dirname(TIMELINE_PATH), exist_ok=True)
+    with _lock, open(TIMELINE_PATH, "a+b") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        if not _catch_up(f):
+            print(f"Warning: dropping truncated record at the end of {TIMELINE_PATH}")
+            f.truncate(_offset)
+        # Deltas are relative to the last record in the log, whoever wrote it
+        timestamp = max(timestamp, _last_timestamp)
+        record = io.BytesIO()
+        np.save(record, np.array([timestamp - _last_timestamp, -1 if indices is not None else start], dtype=np.int64))
+        if indices is not None:
+            np.save(record, indices)
+        np.save(record, values)
+        f.write(record.getvalue())
+        f.flush()
+        _offset = f.tell()
+        _apply(timestamp, start, values, indices)
+    return values.shape[1]
+
+def project(times, values, window=PROJECTION_WINDOW):
+    """Next-week value of every series in values (..., T) from a least-squares trend
+    over its last `window` points; NaNs are ignored and a lone point projects flat."""
+    times = np.asarray(times, dtype=np.float64)[-window:]
+    values = np.asarray(values, dtype=np.float64)[..., -window:]
+    mask = ~np.isnan(values)
+    count = np.maximum(mask.sum(axis=-1), 1)
+
+    t_mean = (times * mask).sum(axis=-1) / count
+    v_mean = np.where(mask, values, 0).sum(axis=-1) / count
+    t_dev = np.where(mask, times - t_mean[..., None], 0)
+    v_dev = np.where(mask, values - v_mean[..., None], 0)
+    variance = (t_dev ** 2).sum(axis=-1)
+    slope = np.divide((t_dev * v_dev).sum(axis=-1), variance, out=np.zeros_like(variance), where=variance > 0)
+
+    projection = v_mean + slope * (times[-1] + 1 - t_mean)
+    return np.where(mask.any(axis=-1), projection, np.nan)
+
+def _downsample(weeks, values, max_points):
+    """Averages consecutive weeks into at most max_points buckets (NaN-aware)."""
+    edges = np.unique(np.linspace(0, len(weeks), max_points + 1).astype(int)[:-1])
+    present = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(present, values, 0), edges, axis=-1)
+    counts = np.add.reduceat(present, edges, axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return weeks[edges], sums / counts
+
+def _to_list(values, decimals):
+    return [None if np.isnan(v) else round(float(v), decimals) for v in values]
+
+def get_timeline(index, start=None, end=None, max_points=None):
+    """A student's weekly series between two timestamps plus a projected next week.
+    Returns None for students the store has never seen."""
+    refresh()
+    with _lock:
+        if index < 0 or index >= _n_students:
+            return None
+        weeks = _weeks[:_n_weeks]
+        series = _values[:_n_weeks, :, index].T.copy()  # (metric, weeks), O(weeks)
+
+    # Weeks before the student joined (or after they left) are all-NaN rows
+    known = ~np.isnan(series).all(axis=0)
+    if not known.any():
+        return None
+    baseline_week = weeks[known][0]
+
+    lo = 0 if start is None else np.searchsorted(weeks, _week_of(start), side="left")
+    hi = len(weeks) if end is None else np.searchsorted(weeks, _week_of(end), side="right")
+    selected = known.copy()
+    selected[:lo] = selected[hi:] = False
+    weeks, series = weeks[selected], series[:, selected]
+
+    if len(weeks):
+        projection = project(weeks, series)
+        projection_week = weeks[-1] + 1
+    else:
+        projection, projection_week = np.full(len(METRICS), np.nan), None
+    if max_points and len(weeks) > max_points:
+        weeks, series = _downsample(weeks, series, max_points)
+
+    labels = ["Baseline" if w == baseline_week else f"Week {int(w - baseline_week)}" for w in weeks]
+    dates = [time.strftime("%Y-%m-%d", time.gmtime(_week_start(int(w)))) for w in weeks]
+    if projection_week is not None:
+        labels.append("Projection")
+        dates.append(time.strftime("%Y-%m-%d", time.gmtime(_week_start(int(projection_week)))))
+
+    score, burnout, sleep = np.hstack([series, projection[:, None]]) if projection_week is not None else series
+    return {
+        "labels": labels,
+        "dates": dates,
+        "scores": _to_list(score, 0),
+        "burnout_trend": _to_list(burnout, 1),
+        "sleep": _to_list(np.clip(sleep, 0, 24), 1),
+    }
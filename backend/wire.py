@@ -0,0 +1,112 @@
+import os
+import gzip
+import json
+import numpy as np
+from flask import Response, current_app, request
+import metrics
+
+# Content negotiation and compression for the large API payloads. JSON stays
+# the default; a client that asks for MessagePack (Accept: application/msgpack)
+# gets the same document in a binary encoding, and for tabular payloads such
+# as /api/students one that asks for Arrow IPC
+# (Accept: application/vnd.apache.arrow.stream) gets the rows as one columnar
+# record batch, so every key is written once instead of once per student. The
+# payload's other fields (version, full, deleted, ...) travel as JSON in the
+# Arrow schema metadata. Independently, any response of at least
+# COMPRESS_MIN_BYTES is compressed with zstd or gzip, whichever the client's
+# Accept-Encoding prefers (zstd on ties). msgpack, pyarrow and zstandard are
+# optional: without them those formats/encodings are simply not offered.
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("WIRE_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("WIRE_GZIP_LEVEL", "6"))
+ZSTD_LEVEL = int(os.getenv("WIRE_ZSTD_LEVEL", "3"))
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+# Appended to ETags so each representation of a data version validates on its own
+ETAG_SUFFIXES = {JSON: "", MSGPACK: ".msgpack", ARROW: ".arrow"}
+
+COMPRESSIBLE = {JSON, MSGPACK, ARROW, "text/csv", "text/plain", "text/html"}
+
+def negotiate(tabular=False):
+    """Best representation the client accepts; JSON when it has no preference or asks for nothing we offer."""
+    offers = [JSON]
+    if msgpack is not None:
+        offers.append(MSGPACK)
+    if tabular and pa is not None:
+        offers.append(ARROW)
+    return request.accept_mimetypes.best_match(offers) or JSON
+
+def _plain(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _arrow_bytes(payload, table):
+    rows = pa.Table.from_pylist(payload[table])
+    # Repeated labels (clusterName, motivation) are stored once per batch
+    for i, field in enumerate(rows.schema):
+        if pa.types.is_string(field.type):
+            rows = rows.set_column(i, field.name, rows.column(i).dictionary_encode())
+    meta = {key: json.dumps(value, default=_plain) for key, value in payload.items() if key != table}
+    rows = rows.replace_schema_metadata({**meta, "table": table})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, rows.schema) as writer:
+        writer.write_table(rows)
+    return sink.getvalue().to_pybytes()
+
+def respond(payload, table=None, mimetype=None):
+    """payload as a Response in the negotiated format; `table` names the list of rows Arrow can carry."""
+    mimetype = mimetype or negotiate(table is not None)
+    if mimetype == JSON:
+        response = current_app.json.response(payload)
+    else:
+        with metrics.span("serialization"):
+            if mimetype == ARROW:
+                body = _arrow_bytes(payload, table)
+            else:
+                body = msgpack.packb(payload, default=_plain)
+        response = Response(body, mimetype=mimetype)
+    response.vary.add("Accept")
+    return response
+
+def _encode(encoding, body):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+def _compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE):
+        return response
+    response.vary.add("Accept-Encoding")
+    if (response.content_length or 0) < COMPRESS_MIN_BYTES:
+        return response
+    encoding = request.accept_encodings.best_match(["zstd", "gzip"] if zstandard is not None else ["gzip"])
+    if encoding is None:
+        return response
+    with metrics.span("compression"):
+        response.set_data(_encode(encoding, response.get_data()))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # Same entity, different bytes: a compressed body only matches weakly
+        response.set_etag(etag, weak=True)
+    return response
+
+def init_app(app):
+    """Registers response compression for every route."""
+    app.after_request(_compress_response)
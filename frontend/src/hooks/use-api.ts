@@ -30,7 +30,8 @@ export function useStudentDetail(index: number) {
     queryKey: ["student-detail", index],
     queryFn: async () => {
       const data = await api.getStudent(index);
-      return { ...data, name: getIndianName(index) };
+      // The detail endpoint omits the index; keep it so the modal posts the right student
+      return { ...data, index, name: getIndianName(index) };
     },
     enabled: index >= 0,
     ...defaultOptions